@@ -34,13 +34,11 @@
 # *                                                                                  *
 # ************************************************************************************
 
-import os
 import FreeCAD
 import DapTools
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -54,24 +52,21 @@ class _CommandDapAnimation:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon8.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Animation_alias", "Animate solution"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Animation_alias", "Animates the motion of the moving bodies"
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Animation_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if there are already some results stored in the solver object
-        i.e. Determine if the animate command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getSolverObject().DapResults is not None
+        return commandIsActive("Dap_Animation_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -80,9 +75,19 @@ class _CommandDapAnimation:
         import DapAnimation
         import _TaskPanelDapAnimate
 
+        from DapResultsStore import ResultsStore
+
         # Get the identity of the solver object
         solver_object = DapTools.getSolverObject()
 
+        # A run which is still being solved can be animated once it has
+        # written its first results
+        if solver_object.DapResults is None and (
+            ResultsStore(solver_object.FileDirectory).rows == 0
+        ):
+            FreeCAD.Console.PrintError("The run has not reported any results yet\n")
+            return
+
         # Get the identity of the solver document
         # (which is the active document on entry)
         solver_document = FreeCAD.ActiveDocument
@@ -91,27 +96,48 @@ class _CommandDapAnimation:
         # solver document while it is still the active document
         body_objects = DapTools.getListOfBodyObjects()
 
-        # Set an existing "Animation" document active
-        # or create it if it does not exist yet
-        if "Animation" in FreeCAD.listDocuments():
-            FreeCAD.setActiveDocument("Animation")
-        else:
-            FreeCAD.newDocument("Animation")
-        animation_document = FreeCAD.ActiveDocument
-
-        # Generate the list of bodies and
-        # add their shapes to the animation_document
-        # and append their body labels to the list_of_bodies
-        list_of_bodies = []
-        for body in body_objects:
-            animation_object = animation_document.addObject("Part::Feature", body.Label)
-            animation_document.getObject(
-                animation_object.Name
-            ).Shape = body.Shape.copy()
-            list_of_bodies.append(body.Label)
-
-        # Request the animation window zoom to be set to fit the entire system
-        FreeCADGui.SendMsgToActiveView("ViewFit")
+        list_of_bodies = [body.Label for body in body_objects]
+
+        # Move the parts of the moving bodies in an overlay of the scene graph
+        # of the current 3D view (see DapAnimationScene), if requested and
+        # possible, rather than in copies of their shapes
+        scene = None
+        if solver_object.SceneGraphAnimation:
+            import DapAnimationScene
+
+            try:
+                scene = DapAnimationScene.SceneGraphAnimation(
+                    FreeCADGui.ActiveDocument.ActiveView,
+                    solver_document,
+                    [body for body in body_objects if body.BodyType == "Moving"],
+                )
+            except (AttributeError, RuntimeError) as e:
+                FreeCAD.Console.PrintWarning(
+                    "Animating copies of the bodies, as they can not be animated "
+                    "in the 3D view: " + str(e) + "\n"
+                )
+
+        animation_document = None
+        if scene is None:
+            # Set an existing "Animation" document active
+            # or create it if it does not exist yet
+            if "Animation" in FreeCAD.listDocuments():
+                FreeCAD.setActiveDocument("Animation")
+            else:
+                FreeCAD.newDocument("Animation")
+            animation_document = FreeCAD.ActiveDocument
+
+            # Add the shapes of the bodies to the animation_document
+            for body in body_objects:
+                animation_object = animation_document.addObject(
+                    "Part::Feature", body.Label
+                )
+                animation_document.getObject(
+                    animation_object.Name
+                ).Shape = body.Shape.copy()
+
+            # Request the animation window zoom to be set to fit the entire system
+            FreeCADGui.SendMsgToActiveView("ViewFit")
 
         # Display (and run) the Animation dialog
         FreeCADGui.Control.showDialog(
@@ -120,5 +146,6 @@ class _CommandDapAnimation:
                 solver_document,
                 animation_document,
                 list_of_bodies,
+                scene,
             )
         )
@@ -0,0 +1,145 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import FreeCAD
+import DapTools
+from pivy import coin
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+
+#  -------------------------------------------------------------------------
+def displayNode(part):
+    """Return the node of the display mode in which a part is shown in the 3D
+    view (its tessellation, without its placement), or None if it is hidden"""
+
+    switch = getattr(part.ViewObject, "SwitchNode", None)
+    if switch is None:
+        raise RuntimeError(str(part.Label) + " has no display mode node")
+    which = switch.whichChild.getValue()
+    if which < 0:
+        return None
+    return switch.getChild(which)
+
+
+# =============================================================================
+class SceneGraphAnimation:
+    """Overlay in the scene graph of a 3D view, which shows the parts of the
+    moving bodies at their animated placements without copying their shapes.
+    Every moving body is a separator with a transform (the motion of the body
+    from its initial placement), holding for each of its parts a separator
+    with a transform (the global placement of the part) and the existing
+    display mode node of the part, i.e. its tessellation is reused.
+    The parts themselves are hidden by switching off their display mode
+    switch, which is restored on close; the document is not changed.
+    input:
+        view: the 3D view to add the overlay to
+        document: the document of the bodies
+        moving_body_objects: list of the DapBody objects of the moving bodies
+    Raises a RuntimeError if a part can not be shown this way."""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, view, document, moving_body_objects):
+        """ """
+        self.view = view
+        self.root = coin.SoSwitch()
+        self.root.whichChild = coin.SO_SWITCH_ALL
+        self.transforms = []
+        # The solids of each body at their global placement, from which the
+        # centre of gravity of the body is determined
+        self.solids = []
+        self.hidden = []
+        for body_object in moving_body_objects:
+            body_separator = coin.SoSeparator()
+            body_transform = coin.SoTransform()
+            body_separator.addChild(body_transform)
+            body_solids = []
+            for part_label in body_object.References:
+                part = DapTools.getObjectByLabel(document, part_label)
+                placement = part.getGlobalPlacement()
+                shape = part.Shape.copy()
+                shape.Placement = placement
+                body_solids += shape.Solids
+                node = displayNode(part)
+                if node is None:
+                    continue
+                part_separator = coin.SoSeparator()
+                part_separator.addChild(self.placementTransform(placement))
+                part_separator.addChild(node)
+                body_separator.addChild(part_separator)
+                self.hidden.append(part.ViewObject.SwitchNode)
+            self.root.addChild(body_separator)
+            self.transforms.append(body_transform)
+            self.solids.append(body_solids)
+
+        # Hide the parts, remembering their display modes
+        self.display_modes = [switch.whichChild.getValue() for switch in self.hidden]
+        for switch in self.hidden:
+            switch.whichChild = coin.SO_SWITCH_NONE
+        self.view.getSceneGraph().addChild(self.root)
+
+    #  -------------------------------------------------------------------------
+    @staticmethod
+    def placementTransform(placement):
+        """Return a transform node for a placement"""
+
+        transform = coin.SoTransform()
+        base = placement.Base
+        transform.translation.setValue(base.x, base.y, base.z)
+        transform.rotation.setValue(*placement.Rotation.Q)
+        return transform
+
+    #  -------------------------------------------------------------------------
+    def setTransforms(self, bases, quaternions):
+        """Move the bodies by the translations bases and the rotations
+        quaternions (x, y, z, w), one row per moving body"""
+
+        for transform, base, quaternion in zip(self.transforms, bases, quaternions):
+            transform.translation.setValue(base[0], base[1], base[2])
+            transform.rotation.setValue(
+                quaternion[0], quaternion[1], quaternion[2], quaternion[3]
+            )
+
+    #  -------------------------------------------------------------------------
+    def close(self):
+        """Remove the overlay and show the parts again"""
+
+        self.view.getSceneGraph().removeChild(self.root)
+        for switch, which in zip(self.hidden, self.display_modes):
+            switch.whichChild = which
+        self.hidden = []
@@ -0,0 +1,210 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import FreeCAD
+import numpy as np
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+
+#  -------------------------------------------------------------------------
+def readStoreRows(store, n_bodies, start=0):
+    """Return the reported times, and the locations (ticks, bodies, 2) and
+    angles (ticks, bodies) of the moving bodies, of the rows of a results
+    store from start on"""
+
+    rows = store.rows
+    # The state vector holds x, y and phi of each moving body, from
+    # index 1 (the solver does not use 0 indexing)
+    u = store.channel("u")
+    coordinates = np.array(u[start:rows, 1 : 3 * n_bodies + 1])
+    coordinates = coordinates.reshape(rows - start, n_bodies, 3)
+    times = np.array(store.channel("time")[start:rows])
+    return times, coordinates[:, :, 0:2], coordinates[:, :, 2]
+
+
+#  -------------------------------------------------------------------------
+def readMotion(solver_object, n_bodies):
+    """Return the results store of the run of solver_object (or None if it
+    has none), and the reported times, locations and angles of the moving
+    bodies (see readStoreRows) read from it, or else from the results loaded
+    into the solver object"""
+
+    from DapResultsStore import ResultsStore
+
+    folder = solver_object.FileDirectory
+    if ResultsStore.exists(folder):
+        store = ResultsStore(folder)
+        return (store,) + readStoreRows(store, n_bodies)
+    times = np.array(solver_object.ReportedTimes, dtype=float)
+    n_ticks = len(times)
+    locations = np.array(solver_object.Bodies_r, dtype=float)
+    angles = np.array(solver_object.Bodies_p, dtype=float)
+    return (
+        None,
+        times,
+        locations.reshape(n_ticks, n_bodies, 2),
+        angles.reshape(n_ticks, n_bodies),
+    )
+
+
+#  -------------------------------------------------------------------------
+def interpolateMotion(times, locations, angles, sample_times):
+    """Return the locations and angles of the moving bodies at sample_times,
+    interpolated linearly between the reported times (and held beyond them)"""
+
+    last = len(times) - 1
+    ticks = np.searchsorted(times, sample_times, side="right") - 1
+    ticks = np.clip(ticks, 0, max(last - 1, 0))
+    if last == 0:
+        fractions = np.zeros(np.shape(sample_times))
+    else:
+        fractions = (sample_times - times[ticks]) / (times[ticks + 1] - times[ticks])
+        fractions = np.clip(fractions, 0.0, 1.0)
+    next_ticks = np.minimum(ticks + 1, last)
+    fractions = fractions[..., np.newaxis]
+    interpolated_angles = (1.0 - fractions) * angles[ticks] + (
+        fractions * angles[next_ticks]
+    )
+    fractions = fractions[..., np.newaxis]
+    interpolated_locations = (1.0 - fractions) * locations[ticks] + (
+        fractions * locations[next_ticks]
+    )
+    return interpolated_locations, interpolated_angles
+
+
+#  -------------------------------------------------------------------------
+def centerOfGravityOfSolids(solids):
+    """Necessary because older versions of FreeCAD do not have centerOfGravity
+        and compound shapes do not have centerOfMass
+    The Centre of Mass of a compound object:
+      The vector sum of the centre of mass of each solid,
+      weighted by volume"""
+
+    totVol = 0
+    CoG = FreeCAD.Vector(0, 0, 0)
+    for solid in solids:
+        vol = solid.Volume
+        totVol += vol
+        CoG += solid.CenterOfMass * vol
+
+    CoG /= totVol
+
+    return CoG
+
+
+# =============================================================================
+class BodyMotion:
+    """The motion of the moving bodies in 3D, for their locations and angles
+    in the plane of motion.
+    Each body is rotated about its centre of gravity at the first tick by
+    its angle relative to that tick, and then translated so that its
+    centre of gravity lies at its location (which is given in the
+    orthonormal coordinates of the plane of motion).
+    input:
+        plane_norm: the normal to the plane of motion (a FreeCAD Vector)
+        rotation_matrix: the global rotation matrix of the solver object
+        initial_angles: the angles of the bodies at the first tick
+        cogs: the centres of gravity of the bodies at their initial placements
+        placements: the initial placements of the bodies; the identity to get
+            the motion relative to the initial placements
+        scale: the scale from the solver's meters to the document's mm"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(
+        self, plane_norm, rotation_matrix, initial_angles, cogs, placements, scale
+    ):
+        """ """
+        self.scale = scale
+        self.norm = np.array([plane_norm.x, plane_norm.y, plane_norm.z])
+        # Rows 0 and 1 of the rotation matrix map the orthonormal x and y axes
+        # back onto the plane of motion
+        self.plane_rotation = np.array(rotation_matrix.A).reshape(4, 4)[0:2, 0:3]
+        self.initial_angles = np.array(initial_angles, dtype=float)
+
+        n_bodies = len(self.initial_angles)
+        # The component of the centre of gravity normal to the plane of
+        # motion, which does not change
+        self.cog_normals = np.zeros(n_bodies)
+        # The arm from the centre of gravity to the base of the placement
+        self.arms = np.zeros((n_bodies, 3))
+        self.initial_quaternions = np.zeros((n_bodies, 4))
+        for body_number, (cog, placement) in enumerate(zip(cogs, placements)):
+            cog = np.array([cog.x, cog.y, cog.z])
+            base = placement.Base
+            self.cog_normals[body_number] = self.norm @ cog
+            self.arms[body_number] = np.array([base.x, base.y, base.z]) - cog
+            self.initial_quaternions[body_number] = placement.Rotation.Q
+
+    #  -------------------------------------------------------------------------
+    def transforms(self, locations, angles):
+        """Return the translations (..., bodies, 3) and rotations as quaternions
+        (x, y, z, w) (..., bodies, 4) of the moving bodies for their locations
+        (..., bodies, 2) and angles (..., bodies)"""
+
+        norm = self.norm
+        theta = angles - self.initial_angles
+        cos = np.cos(theta)[..., np.newaxis]
+        sin = np.sin(theta)[..., np.newaxis]
+
+        # The centres of gravity
+        cogs = (
+            (locations * self.scale) @ self.plane_rotation
+            + self.cog_normals[:, np.newaxis] * norm
+        )
+
+        # Rotate the arms about the normal (Rodrigues' rotation formula)
+        arms = self.arms
+        bases = (
+            cogs
+            + arms * cos
+            + np.cross(norm, arms) * sin
+            + norm * (arms @ norm)[:, np.newaxis] * (1 - cos)
+        )
+
+        # Prepend the rotation about the normal to the initial rotations
+        v0 = self.initial_quaternions[:, 0:3]
+        w0 = self.initial_quaternions[:, 3]
+        va = norm * np.sin(theta / 2)[..., np.newaxis]
+        wa = np.cos(theta / 2)
+        quaternions = np.zeros(theta.shape + (4,))
+        quaternions[..., 3] = wa * w0 - np.sum(va * v0, axis=-1)
+        quaternions[..., 0:3] = (
+            wa[..., np.newaxis] * v0 + w0[:, np.newaxis] * va + np.cross(va, v0)
+        )
+        return bases, quaternions
@@ -39,18 +39,19 @@ import FreeCAD
 
 import os
 import DapTools
+import DapRegistry
 import pivy
 import Part
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
 Debug = True
 
 BODY_TYPES = ["Ground", "Moving"]
+INITIAL_CONDITIONS = ["InitialHorizontal", "InitialVertical", "InitialAngular"]
 BODY_TYPE_HELPER_TEXT = ["A fixed body which does not move.", "A free moving body."]
 
 
@@ -72,23 +73,21 @@ class _CommandDapBody:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon3.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Body_alias", "Body Definition"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Body_alias", "Creates and defines a body for the DAP analysis"
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Body_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
 
-        return DapTools.getActiveContainer() is not None
+        from DapCommands import commandIsActive
+
+        return commandIsActive("Dap_Body_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -165,7 +164,7 @@ class _DapBody:
         doc = FreeCAD.getDocument(docName)
         shape_objects = []
         for i in range(len(obj.References)):
-            selection_object = doc.getObjectsByLabel(obj.References[i])[0]
+            selection_object = DapTools.getObjectByLabel(doc, obj.References[i])
             shape_objects.append(selection_object.Shape)
         shape = Part.makeCompound(shape_objects)
         if shape is None:
@@ -181,6 +180,10 @@ class _DapBody:
     #  -------------------------------------------------------------------------
     def onChanged(self, obj, prop):
         """ """
+        if prop in INITIAL_CONDITIONS:
+            DapRegistry.objectChanged(obj, prop, "initial_conditions")
+        else:
+            DapRegistry.objectChanged(obj, prop, "bodies")
         if prop == "BodyType":
             if obj.BodyType == "Ground":
                 obj.InitialAngular = "0.0"
@@ -0,0 +1,220 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import FreeCAD
+import DapTools
+import PySide
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# The DAP commands, registered by InitGui through lightweight stubs, so that
+# the command modules (and the Part, pivy and UI modules they pull in) are
+# only imported once a command is run. For every command alias:
+# (module, command class, icon, menu text, tool tip, condition under which
+# the command is active: "document", "container", "results" (loaded into
+# the solver object) or "run" (results loaded, or a results store of a run
+# which may still be being solved))
+COMMANDS = {
+    "Dap_Container_alias": (
+        "DapContainer",
+        "_CommandDapContainer",
+        "Icon2.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Container_alias", "New Dap Container"),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Container_alias", "Creates a Dap solver container"
+        ),
+        "document",
+    ),
+    "Dap_Body_alias": (
+        "DapBodySelection",
+        "_CommandDapBody",
+        "Icon3.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Body_alias", "Body Definition"),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Body_alias", "Creates and defines a body for the DAP analysis"
+        ),
+        "container",
+    ),
+    "Dap_Joint_alias": (
+        "DapJointSelection",
+        "_CommandDapJoint",
+        "Icon4.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Joint_alias", "Add New Relative Movement Between 2 Bodies"
+        ),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Joint_alias", "Add a new relative movement between two bodies"
+        ),
+        "container",
+    ),
+    # NOTE: the force and material aliases are crossed over, as they have
+    # always been registered
+    "Dap_Force_alias": (
+        "DapMaterialSelection",
+        "_CommandDapMaterial",
+        "Icon5.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Material_alias", "Define material properties"
+        ),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Material_alias",
+            "Define the material properties associated with each body.",
+        ),
+        "container",
+    ),
+    "Dap_Material_alias": (
+        "DapForceSelection",
+        "_CommandDapForce",
+        "Icon6.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Force_alias", "Add Force"),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Force_alias", "Creates and defines a force for the DAP analysis"
+        ),
+        "container",
+    ),
+    "Dap_Solver_alias": (
+        "DapSolverRunner",
+        "_CommandDapSolver",
+        "Icon7.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Solver_alias", "Run the analysis"),
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Solver_alias", "Run the analysis."),
+        "container",
+    ),
+    "Dap_Animation_alias": (
+        "DapAnimation",
+        "_CommandDapAnimation",
+        "Icon8.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Animation_alias", "Animate solution"),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Animation_alias", "Animates the motion of the moving bodies"
+        ),
+        "run",
+    ),
+    "Dap_Plot_alias": (
+        "DapPlot",
+        "_CommandDapPlot",
+        "Icon9.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Plot_alias", "Plot results"),
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Plot_alias", "Plot results"),
+        "results",
+    ),
+    "Dap_Point_alias": (
+        "DapPointSelection",
+        "_CommandDapPoint",
+        "Icon8.png",
+        PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Point_alias", "Add Point"),
+        PySide.QtCore.QT_TRANSLATE_NOOP(
+            "Dap_Point_alias", "Creates and defines a point for the DAP analysis"
+        ),
+        "container",
+    ),
+}
+
+
+#  -------------------------------------------------------------------------
+def commandResources(alias):
+    """Return the dictionary defining the icon, the menu text and the tooltip
+    of a command (as returned by its GetResources)"""
+
+    icon, menu_text, tool_tip = COMMANDS[alias][2:5]
+    return {
+        "Pixmap": os.path.join(DapTools.get_module_path(), "icons", icon),
+        "MenuText": menu_text,
+        "ToolTip": tool_tip,
+    }
+
+
+#  -------------------------------------------------------------------------
+def commandIsActive(alias):
+    """Determine if a command/icon must be active or greyed out"""
+
+    active_when = COMMANDS[alias][5]
+    if active_when == "document":
+        return FreeCAD.ActiveDocument is not None
+    if active_when == "container":
+        return DapTools.getActiveContainer() is not None
+    solver_object = DapTools.getSolverObject()
+    if solver_object is None:
+        return False
+    if solver_object.DapResults is not None:
+        return True
+    if active_when == "run":
+        from DapResultsStore import ResultsStore
+
+        return ResultsStore.exists(solver_object.FileDirectory)
+    return False
+
+
+# =============================================================================
+class _CommandDapStub:
+    """Stands in for a DAP command until it is run.
+    The resources and the active state are determined from COMMANDS, as by
+    the command classes themselves, without importing the module of the
+    command; the command itself is created on activation"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, alias):
+        """ """
+        self.alias = alias
+        self.module_name, self.class_name = COMMANDS[alias][0:2]
+        self.command = None
+
+    #  -------------------------------------------------------------------------
+    def GetResources(self):
+        """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
+        Returns a dictionary defining the icon, the menu text and the tooltip"""
+
+        return commandResources(self.alias)
+
+    #  -------------------------------------------------------------------------
+    def IsActive(self):
+        """Determine if the command/icon must be active or greyed out"""
+
+        return commandIsActive(self.alias)
+
+    #  -------------------------------------------------------------------------
+    def Activated(self):
+        """Import the module of the command on first use and run the command"""
+
+        if self.command is None:
+            import importlib
+
+            module = importlib.import_module(self.module_name)
+            self.command = getattr(module, self.class_name)()
+        return self.command.Activated()
@@ -40,7 +40,6 @@ import os
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -108,23 +107,21 @@ class _CommandDapContainer:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon2.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Container_alias", "New Dap Container"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Container_alias", "Creates a Dap solver container"
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Container_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return FreeCAD.ActiveDocument is not None
+        return commandIsActive("Dap_Container_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
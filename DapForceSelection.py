@@ -40,13 +40,13 @@ import FreeCAD
 import math
 import os
 import DapTools
+import DapRegistry
 import _DapBodySelector
 import pivy
 import Part
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -85,21 +85,21 @@ class _CommandDapForce:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
 
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon6.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Force_alias", "Add Force"),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Force_alias", "Creates and defines a force for the DAP analysis"
-            ),
-        }
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Material_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getActiveContainer() is not None
+        return commandIsActive("Dap_Material_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -360,10 +360,10 @@ class _DapForce:
         doc_name = str(obj.Document.Name)
         doc = FreeCAD.getDocument(doc_name)
         if obj.Joint1 != "":
-            lcs_obj = doc.getObjectsByLabel(obj.Joint1)[0]
+            lcs_obj = DapTools.getObjectByLabel(doc, obj.Joint1)
             obj.JointCoord1 = lcs_obj.Placement.Base
         if obj.Joint2 != "":
-            lcs_obj = doc.getObjectsByLabel(obj.Joint2)[0]
+            lcs_obj = DapTools.getObjectByLabel(doc, obj.Joint2)
             obj.JointCoord2 = lcs_obj.Placement.Base
         if obj.ForceTypes == "Spring" or obj.ForceTypes == "Linear Spring Damper":
             h = (obj.JointCoord1 - obj.JointCoord2).Length
@@ -403,9 +403,9 @@ class _DapForce:
             vol1 = 0
             vol2 = 0
             if obj.Body1 != "Ground":
-                vol1 = doc.getObjectsByLabel(obj.Body1)[0].Shape.Volume
+                vol1 = DapTools.getObjectByLabel(doc, obj.Body1).Shape.Volume
             if obj.Body2 != "Ground":
-                vol2 = doc.getObjectsByLabel(obj.Body2)[0].Shape.Volume
+                vol2 = DapTools.getObjectByLabel(doc, obj.Body2).Shape.Volume
             if vol1 + vol2 == 0:
                 vol1 = 100000
             scale = (vol1 + vol2) / 30000
@@ -449,6 +449,7 @@ class _DapForce:
     #  -------------------------------------------------------------------------
     def onChanged(self, obj, prop):
         """ """
+        DapRegistry.objectChanged(obj, prop, "forces")
         #  The property editor for all Type Cases has been added in _DapForceDriver.py.
         #  Only if form.driveCheck is checked will all Driver properties be hidden here
         if prop == "ForceTypes":
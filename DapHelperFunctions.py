@@ -34,6 +34,7 @@
 # *                                                                                  *
 # ************************************************************************************
 
+import math
 import numpy as np
 
 # Select if we want to be in debug mode
@@ -44,8 +45,8 @@ Debug = True
 def RotMatrix(p):
     """This function sets up a rotational transformation matrix"""
 
-    c = np.math.cos(p)
-    s = np.math.sin(p)
+    c = math.cos(p)
+    s = math.sin(p)
     A = np.array([[c, -s], [s, c]])
     return A
 
@@ -58,3 +59,55 @@ def RotMatrix90(s):
         [[-s[1, 0]], [s[0, 0]]]
     )  # //??????????????????????????????????????????/
     return s_r
+
+
+#  -------------------------------------------------------------------------
+def RotMatrixArray(p, out=None):
+    """This function sets up the rotational transformation matrices of a
+    vector of angles p (n,) as a stack of shape (n, 2, 2)"""
+
+    if out is None:
+        out = np.empty((len(p), 2, 2))
+    np.cos(p, out=out[:, 0, 0])
+    np.sin(p, out=out[:, 1, 0])
+    np.negative(out[:, 1, 0], out=out[:, 0, 1])
+    out[:, 1, 1] = out[:, 0, 0]
+    return out
+
+
+#  -------------------------------------------------------------------------
+def RotatePointArray(A, s, out=None, work=None):
+    """This function rotates an array of points s (n, 2) with the matching
+    stack of rotational transformation matrices A (n, 2, 2), i.e. returns
+    A[i] @ s[i] for every row i. work is an optional (n, 2) scratch array,
+    with which (and out) the rotation does not allocate any arrays"""
+
+    if out is None:
+        out = np.empty(np.shape(s))
+    if work is None:
+        work = np.empty(np.shape(s))
+    np.multiply(A[:, 0, 0], s[:, 0], out=work[:, 0])
+    np.multiply(A[:, 0, 1], s[:, 1], out=work[:, 1])
+    np.add(work[:, 0], work[:, 1], out=work[:, 0])
+    np.multiply(A[:, 1, 0], s[:, 0], out=work[:, 1])
+    # NOTE: out may be s, so s[:, 0] is only overwritten once it is used
+    np.multiply(A[:, 1, 1], s[:, 1], out=out[:, 1])
+    np.add(out[:, 1], work[:, 1], out=out[:, 1])
+    out[:, 0] = work[:, 0]
+    return out
+
+
+#  -------------------------------------------------------------------------
+def RotMatrix90Array(s, out=None):
+    """This function rotates an array of points s (n, 2) 90degrees positively"""
+
+    if out is None:
+        out = np.empty(np.shape(s))
+    if np.may_share_memory(out, s):
+        x = -s[:, 1]
+        out[:, 1] = s[:, 0]
+        out[:, 0] = x
+    else:
+        np.negative(s[:, 1], out=out[:, 0])
+        out[:, 1] = s[:, 0]
+    return out
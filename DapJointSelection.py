@@ -37,6 +37,7 @@
 import FreeCAD
 import os
 import DapTools
+import DapRegistry
 import pivy
 
 import Part
@@ -44,7 +45,6 @@ import math
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -85,23 +85,21 @@ class _CommandDapJoint:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon4.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Joint_alias", "Add New Relative Movement Between 2 Bodies"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Joint_alias", "Add a new relative movement between two bodies"
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Joint_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getActiveContainer() is not None
+        return commandIsActive("Dap_Joint_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -351,10 +349,10 @@ class _DapJoint:
         #  this is a wasteful way of achieving this, since the objects coordinates are changed
         #  within the ui
         if obj.Point1RelMov != "":
-            lcs_obj = doc.getObjectsByLabel(obj.Point1RelMov)[0]
+            lcs_obj = DapTools.getObjectByLabel(doc, obj.Point1RelMov)
             obj.CoordPoint1RelMov = lcs_obj.Placement.Base
         if obj.Point2RelMov != "":
-            lcs_obj = doc.getObjectsByLabel(obj.Point2RelMov)[0]
+            lcs_obj = DapTools.getObjectByLabel(doc, obj.Point2RelMov)
             obj.CoordPoint2RelMov = lcs_obj.Placement.Base
         scale_param = 50000
         joint_index = DapTools.indexOrDefault(JOINT_TYPES, obj.TypeOfRelMov, 0)
@@ -362,12 +360,12 @@ class _DapJoint:
             vol_counter = 0
             vol = 0
             if obj.Body1 != "Ground":
-                body1 = doc.getObjectsByLabel(obj.Body1)
-                vol += body1[0].Shape.Volume
+                body1 = DapTools.getObjectByLabel(doc, obj.Body1)
+                vol += body1.Shape.Volume
                 vol_counter += 1
             if obj.Body2 != "Ground":
-                body2 = doc.getObjectsByLabel(obj.Body2)
-                vol += body2[0].Shape.Volume
+                body2 = DapTools.getObjectByLabel(doc, obj.Body2)
+                vol += body2.Shape.Volume
                 vol_counter += 1
             if vol_counter > 0:
                 vol = vol / vol_counter
@@ -435,6 +433,11 @@ class _DapJoint:
         else:
             obj.Shape = Part.Shape()
 
+    #  -------------------------------------------------------------------------
+    def onChanged(self, obj, prop):
+        """ """
+        DapRegistry.objectChanged(obj, prop, "joints")
+
     #  -------------------------------------------------------------------------
     def __getstate__(self):
         """ """
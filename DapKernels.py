@@ -0,0 +1,368 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import importlib.util
+import numpy as np
+from DapHelperFunctions import RotMatrixArray, RotatePointArray, RotMatrix90Array
+
+# NOTE: Numba is slow to import, so it is only imported once the first kernel
+# is compiled (when the first model is set up), not with this module
+JIT_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# NOTE: the JIT backend is optional; set DAP_NO_JIT in the environment to force
+# the NumPy kernels even if Numba is installed (e.g. to compare both paths).
+# A solver process which solves several models (e.g. a worker of the solver
+# service) selects the backend for each solve with selectKernels(use_jit)
+USE_JIT = JIT_AVAILABLE and "DAP_NO_JIT" not in os.environ
+
+
+#  -------------------------------------------------------------------------
+def jit(function):
+    """Compile function with Numba in nopython mode if the JIT backend is used,
+    otherwise return it unchanged"""
+
+    if USE_JIT:
+        import numba
+
+        return numba.njit(cache=True)(function)
+    return function
+
+
+#  -------------------------------------------------------------------------
+def updatePositionNumpy(
+    r, A, point_body, sPlocal, sP, sP_r, rP, uvector_body, ulocal, uv, uv_r, work
+):
+    """Vectorised position update of all points and unit vectors:
+    sP = A * sPlocal, sP_r = sP rotated by 90 degrees, rP = r + sP
+    u = A * ulocal, u_r = u rotated by 90 degrees
+    where A is the stack of body rotation matrices. The bodies of the points
+    and unit vectors are gathered into the work buffers (see ModelArrays)"""
+
+    A_point, r_point, w_point, rot_point, A_uvector, w_uvector, rot_uvector = work
+    np.take(A, point_body, axis=0, out=A_point, mode="clip")
+    RotatePointArray(A_point, sPlocal, out=sP, work=rot_point)
+    RotMatrix90Array(sP, out=sP_r)
+    np.take(r, point_body, axis=0, out=r_point, mode="clip")
+    np.add(r_point, sP, out=rP)
+    np.take(A, uvector_body, axis=0, out=A_uvector, mode="clip")
+    RotatePointArray(A_uvector, ulocal, out=uv, work=rot_uvector)
+    RotMatrix90Array(uv, out=uv_r)
+
+
+#  -------------------------------------------------------------------------
+def updatePositionLoop(
+    r, A, point_body, sPlocal, sP, sP_r, rP, uvector_body, ulocal, uv, uv_r, work
+):
+    """Same as updatePositionNumpy, written as loops for the JIT backend
+    (which needs no work buffers)"""
+
+    for Pi in range(point_body.shape[0]):
+        Bi = point_body[Pi]
+        x = A[Bi, 0, 0] * sPlocal[Pi, 0] + A[Bi, 0, 1] * sPlocal[Pi, 1]
+        y = A[Bi, 1, 0] * sPlocal[Pi, 0] + A[Bi, 1, 1] * sPlocal[Pi, 1]
+        sP[Pi, 0] = x
+        sP[Pi, 1] = y
+        sP_r[Pi, 0] = -y
+        sP_r[Pi, 1] = x
+        rP[Pi, 0] = r[Bi, 0] + x
+        rP[Pi, 1] = r[Bi, 1] + y
+    for Vi in range(uvector_body.shape[0]):
+        Bi = uvector_body[Vi]
+        x = A[Bi, 0, 0] * ulocal[Vi, 0] + A[Bi, 0, 1] * ulocal[Vi, 1]
+        y = A[Bi, 1, 0] * ulocal[Vi, 0] + A[Bi, 1, 1] * ulocal[Vi, 1]
+        uv[Vi, 0] = x
+        uv[Vi, 1] = y
+        uv_r[Vi, 0] = -y
+        uv_r[Vi, 1] = x
+
+
+#  -------------------------------------------------------------------------
+def updateVelocityNumpy(
+    r_d, p_d, point_body, sP_r, sP_d, rP_d, uvector_body, uv_r, uv_d, work
+):
+    """Vectorised velocity update of all points and unit vectors:
+    sP_d = sP_r * p_d, rP_d = r_d + sP_d, u_d = u_r * p_d"""
+
+    A_point, r_point, w_point, rot_point, A_uvector, w_uvector, rot_uvector = work
+    np.take(p_d, point_body, out=w_point, mode="clip")
+    np.multiply(sP_r[:, 0], w_point, out=sP_d[:, 0])
+    np.multiply(sP_r[:, 1], w_point, out=sP_d[:, 1])
+    np.take(r_d, point_body, axis=0, out=r_point, mode="clip")
+    np.add(r_point, sP_d, out=rP_d)
+    np.take(p_d, uvector_body, out=w_uvector, mode="clip")
+    np.multiply(uv_r[:, 0], w_uvector, out=uv_d[:, 0])
+    np.multiply(uv_r[:, 1], w_uvector, out=uv_d[:, 1])
+
+
+#  -------------------------------------------------------------------------
+def updateVelocityLoop(
+    r_d, p_d, point_body, sP_r, sP_d, rP_d, uvector_body, uv_r, uv_d, work
+):
+    """Same as updateVelocityNumpy, written as loops for the JIT backend"""
+
+    for Pi in range(point_body.shape[0]):
+        Bi = point_body[Pi]
+        x = sP_r[Pi, 0] * p_d[Bi]
+        y = sP_r[Pi, 1] * p_d[Bi]
+        sP_d[Pi, 0] = x
+        sP_d[Pi, 1] = y
+        rP_d[Pi, 0] = r_d[Bi, 0] + x
+        rP_d[Pi, 1] = r_d[Bi, 1] + y
+    for Vi in range(uvector_body.shape[0]):
+        Bi = uvector_body[Vi]
+        uv_d[Vi, 0] = uv_r[Vi, 0] * p_d[Bi]
+        uv_d[Vi, 1] = uv_r[Vi, 1] * p_d[Bi]
+
+
+# The position and velocity kernels in use, selected by selectKernels()
+updatePosition = None
+updateVelocity = None
+# The JIT compiled kernels, compiled on first use
+_jit_kernels = None
+
+
+#  -------------------------------------------------------------------------
+def selectKernels(use_jit=None):
+    """Select the JIT compiled kernels if the JIT backend is used, otherwise
+    the NumPy kernels. use_jit (if not None) first selects whether the JIT
+    backend is used, for the kernels as well as for the evaluators of the
+    models compiled from then on (see jit()); it is only used if Numba is
+    installed and DAP_NO_JIT is not set"""
+
+    global USE_JIT, updatePosition, updateVelocity, _jit_kernels
+    if use_jit is not None:
+        USE_JIT = JIT_AVAILABLE and use_jit and "DAP_NO_JIT" not in os.environ
+    if USE_JIT:
+        if _jit_kernels is None:
+            _jit_kernels = (jit(updatePositionLoop), jit(updateVelocityLoop))
+        updatePosition, updateVelocity = _jit_kernels
+    else:
+        updatePosition = updatePositionNumpy
+        updateVelocity = updateVelocityNumpy
+
+
+# =============================================================================
+class ModelArrays:
+    """The state of a DAP model held in flat float64 arrays, one row per body,
+    point or unit vector (row 0 being ground/the 1-indexing placeholder, which
+    is never moved). The position and velocity updates, as well as the compiled
+    joint and force evaluators, operate on these arrays; toStructs() copies
+    them back into the Bodies, Points and Uvectors structures where the
+    generic evaluators and the post-processing need them.
+    The arrays passed to the compiled evaluators are collected in self.state:
+        (r, p, r_d, p_d, cs, sn, sP, sP_r, rP, sP_d, rP_d, uv, uv_r, uv_d)"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, Bodies, Points, Uvectors):
+        """ """
+        selectKernels()
+        self.nB = len(Bodies)
+        self.nP = len(Points)
+        self.nU = len(Uvectors)
+        # Number of coordinates of the moving bodies
+        self.nc = 3 * (self.nB - 1)
+
+        # Bodies
+        self.r = np.zeros((self.nB, 2))
+        self.p = np.zeros(self.nB)
+        self.r_d = np.zeros((self.nB, 2))
+        self.p_d = np.zeros(self.nB)
+        self.r_dd = np.zeros((self.nB, 2))
+        self.p_dd = np.zeros(self.nB)
+        # Rotation matrices of the bodies, with views on their cosines and sines
+        self.A = np.zeros((self.nB, 2, 2))
+        self.A[:, :, :] = np.eye(2)
+        self.cs = self.A[:, 0, 0]
+        self.sn = self.A[:, 1, 0]
+        for Bi in range(1, self.nB):
+            self.r[Bi, :] = np.ravel(Bodies[Bi, 0].r)
+            self.p[Bi] = Bodies[Bi, 0].p
+            self.r_d[Bi, :] = np.ravel(Bodies[Bi, 0].r_d)
+            self.p_d[Bi] = Bodies[Bi, 0].p_d
+
+        # Points
+        self.point_body = np.zeros(self.nP, dtype=np.int64)
+        self.sPlocal = np.zeros((self.nP, 2))
+        for Pi in range(1, self.nP):
+            if Points[Pi, 0] is None:
+                continue
+            self.point_body[Pi] = Points[Pi, 0].Bindex
+            self.sPlocal[Pi, :] = np.ravel(Points[Pi, 0].sPlocal)
+        self.sP = np.zeros((self.nP, 2))
+        self.sP_r = np.zeros((self.nP, 2))
+        self.rP = np.zeros((self.nP, 2))
+        self.sP_d = np.zeros((self.nP, 2))
+        self.rP_d = np.zeros((self.nP, 2))
+
+        # Unit vectors
+        self.uvector_body = np.zeros(self.nU, dtype=np.int64)
+        self.ulocal = np.zeros((self.nU, 2))
+        for Vi in range(1, self.nU):
+            if Uvectors[Vi, 0] is None:
+                continue
+            self.uvector_body[Vi] = Uvectors[Vi, 0].Bindex
+            self.ulocal[Vi, :] = np.ravel(Uvectors[Vi, 0].ulocal)
+        self.uv = np.zeros((self.nU, 2))
+        self.uv_r = np.zeros((self.nU, 2))
+        self.uv_d = np.zeros((self.nU, 2))
+
+        # Work buffers of the NumPy kernels, into which the rotation matrices,
+        # coordinates and angular velocities of the bodies of the points and
+        # unit vectors are gathered:
+        #     (A_point, r_point, w_point, rot_point,
+        #      A_uvector, w_uvector, rot_uvector)
+        self.work = (
+            np.zeros((self.nP, 2, 2)),
+            np.zeros((self.nP, 2)),
+            np.zeros(self.nP),
+            np.zeros((self.nP, 2)),
+            np.zeros((self.nU, 2, 2)),
+            np.zeros(self.nU),
+            np.zeros((self.nU, 2)),
+        )
+
+        # Time derivative of the state vector u, returned by derivative()
+        self.u_d = np.zeros(6 * self.nB)
+
+        self.state = (
+            self.r,
+            self.p,
+            self.r_d,
+            self.p_d,
+            self.cs,
+            self.sn,
+            self.sP,
+            self.sP_r,
+            self.rP,
+            self.sP_d,
+            self.rP_d,
+            self.uv,
+            self.uv_r,
+            self.uv_d,
+        )
+
+    #  -------------------------------------------------------------------------
+    def unpack(self, u):
+        """Unpack the state vector u into the body coordinates and velocities"""
+
+        q = np.reshape(u[1 : self.nc + 1], (self.nB - 1, 3))
+        q_d = np.reshape(u[self.nc + 1 : 2 * self.nc + 1], (self.nB - 1, 3))
+        self.r[1:, :] = q[:, 0:2]
+        self.p[1:] = q[:, 2]
+        self.r_d[1:, :] = q_d[:, 0:2]
+        self.p_d[1:] = q_d[:, 2]
+
+    #  -------------------------------------------------------------------------
+    def updatePosition(self):
+        """Compute the rotation of each body, then the position of all the points
+        and unit vectors"""
+
+        RotMatrixArray(self.p, out=self.A)
+        updatePosition(
+            self.r,
+            self.A,
+            self.point_body,
+            self.sPlocal,
+            self.sP,
+            self.sP_r,
+            self.rP,
+            self.uvector_body,
+            self.ulocal,
+            self.uv,
+            self.uv_r,
+            self.work,
+        )
+
+    #  -------------------------------------------------------------------------
+    def updateVelocity(self):
+        """Compute the velocity of all the points and unit vectors"""
+
+        updateVelocity(
+            self.r_d,
+            self.p_d,
+            self.point_body,
+            self.sP_r,
+            self.sP_d,
+            self.rP_d,
+            self.uvector_body,
+            self.uv_r,
+            self.uv_d,
+            self.work,
+        )
+
+    #  -------------------------------------------------------------------------
+    def derivative(self, u, c_dd):
+        """Store the body accelerations c_dd and return the time derivative of u.
+        The same array is filled in place and returned on every call"""
+
+        a = np.reshape(c_dd, (self.nB - 1, 3))
+        self.r_dd[1:, :] = a[:, 0:2]
+        self.p_dd[1:] = a[:, 2]
+        self.u_d[1 : self.nc + 1] = u[self.nc + 1 : 2 * self.nc + 1]
+        self.u_d[self.nc + 1 : 2 * self.nc + 1] = np.ravel(c_dd)
+        return self.u_d
+
+    #  -------------------------------------------------------------------------
+    def toStructs(self, Bodies, Points, Uvectors):
+        """Copy the current state back into the Bodies, Points and Uvectors"""
+
+        for Bi in range(1, self.nB):
+            Bodies[Bi, 0].r = self.r[Bi, :, np.newaxis].copy()
+            Bodies[Bi, 0].p = self.p[Bi]
+            Bodies[Bi, 0].r_d = self.r_d[Bi, :, np.newaxis].copy()
+            Bodies[Bi, 0].p_d = self.p_d[Bi]
+            Bodies[Bi, 0].r_dd = self.r_dd[Bi, :, np.newaxis].copy()
+            Bodies[Bi, 0].p_dd = self.p_dd[Bi]
+            Bodies[Bi, 0].A = self.A[Bi].copy()
+        for Pi in range(1, self.nP):
+            if Points[Pi, 0] is None:
+                continue
+            Points[Pi, 0].sP = self.sP[Pi, :, np.newaxis].copy()
+            Points[Pi, 0].sP_r = self.sP_r[Pi, :, np.newaxis].copy()
+            Points[Pi, 0].rP = self.rP[Pi, :, np.newaxis].copy()
+            Points[Pi, 0].sP_d = self.sP_d[Pi, :, np.newaxis].copy()
+            Points[Pi, 0].rP_d = self.rP_d[Pi, :, np.newaxis].copy()
+        for Vi in range(1, self.nU):
+            if Uvectors[Vi, 0] is None:
+                continue
+            Uvectors[Vi, 0].u = self.uv[Vi, :, np.newaxis].copy()
+            Uvectors[Vi, 0].u_r = self.uv_r[Vi, :, np.newaxis].copy()
+            Uvectors[Vi, 0].u_d = self.uv_d[Vi, :, np.newaxis].copy()
@@ -0,0 +1,126 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Mass properties (volume, centre of mass and matrix of inertia) of solids.
+# The integration of a solid by OCC holds the Python GIL, so for large
+# assemblies the solids are exported as BREP strings and integrated in a pool
+# of worker processes, which only import the Part module of FreeCAD.
+
+import os
+import math
+import multiprocessing
+import concurrent.futures
+import FreeCAD
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# Number of worker processes, 1 to integrate all solids in FreeCAD itself
+mass_property_workers = os.cpu_count() or 1
+# Minimum number of solids to integrate in the worker processes; below it the
+# start-up and export costs outweigh the parallel integration
+parallel_threshold = 32
+# The pool is started on first use and kept for later builds
+_executor = None
+
+
+#  -------------------------------------------------------------------------
+def integrateBrep(brep):
+    """Worker process: return the volume, centre of mass and matrix of inertia
+    of the solid in the BREP string brep, as plain numbers"""
+
+    # In a plain interpreter FreeCAD has to be imported before its modules,
+    # as importing it sets up the paths and the application they need
+    import FreeCAD
+    import Part
+
+    solid = Part.Shape()
+    solid.importBrepFromString(brep)
+    return (
+        solid.Volume,
+        tuple(solid.CenterOfMass),
+        tuple(solid.MatrixOfInertia.A),
+    )
+
+
+#  -------------------------------------------------------------------------
+def getExecutor():
+    """Return the pool of worker processes, starting it if needed"""
+
+    global _executor
+    if _executor is None:
+        context = multiprocessing.get_context("spawn")
+        # Inside FreeCAD sys.executable is FreeCAD itself
+        import DapSolverService
+
+        context.set_executable(DapSolverService.findPython())
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=mass_property_workers, mp_context=context
+        )
+    return _executor
+
+
+#  -------------------------------------------------------------------------
+def computeSolidMassProperties(solids):
+    """Return the list of (volume, centre of mass, matrix of inertia) of solids"""
+
+    global mass_property_workers, _executor
+    if mass_property_workers > 1 and len(solids) >= parallel_threshold:
+        try:
+            breps = [solid.exportBrepToString() for solid in solids]
+            chunk_size = int(math.ceil(len(breps) / (4.0 * mass_property_workers)))
+            results = list(
+                getExecutor().map(integrateBrep, breps, chunksize=chunk_size)
+            )
+            return [
+                (volume, FreeCAD.Vector(*centre_of_mass), FreeCAD.Matrix(*matrix))
+                for volume, centre_of_mass, matrix in results
+            ]
+        except Exception as e:
+            FreeCAD.Console.PrintWarning(
+                "Could not compute mass properties in parallel ("
+                + str(e)
+                + "), computing them in FreeCAD for the rest of the session \n"
+            )
+            # Do not start a new pool, only to fail again, on every build
+            mass_property_workers = 1
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+    return [
+        (solid.Volume, solid.CenterOfMass, solid.MatrixOfInertia) for solid in solids
+    ]
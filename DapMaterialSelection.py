@@ -37,12 +37,12 @@
 import FreeCAD
 import os
 import DapTools
+import DapRegistry
 import pivy
 import Part
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -64,24 +64,21 @@ class _CommandDapMaterial:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
 
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon5.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Material_alias", "Define material properties"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Material_alias",
-                "Define the material properties associated with each body.",
-            ),
-        }
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Force_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getActiveContainer() is not None
+        return commandIsActive("Dap_Force_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -137,6 +134,11 @@ class _DapMaterial:
         """ """
         """ Create joint representation part at recompute. """
 
+    #  -------------------------------------------------------------------------
+    def onChanged(self, obj, prop):
+        """ """
+        DapRegistry.objectChanged(obj, prop, "materials")
+
     #  -------------------------------------------------------------------------
     def __getstate__(self):
         """ """
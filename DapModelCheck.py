@@ -0,0 +1,309 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import numpy as np
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# Number of constraint rows of each joint type (a fixed rev or tran joint has
+# one more), as assigned in DapTemp.initialize()
+JOINT_ROWS = {
+    "rev": 2,
+    "tran": 2,
+    "rev_rev": 1,
+    "rev_tran": 1,
+    "rel_rot": 1,
+    "rel_tran": 1,
+    "disc": 2,
+    "rigid": 3,
+}
+# Joint types which connect the bodies of their points, the other joint types
+# refer to their bodies directly
+POINT_JOINTS = ["rev", "tran", "rev_rev", "rev_tran"]
+# Joint types which are driven by a function
+FUNCTION_JOINTS = ["rel_rot", "rel_tran"]
+# Force types which act on their body iBindex
+BODY_FORCES = ["flocal", "f", "trq"]
+# The force types handled by the solver (DapTemp.Force_array)
+FORCE_TYPES = ["weight", "ptp", "rot_sda"] + BODY_FORCES
+
+
+#  -------------------------------------------------------------------------
+def entityName(kind, index, names=None):
+    """Name an entity in a message, by its label if names (a dictionary of
+    lists of labels, in the order of the entities) has one"""
+
+    if names is not None and 0 < index <= len(names.get(kind, [])):
+        return kind + ' "' + str(names[kind][index - 1]) + '"'
+    return kind + " " + str(index)
+
+
+#  -------------------------------------------------------------------------
+def jointRows(joint):
+    """Number of constraint rows of a joint"""
+
+    rows = JOINT_ROWS[joint.type]
+    if joint.type in ["rev", "tran"] and joint.fix == 1:
+        rows += 1
+    return rows
+
+
+#  -------------------------------------------------------------------------
+def checkModel(model, names=None):
+    """Validate the topology of a model before it is initialised, so that a bad
+    model fails at once with a precise message rather than during the solve.
+    Checks that every index refers to an existing entity, that the masses are
+    positive, that every joint connects two different bodies, and counts the
+    degrees of freedom (Gruebler). Bodies which are not connected to the ground
+    by joints (floating) are reported as warnings, as they are valid models.
+    input:
+        model: dictionary with the solver's entity arrays (see readModelFile)
+        names: optional dictionary with the lists of labels of the "Body",
+               "Joint" and "Force" entities, used in the messages
+    returns:
+        dof: number of degrees of freedom
+        warnings: list of warning messages
+    Raises a RuntimeError listing all the errors found"""
+
+    Bodies = model["Bodies"]
+    Points = model["Points"]
+    Uvectors = model["Uvectors"]
+    Joints = model["Joints"]
+    Forces = model["Forces"]
+    nB = len(Bodies)
+    nP = len(Points)
+    nU = len(Uvectors)
+    nFc = len(model["Functs"])
+    errors = []
+    warnings = []
+
+    def checkIndex(owner, what, index, count, first=1):
+        if not first <= index < count:
+            errors.append(
+                owner
+                + " refers to "
+                + what
+                + " "
+                + str(index)
+                + ", but the model has "
+                + str(count - 1)
+                + " "
+                + (what[:-1] + "ies" if what.endswith("y") else what + "s")
+            )
+            return False
+        return True
+
+    if nB < 2:
+        errors.append("The model has no moving bodies")
+    for Bi in range(1, nB):
+        if not (Bodies[Bi, 0].m > 0 and Bodies[Bi, 0].J > 0):
+            errors.append(
+                entityName("Body", Bi, names)
+                + " has a mass of "
+                + str(Bodies[Bi, 0].m)
+                + " and a moment of inertia of "
+                + str(Bodies[Bi, 0].J)
+                + ", both should be positive"
+            )
+    for Pi in range(1, nP):
+        checkIndex("Point " + str(Pi), "body", Points[Pi, 0].Bindex, nB, 0)
+    for Vi in range(1, nU):
+        checkIndex("Unit vector " + str(Vi), "body", Uvectors[Vi, 0].Bindex, nB, 0)
+
+    # The joints, and the bodies which they connect
+    constraints = 0
+    edges = []
+    for Ji in range(1, len(Joints)):
+        joint = Joints[Ji, 0]
+        name = entityName("Joint", Ji, names)
+        if joint.type not in JOINT_ROWS:
+            errors.append(name + ' has an unknown type "' + str(joint.type) + '"')
+            continue
+        constraints += jointRows(joint)
+        if joint.type in POINT_JOINTS:
+            valid = [
+                checkIndex(name, "point", joint.iPindex, nP),
+                checkIndex(name, "point", joint.jPindex, nP),
+            ]
+            if not all(valid):
+                continue
+            Bi = Points[joint.iPindex, 0].Bindex
+            Bj = Points[joint.jPindex, 0].Bindex
+        else:
+            Bi = joint.iBindex
+            Bj = joint.jBindex
+            valid = [
+                checkIndex(name, "body", Bi, nB, 0),
+                checkIndex(name, "body", Bj, nB, 0),
+            ]
+            if not all(valid):
+                continue
+        if joint.type == "tran":
+            pairs = [(joint.iPindex, joint.iUindex), (joint.jPindex, joint.jUindex)]
+            for Pi, Vi in pairs:
+                if checkIndex(name, "unit vector", Vi, nU) and (
+                    Uvectors[Vi, 0].Bindex != Points[Pi, 0].Bindex
+                ):
+                    errors.append(
+                        name
+                        + " has unit vector "
+                        + str(Vi)
+                        + " on body "
+                        + str(Uvectors[Vi, 0].Bindex)
+                        + ", but its point "
+                        + str(Pi)
+                        + " is on body "
+                        + str(Points[Pi, 0].Bindex)
+                    )
+        if joint.type == "rev_tran":
+            checkIndex(name, "unit vector", joint.iUindex, nU)
+        if joint.type in FUNCTION_JOINTS:
+            checkIndex(name, "function", joint.iFunct, nFc)
+        if joint.type == "disc":
+            # A disc rolls on the ground
+            Bj = 0
+        if Bi == 0 and Bj == 0:
+            errors.append(name + " connects the ground to the ground")
+        elif Bi == Bj:
+            errors.append(
+                name + " connects " + entityName("Body", Bi, names) + " to itself"
+            )
+        else:
+            edges.append((Ji, Bi, Bj))
+
+    for Fi in range(1, len(Forces)):
+        force = Forces[Fi, 0]
+        name = entityName("Force", Fi, names)
+        if force.type not in FORCE_TYPES:
+            errors.append(name + ' has an unknown type "' + str(force.type) + '"')
+        elif force.type == "ptp":
+            checkIndex(name, "point", force.iPindex, nP)
+            checkIndex(name, "point", force.jPindex, nP)
+        elif force.type == "rot_sda":
+            checkIndex(name, "body", force.iBindex, nB, 0)
+            checkIndex(name, "body", force.jBindex, nB, 0)
+        elif force.type in BODY_FORCES:
+            checkIndex(name, "body", force.iBindex, nB)
+
+    # Gruebler count: 3 coordinates per moving body less the constraints
+    dof = 3 * (nB - 1) - constraints
+    if dof < 0:
+        errors.append(
+            "The joints impose "
+            + str(constraints)
+            + " constraints on "
+            + str(nB - 1)
+            + " moving bodies ("
+            + str(3 * (nB - 1))
+            + " coordinates), the model is over-constrained by "
+            + str(-dof)
+        )
+    elif dof == 0 and nB > 1:
+        warnings.append("The model has no degrees of freedom, nothing can move")
+
+    if errors:
+        raise RuntimeError("Invalid model:\n  " + "\n  ".join(errors))
+
+    # Bodies and joints which can not be reached from the ground through the
+    # body-joint graph
+    adjacent = [[] for Bi in range(nB)]
+    for Ji, Bi, Bj in edges:
+        adjacent[Bi].append(Bj)
+        adjacent[Bj].append(Bi)
+    grounded = np.zeros(nB, dtype=bool)
+    grounded[0] = True
+    stack = [0]
+    while stack:
+        for Bj in adjacent[stack.pop()]:
+            if not grounded[Bj]:
+                grounded[Bj] = True
+                stack.append(Bj)
+    floating = [Bi for Bi in range(1, nB) if not grounded[Bi]]
+    if floating:
+        message = (
+            ", ".join([entityName("Body", Bi, names) for Bi in floating])
+            + (" is" if len(floating) == 1 else " are")
+            + " not connected to the ground by joints and will move freely"
+        )
+        joints = [Ji for Ji, Bi, Bj in edges if not grounded[Bi]]
+        if joints:
+            message += (
+                " (together with "
+                + ", ".join([entityName("Joint", Ji, names) for Ji in joints])
+                + ")"
+            )
+        warnings.append(message)
+    return dof, warnings
+
+
+#  -------------------------------------------------------------------------
+def checkJacobian(D, Joints, names=None):
+    """Check that the constraints of the joints are independent at the initial
+    configuration, i.e. that the Jacobian D has full row rank; otherwise the
+    coefficient matrix of the equations of motion is singular.
+    input:
+        D: the Jacobian (rows of the constraints, columns of the moving
+           body coordinates)
+        Joints: the solver's joint array, with the row pointers assigned
+        names: optional labels, see checkModel
+    Raises a RuntimeError naming the first joint whose constraints depend on
+    those of the joints before it"""
+
+    nConst = D.shape[0]
+    if nConst == 0 or np.linalg.matrix_rank(D) == nConst:
+        return
+    # Only for an invalid model: find the first joint which does not raise
+    # the rank by its number of rows
+    rank = 0
+    for Ji in range(1, len(Joints)):
+        joint = Joints[Ji, 0]
+        joint_rank = np.linalg.matrix_rank(D[0 : joint.rowe, :])
+        if joint_rank < rank + joint.mrows:
+            raise RuntimeError(
+                "Invalid model:\n  "
+                + str(rank + joint.mrows - joint_rank)
+                + " of the "
+                + str(joint.mrows)
+                + " constraints of "
+                + entityName("Joint", Ji, names)
+                + " ("
+                + str(joint.type)
+                + ") are redundant with those of the joints before it at "
+                + "the initial configuration"
+            )
+        rank = joint_rank
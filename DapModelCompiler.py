@@ -0,0 +1,452 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+
+import os
+import hashlib
+import importlib.util
+import sys
+from DapModelFile import modelInputFiles
+from DapModelCheck import FORCE_TYPES
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# NOTE: bump the version whenever the generated code changes, so that
+# evaluators cached by an older version of the compiler are not reused
+COMPILER_VERSION = 2
+CACHE_FOLDER = "dapCompiled"
+SUPPORTED_JOINTS = ["rev", "tran"]
+# Torques (trq) are left to the generic dispatch of the solver
+SUPPORTED_FORCES = [force for force in FORCE_TYPES if force != "trq"]
+# Arguments of the generated functions, in the order of DapKernels.ModelArrays.state
+STATE_ARGUMENTS = "r, p, r_d, p_d, cs, sn, sP, sP_r, rP, sP_d, rP_d, uv, uv_r, uv_d"
+
+
+#  -------------------------------------------------------------------------
+def hashInputFiles(folder):
+    """Hash the model file (or the generated in*.py input files) of a model,
+    together with the compiler version, to key the cache of compiled
+    evaluators"""
+
+    sha = hashlib.sha1()
+    sha.update(("DapModelCompiler " + str(COMPILER_VERSION)).encode())
+    for file_name in modelInputFiles(folder):
+        sha.update(file_name.encode())
+        with open(os.path.join(folder, file_name), "rb") as fid:
+            sha.update(fid.read())
+    return sha.hexdigest()
+
+
+#  -------------------------------------------------------------------------
+def loadCompiledModel(folder, Bodies, Points, Uvectors, Joints, Forces):
+    """Return the compiled evaluators of the model in folder.
+    The evaluators are loaded from the on-disk cache if the input files have
+    not changed, and are generated (and cached) otherwise.
+    Returns None if the model contains joint or force types which the
+    compiler does not support, in which case the generic dispatch is used"""
+
+    input_hash = hashInputFiles(folder)
+    cache_folder = os.path.join(folder, CACHE_FOLDER)
+    module_name = "dapModel_" + input_hash
+    module_path = os.path.join(cache_folder, module_name + ".py")
+    if not os.path.exists(module_path):
+        compiler = DapModelCompiler(Bodies, Points, Uvectors, Joints, Forces)
+        if not compiler.supported():
+            return None
+        os.makedirs(cache_folder, exist_ok=True)
+        temp_path = module_path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "w") as fid:
+            fid.write(compiler.generate(input_hash))
+        os.replace(temp_path, module_path)
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    # The JIT cache of the evaluators looks the module up by name when it
+    # reloads them in a later session
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# =============================================================================
+class DapModelCompiler:
+    """Generates a straight-line Python module with the constraint, Jacobian,
+    acceleration right-hand side and force evaluators of one initialised DAP
+    model. Joint and force types, row/column offsets and constant parameters
+    are written into the code, so that evaluating the model does not dispatch
+    on type strings.
+    The generated functions work on scalars read from the flat state arrays
+    of DapKernels.ModelArrays (passed as *state) and are compiled by the JIT
+    backend when it is available. They fill the arrays they are given in place:
+        Constraints(*state, phi)
+        Jacobian(t, *state, D)
+        RHSAcc(t, *state, rhs)
+        Force_array(t, *state, g)
+    where phi, rhs and g are 1-D arrays"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, Bodies, Points, Uvectors, Joints, Forces):
+        """ """
+        self.Bodies = Bodies
+        self.Points = Points
+        self.Uvectors = Uvectors
+        self.Joints = Joints
+        self.Forces = Forces
+        self.nB = len(Bodies)
+        self.nJ = len(Joints)
+        self.nF = len(Forces)
+
+    #  -------------------------------------------------------------------------
+    def supported(self):
+        """Check that every joint and force element can be compiled"""
+
+        for Ji in range(1, self.nJ):
+            joint = self.Joints[Ji, 0]
+            if joint.type not in SUPPORTED_JOINTS or joint.fix == 1:
+                return False
+        for Fi in range(1, self.nF):
+            if self.Forces[Fi, 0].type not in SUPPORTED_FORCES:
+                return False
+        return True
+
+    #  -------------------------------------------------------------------------
+    def generate(self, input_hash):
+        """Return the source code of the compiled model"""
+
+        code = []
+        code.append("# Generated by DapModelCompiler - do not edit\n")
+        code.append("# Input hash: " + str(input_hash) + "\n")
+        code.append("import math\n")
+        code.append("from DapKernels import jit\n")
+        code.append("\n\n")
+        code += self.writeConstraints()
+        code.append("\n\n")
+        code += self.writeJacobian()
+        code.append("\n\n")
+        code += self.writeRHSAcc()
+        code.append("\n\n")
+        code += self.writeForceArray()
+        return "".join(code)
+
+    #  -------------------------------------------------------------------------
+    def writeHeader(self, definition):
+        """Decorator and signature of a generated function"""
+
+        return [
+            "@jit\n",
+            "def " + definition.format(STATE_ARGUMENTS) + ":\n",
+        ]
+
+    #  -------------------------------------------------------------------------
+    def writeConstraints(self):
+        """ """
+        code = self.writeHeader("Constraints({}, phi)")
+        for Ji in range(1, self.nJ):
+            joint = self.Joints[Ji, 0]
+            rs = joint.rows - 1
+            Pi = joint.iPindex
+            Pj = joint.jPindex
+            code.append(self.jointComment(Ji))
+            if joint.type == "rev":
+                code.append("    phi[{}] = rP[{}, 0] - rP[{}, 0]\n".format(rs, Pi, Pj))
+                code.append(
+                    "    phi[{}] = rP[{}, 1] - rP[{}, 1]\n".format(rs + 1, Pi, Pj)
+                )
+            elif joint.type == "tran":
+                Ui = joint.iUindex
+                Uj = joint.jUindex
+                code += self.writeDistance(Pi, Pj)
+                code.append(
+                    "    phi[{}] = uv_r[{}, 0] * dx + uv_r[{}, 1] * dy\n".format(
+                        rs, Uj, Uj
+                    )
+                )
+                code.append(
+                    "    phi[{}] = uv_r[{}, 0] * uv[{}, 0] + uv_r[{}, 1] * uv[{}, 1]\n".format(
+                        rs + 1, Uj, Ui, Uj, Ui
+                    )
+                )
+        code.append("    return phi\n")
+        return code
+
+    #  -------------------------------------------------------------------------
+    def writeJacobian(self):
+        """ """
+        code = self.writeHeader("Jacobian(t, {}, D)")
+        code.append("    D[:, :] = 0.0\n")
+        for Ji in range(1, self.nJ):
+            joint = self.Joints[Ji, 0]
+            rs = joint.rows - 1
+            cis = joint.colis - 1
+            cjs = joint.coljs - 1
+            Pi = joint.iPindex
+            Pj = joint.jPindex
+            code.append(self.jointComment(Ji))
+            if joint.type == "rev":
+                if joint.iBindex != 0:
+                    code.append("    D[{}, {}] = 1.0\n".format(rs, cis))
+                    code.append("    D[{}, {}] = 1.0\n".format(rs + 1, cis + 1))
+                    code.append("    D[{}, {}] = sP_r[{}, 0]\n".format(rs, cis + 2, Pi))
+                    code.append(
+                        "    D[{}, {}] = sP_r[{}, 1]\n".format(rs + 1, cis + 2, Pi)
+                    )
+                if joint.jBindex != 0:
+                    code.append("    D[{}, {}] = -1.0\n".format(rs, cjs))
+                    code.append("    D[{}, {}] = -1.0\n".format(rs + 1, cjs + 1))
+                    code.append(
+                        "    D[{}, {}] = -sP_r[{}, 0]\n".format(rs, cjs + 2, Pj)
+                    )
+                    code.append(
+                        "    D[{}, {}] = -sP_r[{}, 1]\n".format(rs + 1, cjs + 2, Pj)
+                    )
+            elif joint.type == "tran":
+                Uj = joint.jUindex
+                if joint.iBindex != 0:
+                    code.append("    D[{}, {}] = uv_r[{}, 0]\n".format(rs, cis, Uj))
+                    code.append(
+                        "    D[{}, {}] = uv_r[{}, 1]\n".format(rs, cis + 1, Uj)
+                    )
+                    code.append(
+                        "    D[{}, {}] = uv[{}, 0] * sP[{}, 0] + uv[{}, 1] * sP[{}, 1]\n".format(
+                            rs, cis + 2, Uj, Pi, Uj, Pi
+                        )
+                    )
+                    code.append("    D[{}, {}] = 1.0\n".format(rs + 1, cis + 2))
+                if joint.jBindex != 0:
+                    code += self.writeDistance(Pi, Pj)
+                    code.append("    D[{}, {}] = -uv_r[{}, 0]\n".format(rs, cjs, Uj))
+                    code.append(
+                        "    D[{}, {}] = -uv_r[{}, 1]\n".format(rs, cjs + 1, Uj)
+                    )
+                    code.append(
+                        "    D[{}, {}] = -(\n".format(rs, cjs + 2)
+                        + "        uv[{0}, 0] * (sP[{1}, 0] + dx) + uv[{0}, 1] * (sP[{1}, 1] + dy)\n".format(
+                            Uj, Pi
+                        )
+                        + "    )\n"
+                    )
+                    code.append("    D[{}, {}] = -1.0\n".format(rs + 1, cjs + 2))
+        code.append("    return D\n")
+        return code
+
+    #  -------------------------------------------------------------------------
+    def writeRHSAcc(self):
+        """ """
+        code = self.writeHeader("RHSAcc(t, {}, rhs)")
+        for Ji in range(1, self.nJ):
+            joint = self.Joints[Ji, 0]
+            rs = joint.rows - 1
+            Pi = joint.iPindex
+            Pj = joint.jPindex
+            code.append(self.jointComment(Ji))
+            if joint.type == "rev":
+                Bi = self.Points[Pi, 0].Bindex
+                Bj = self.Points[Pj, 0].Bindex
+                #  rhs = -(sP_d_i)_r * p_d_i + (sP_d_j)_r * p_d_j, with (s)_r = [-s_y, s_x]
+                if Bi == 0:
+                    code.append(
+                        "    rhs[{}] = -sP_d[{}, 1] * p_d[{}]\n".format(rs, Pj, Bj)
+                    )
+                    code.append(
+                        "    rhs[{}] = sP_d[{}, 0] * p_d[{}]\n".format(rs + 1, Pj, Bj)
+                    )
+                elif Bj == 0:
+                    code.append(
+                        "    rhs[{}] = sP_d[{}, 1] * p_d[{}]\n".format(rs, Pi, Bi)
+                    )
+                    code.append(
+                        "    rhs[{}] = -sP_d[{}, 0] * p_d[{}]\n".format(rs + 1, Pi, Bi)
+                    )
+                else:
+                    code.append(
+                        "    rhs[{}] = sP_d[{}, 1] * p_d[{}] - sP_d[{}, 1] * p_d[{}]\n".format(
+                            rs, Pi, Bi, Pj, Bj
+                        )
+                    )
+                    code.append(
+                        "    rhs[{}] = -sP_d[{}, 0] * p_d[{}] + sP_d[{}, 0] * p_d[{}]\n".format(
+                            rs + 1, Pi, Bi, Pj, Bj
+                        )
+                    )
+            elif joint.type == "tran":
+                Bi = joint.iBindex
+                Bj = joint.jBindex
+                Uj = joint.jUindex
+                if Bi == 0 or Bj == 0:
+                    code.append("    rhs[{}] = 0.0\n".format(rs))
+                else:
+                    #  rhs = u_d_j.(r_i - r_j) * p_d_i - 2 * (u_d_j)_r.(r_d_i - r_d_j)
+                    code.append(
+                        "    rhs[{}] = (\n".format(rs)
+                        + "        (\n"
+                        + "            uv_d[{0}, 0] * (r[{1}, 0] - r[{2}, 0])\n".format(
+                            Uj, Bi, Bj
+                        )
+                        + "            + uv_d[{0}, 1] * (r[{1}, 1] - r[{2}, 1])\n".format(
+                            Uj, Bi, Bj
+                        )
+                        + "        )\n"
+                        + "        * p_d[{}]\n".format(Bi)
+                        + "        - 2\n"
+                        + "        * (\n"
+                        + "            -uv_d[{0}, 1] * (r_d[{1}, 0] - r_d[{2}, 0])\n".format(
+                            Uj, Bi, Bj
+                        )
+                        + "            + uv_d[{0}, 0] * (r_d[{1}, 1] - r_d[{2}, 1])\n".format(
+                            Uj, Bi, Bj
+                        )
+                        + "        )\n"
+                        + "    )\n"
+                    )
+                code.append("    rhs[{}] = 0.0\n".format(rs + 1))
+        code.append("    return rhs\n")
+        return code
+
+    #  -------------------------------------------------------------------------
+    def writeForceArray(self):
+        """ """
+        code = self.writeHeader("Force_array(t, {}, g)")
+        code.append("    g[:] = 0.0\n")
+        for Fi in range(1, self.nF):
+            force = self.Forces[Fi, 0]
+            code.append("    # Force {}: {}\n".format(Fi, force.type))
+            if force.type == "weight":
+                for Bi in range(1, self.nB):
+                    ks = self.Bodies[Bi, 0].irc
+                    wgt = self.Bodies[Bi, 0].wgt
+                    code.append("    g[{}] += {}\n".format(ks, repr(float(wgt[0, 0]))))
+                    code.append(
+                        "    g[{}] += {}\n".format(ks + 1, repr(float(wgt[1, 0])))
+                    )
+            elif force.type == "ptp":
+                Pi = force.iPindex
+                Pj = force.jPindex
+                code += self.writeDistance(Pi, Pj)
+                code.append("    ddx = rP_d[{}, 0] - rP_d[{}, 0]\n".format(Pi, Pj))
+                code.append("    ddy = rP_d[{}, 1] - rP_d[{}, 1]\n".format(Pi, Pj))
+                code.append("    L = math.sqrt(dx * dx + dy * dy)\n")
+                code.append("    L_dot = (dx * ddx + dy * ddy) / L\n")
+                code.append(
+                    "    f = {} * (L - {}) + {} * L_dot + {}\n".format(
+                        repr(float(force.k)),
+                        repr(float(force.L0)),
+                        repr(float(force.dc)),
+                        repr(float(force.f_a)),
+                    )
+                )
+                code.append("    fx = f * (dx / L)\n")
+                code.append("    fy = f * (dy / L)\n")
+                if force.iBindex != 0:
+                    ks = self.Bodies[force.iBindex, 0].irc
+                    code.append("    g[{}] -= fx\n".format(ks))
+                    code.append("    g[{}] -= fy\n".format(ks + 1))
+                    code.append(
+                        "    g[{}] -= sP_r[{}, 0] * fx + sP_r[{}, 1] * fy\n".format(
+                            ks + 2, Pi, Pi
+                        )
+                    )
+                if force.jBindex != 0:
+                    ks = self.Bodies[force.jBindex, 0].irc
+                    code.append("    g[{}] += fx\n".format(ks))
+                    code.append("    g[{}] += fy\n".format(ks + 1))
+                    code.append(
+                        "    g[{}] += sP_r[{}, 0] * fx + sP_r[{}, 1] * fy\n".format(
+                            ks + 2, Pj, Pj
+                        )
+                    )
+            elif force.type == "rot_sda":
+                Bi = force.iBindex
+                Bj = force.jBindex
+                if Bi == 0:
+                    code.append("    theta = -p[{}]\n".format(Bj))
+                    code.append("    theta_d = -p_d[{}]\n".format(Bj))
+                elif Bj == 0:
+                    code.append("    theta = p[{}]\n".format(Bi))
+                    code.append("    theta_d = p_d[{}]\n".format(Bi))
+                else:
+                    code.append("    theta = p[{}] - p[{}]\n".format(Bi, Bj))
+                    code.append("    theta_d = p_d[{}] - p_d[{}]\n".format(Bi, Bj))
+                code.append(
+                    "    T = {} * (theta - {}) + {} * theta_d + {}\n".format(
+                        repr(float(force.k)),
+                        repr(float(force.theta0)),
+                        repr(float(force.dc)),
+                        repr(float(force.T_a)),
+                    )
+                )
+                if Bi != 0:
+                    ks = self.Bodies[Bi, 0].irc
+                    code.append("    g[{}] -= T\n".format(ks + 2))
+                if Bj != 0:
+                    ks = self.Bodies[Bj, 0].irc
+                    code.append("    g[{}] += T\n".format(ks + 2))
+            elif force.type == "flocal" and force.iBindex != 0:
+                Bi = force.iBindex
+                ks = self.Bodies[Bi, 0].irc
+                fx = repr(float(force.flocal[0, 0]))
+                fy = repr(float(force.flocal[1, 0]))
+                code.append(
+                    "    g[{}] += cs[{}] * {} - sn[{}] * {}\n".format(ks, Bi, fx, Bi, fy)
+                )
+                code.append(
+                    "    g[{}] += sn[{}] * {} + cs[{}] * {}\n".format(
+                        ks + 1, Bi, fx, Bi, fy
+                    )
+                )
+            elif force.type == "f" and force.iBindex != 0:
+                ks = self.Bodies[force.iBindex, 0].irc
+                code.append("    g[{}] += {}\n".format(ks, repr(float(force.f[0, 0]))))
+                code.append(
+                    "    g[{}] += {}\n".format(ks + 1, repr(float(force.f[1, 0])))
+                )
+        code.append("    return g\n")
+        return code
+
+    #  -------------------------------------------------------------------------
+    def writeDistance(self, Pi, Pj):
+        """Components of the vector from point Pj to point Pi"""
+
+        return [
+            "    dx = rP[{}, 0] - rP[{}, 0]\n".format(Pi, Pj),
+            "    dy = rP[{}, 1] - rP[{}, 1]\n".format(Pi, Pj),
+        ]
+
+    #  -------------------------------------------------------------------------
+    def jointComment(self, Ji):
+        """ """
+        joint = self.Joints[Ji, 0]
+        return "    # Joint {}: {} between bodies {} and {}\n".format(
+            Ji, joint.type, joint.iBindex, joint.jBindex
+        )
@@ -0,0 +1,238 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import io
+import json
+import zipfile
+import numpy as np
+from DapStructures import (
+    Body_struct,
+    Force_struct,
+    Joint_struct,
+    Point_struct,
+    Unit_struct,
+    Funct_struct,
+)
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+MODEL_VERSION = 1
+MODEL_FILE = "dapModel.npz"
+MANIFEST = "manifest"
+# The generated Python input files which preceded the model file
+INPUT_FILES = [
+    "inBodies.py",
+    "inForces.py",
+    "inFuncts.py",
+    "inJoints.py",
+    "inPoints.py",
+    "inUvectors.py",
+]
+# The entity lists of a model and the structures holding their entities
+ENTITIES = {
+    "Bodies": Body_struct,
+    "Points": Point_struct,
+    "Uvectors": Unit_struct,
+    "Joints": Joint_struct,
+    "Forces": Force_struct,
+    "Functs": Funct_struct,
+}
+
+
+#  -------------------------------------------------------------------------
+def modelInputFiles(folder):
+    """Return the files which define the model in folder: the model file if
+    there is one, or else the generated Python input files"""
+
+    if os.path.exists(os.path.join(folder, MODEL_FILE)):
+        return [MODEL_FILE]
+    return INPUT_FILES
+
+
+#  -------------------------------------------------------------------------
+def modelValue(value):
+    """Convert a field value to a number, string or float array
+    (FreeCAD quantities are converted to their value in base units)"""
+
+    if isinstance(value, np.ndarray):
+        return np.array(value, dtype=np.float64)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bool, int, np.integer)):
+        return int(value)
+    return float(value)
+
+
+#  -------------------------------------------------------------------------
+def writeModelFile(folder, model):
+    """Write a model to the model file of folder in one go.
+    model is a dictionary with the lists of entities of ENTITIES (without the
+    leading None of the solver arrays); every entity is a dictionary of the
+    fields which differ from the defaults of its structure.
+    The file is a NumPy .npz archive with a JSON manifest holding the scalar
+    and string fields, and one array per array field, named
+    <entity list>.<index>.<field>. The archive is written with fixed time
+    stamps, so that the same model always gives the same bytes (the model
+    file is hashed to key the caches of compiled evaluators and results)"""
+
+    manifest = {"version": MODEL_VERSION}
+    arrays = {}
+    for name in ENTITIES:
+        records = []
+        for i, entity in enumerate(model.get(name, [])):
+            record = {}
+            for field, value in entity.items():
+                value = modelValue(value)
+                if isinstance(value, np.ndarray):
+                    arrays[name + "." + str(i + 1) + "." + field] = value
+                else:
+                    record[field] = value
+            records.append(record)
+        manifest[name] = records
+
+    model_path = os.path.join(folder, MODEL_FILE)
+    temp_path = model_path + "." + str(os.getpid()) + ".tmp"
+    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_STORED) as archive:
+        members = [(MANIFEST, np.array(json.dumps(manifest)))]
+        members += list(arrays.items())
+        for member, array in members:
+            buffer = io.BytesIO()
+            np.lib.format.write_array(buffer, array, allow_pickle=False)
+            info = zipfile.ZipInfo(member + ".npy", date_time=(1980, 1, 1, 0, 0, 0))
+            archive.writestr(info, buffer.getvalue())
+    os.replace(temp_path, model_path)
+
+
+#  -------------------------------------------------------------------------
+def readModelFile(folder):
+    """Read the model file of folder into the solver's entity arrays.
+    Returns a dictionary with, for every entity list, an object column array
+    of structures with None in row 0 (the solver does not use 0 indexing)"""
+
+    with np.load(os.path.join(folder, MODEL_FILE), allow_pickle=False) as data:
+        manifest = json.loads(str(data[MANIFEST]))
+        if manifest["version"] != MODEL_VERSION:
+            raise RuntimeError(
+                "Unsupported model file version: " + str(manifest["version"])
+            )
+        model = {}
+        for name, struct in ENTITIES.items():
+            records = manifest[name]
+            entities = np.empty((len(records) + 1, 1), dtype=object)
+            for i, record in enumerate(records):
+                entity = struct()
+                for field, value in record.items():
+                    setattr(entity, field, value)
+                entities[i + 1, 0] = entity
+            model[name] = entities
+        for member in data.files:
+            if member == MANIFEST:
+                continue
+            name, index, field = member.split(".", 2)
+            setattr(model[name][int(index), 0], field, data[member])
+    return model
+
+
+#  -------------------------------------------------------------------------
+def entityArrays(model):
+    """Turn a model as taken by writeModelFile into the solver's entity
+    arrays (as returned by readModelFile), without writing it to a file"""
+
+    arrays = {}
+    for name, struct in ENTITIES.items():
+        records = model.get(name, [])
+        entities = np.empty((len(records) + 1, 1), dtype=object)
+        for i, record in enumerate(records):
+            entity = struct()
+            for field, value in record.items():
+                setattr(entity, field, value)
+            entities[i + 1, 0] = entity
+        arrays[name] = entities
+    return arrays
+
+
+#  -------------------------------------------------------------------------
+def sameValue(value, default):
+    """Determine if a field value is the default value of its field"""
+
+    if type(value) is not type(default):
+        return False
+    if isinstance(value, np.ndarray):
+        return value.dtype == default.dtype and np.array_equal(value, default)
+    return value == default
+
+
+#  -------------------------------------------------------------------------
+def modelFromInputFiles(folder):
+    """Execute the generated Python input files of folder and return the
+    model as a dictionary of entity lists, as taken by writeModelFile"""
+
+    namespace = {"np": np}
+    for struct in ENTITIES.values():
+        namespace[struct.__name__] = struct
+    for file_name in INPUT_FILES:
+        with open(os.path.join(folder, file_name)) as fid:
+            exec(fid.read(), namespace)
+    model = {}
+    for name, struct in ENTITIES.items():
+        defaults = struct().__dict__
+        model[name] = []
+        for entity in np.ravel(namespace[name])[1:]:
+            record = {}
+            for field, value in entity.__dict__.items():
+                if field not in defaults or not sameValue(value, defaults[field]):
+                    record[field] = value
+            model[name].append(record)
+    return model
+
+
+#  -------------------------------------------------------------------------
+def convertInputFiles(folder):
+    """Convert a folder with generated Python input files to a model file"""
+
+    writeModelFile(folder, modelFromInputFiles(folder))
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    import sys
+
+    for folder in sys.argv[1:]:
+        convertInputFiles(folder)
+        print("Converted", folder)
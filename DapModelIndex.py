@@ -0,0 +1,164 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+
+import numpy as np
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+
+#  -------------------------------------------------------------------------
+def buildCSR(owners, nRows):
+    """Build a compressed-row (CSR) adjacency from a list of (row, item) pairs
+    in a single counting pass.
+    input:
+        owners: list of (row, item) pairs, e.g. (body index, point index)
+        nRows: number of rows (bodies, including ground)
+    returns:
+        offsets: array of length nRows + 1; items of row i are
+                 indices[offsets[i]:offsets[i + 1]]
+        indices: array of item indices grouped by row, in input order"""
+
+    counts = np.zeros(nRows, dtype=int)
+    for row, item in owners:
+        counts[row] += 1
+    offsets = np.zeros(nRows + 1, dtype=int)
+    np.cumsum(counts, out=offsets[1:])
+    indices = np.zeros(offsets[-1], dtype=int)
+    cursor = offsets[:-1].copy()
+    for row, item in owners:
+        indices[cursor[row]] = item
+        cursor[row] += 1
+    return offsets, indices
+
+
+# =============================================================================
+class ModelIndex:
+    """Body -> point, unit vector, joint and force adjacency of a DAP model.
+    Built once after initialisation so that the solver and the post-processing
+    can look up the entities attached to a body without scanning all of them.
+    Entities which are None (the 1-indexing placeholder) and bodies with a
+    negative index (ground in the 0-indexed solver) are skipped."""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, nB, Points, Uvectors, Joints, Forces):
+        """ """
+        self.nB = nB
+
+        # %%% Points and unit vectors belong to exactly one body
+        self.point_offsets, self.point_indices = buildCSR(
+            self.owners(Points, ["Bindex"]), nB
+        )
+        self.uvector_offsets, self.uvector_indices = buildCSR(
+            self.owners(Uvectors, ["Bindex"]), nB
+        )
+
+        # %%% Joints and forces can connect two bodies
+        self.joint_offsets, self.joint_indices = buildCSR(
+            self.owners(Joints, ["iBindex", "jBindex"]), nB
+        )
+        self.force_offsets, self.force_indices = buildCSR(
+            self.owners(Forces, ["iBindex", "jBindex"]), nB
+        )
+
+        # %%% Forces grouped by their type, e.g. 'weight', 'ptp', 'rot_sda'
+        self.forces_of_type = {}
+        for Fi in range(len(Forces)):
+            force = Forces[Fi, 0]
+            if force is None:
+                continue
+            self.forces_of_type.setdefault(force.type, []).append(Fi)
+        for force_type in self.forces_of_type:
+            self.forces_of_type[force_type] = np.array(
+                self.forces_of_type[force_type], dtype=int
+            )
+        return
+
+    #  -------------------------------------------------------------------------
+    def owners(self, entities, body_attributes):
+        """Collect (body index, entity index) pairs for the given body attributes
+        Entities connecting a body to itself are only listed once"""
+
+        pairs = []
+        for Ei in range(len(entities)):
+            entity = entities[Ei, 0]
+            if entity is None:
+                continue
+            listed = []
+            for attribute in body_attributes:
+                Bi = int(getattr(entity, attribute))
+                if 0 <= Bi < self.nB and Bi not in listed:
+                    pairs.append((Bi, Ei))
+                    listed.append(Bi)
+        return pairs
+
+    #  -------------------------------------------------------------------------
+    def pointsOfBody(self, Bi):
+        """Indices of the points fixed to body Bi"""
+
+        return self.point_indices[self.point_offsets[Bi] : self.point_offsets[Bi + 1]]
+
+    #  -------------------------------------------------------------------------
+    def uvectorsOfBody(self, Bi):
+        """Indices of the unit vectors fixed to body Bi"""
+
+        return self.uvector_indices[
+            self.uvector_offsets[Bi] : self.uvector_offsets[Bi + 1]
+        ]
+
+    #  -------------------------------------------------------------------------
+    def jointsOfBody(self, Bi):
+        """Indices of the joints connected to body Bi"""
+
+        return self.joint_indices[self.joint_offsets[Bi] : self.joint_offsets[Bi + 1]]
+
+    #  -------------------------------------------------------------------------
+    def forcesOfBody(self, Bi):
+        """Indices of the force elements explicitly attached to body Bi
+        (global forces such as 'weight' are found with forcesOfType)"""
+
+        return self.force_indices[self.force_offsets[Bi] : self.force_offsets[Bi + 1]]
+
+    #  -------------------------------------------------------------------------
+    def forcesOfType(self, force_type):
+        """Indices of all the force elements of the given type"""
+
+        return self.forces_of_type.get(force_type, np.zeros(0, dtype=int))
+
+    #  -------------------------------------------------------------------------
+    def __str__(self):
+        """ """
+        return str(self.__dict__)
@@ -36,11 +36,9 @@
 
 import FreeCAD
 import DapTools
-import os
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -55,23 +53,21 @@ class _CommandDapPlot:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon9.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Plot_alias", "Plot results"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Plot_alias", "Plot results"
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Plot_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getSolverObject().DapResults is not None
+        return commandIsActive("Dap_Plot_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -44,7 +44,6 @@ import Part
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
@@ -69,21 +68,21 @@ class _CommandDapPoint:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
 
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon8.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP("Dap_Point_alias", "Add Point"),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Point_alias", "Creates and defines a point for the DAP analysis"
-            ),
-        }
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Point_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandIsActive
 
-        return DapTools.getActiveContainer() is not None
+        return commandIsActive("Dap_Point_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
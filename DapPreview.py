@@ -0,0 +1,426 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Lightweight 2D preview of the motion of a model in its plane of motion,
+# drawn with matplotlib from the solver's entity arrays and the memory-mapped
+# results store of a run, without FreeCAD or tessellating the CAD geometry:
+#     python -m DapPreview [options] folder
+# Bodies are drawn as outlines in their body-fixed frames: the circle,
+# rectangle or line given by their shape, and lines from the origin of the
+# body to each of its points. Joints are drawn as markers at their points
+# (with the links of rev_rev and rev_tran joints), and point-to-point
+# spring-damper-actuators as lines. All the moving parts of the drawing are
+# computed in one vectorised pass per frame, and only they are redrawn
+# (blitting), so that long runs can be checked in a fraction of a second.
+
+import os
+import sys
+import argparse
+import numpy as np
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# Number of segments of the outline of a circle without circ points
+CIRCLE_SEGMENTS = 48
+# Period between the frames of the preview (msec)
+FRAME_PERIOD = 40
+# Maximum number of reported time steps sampled to set the axis limits
+LIMIT_SAMPLES = 2000
+# Joints drawn with a link between their points
+LINK_JOINTS = ["rev_rev", "rev_tran"]
+# Forces drawn as a line between their points
+SPRING_FORCES = ["ptp"]
+
+
+#  -------------------------------------------------------------------------
+def columns(array):
+    """Return a field holding 2D points as columns as an (n, 2) array"""
+
+    return np.reshape(np.array(array, dtype=float), (2, -1)).T
+
+
+#  -------------------------------------------------------------------------
+def shapeOutline(body):
+    """Return the outline of the shape of a body in its body-fixed frame as
+    an (n, 2) array (without a shape, an empty array)"""
+
+    if body.shape == "circle":
+        outline = columns(body.circ)
+        if len(outline) == 0:
+            angles = np.linspace(0.0, 2.0 * np.pi, CIRCLE_SEGMENTS + 1)
+            outline = body.R * np.column_stack((np.cos(angles), np.sin(angles)))
+        return outline
+    if body.shape == "rect":
+        corners = columns(body.P4)
+        if len(corners) == 0:
+            corners = 0.5 * np.array(
+                [
+                    [-body.W, -body.H],
+                    [body.W, -body.H],
+                    [body.W, body.H],
+                    [-body.W, body.H],
+                ]
+            )
+        return np.concatenate((corners, corners[0:1]))
+    if body.shape == "line":
+        return columns(body.P4)[0:2]
+    return np.zeros((0, 2))
+
+
+#  -------------------------------------------------------------------------
+def pointPairs(pairs):
+    """Return the point indices of line segments between pairs of points,
+    separated by -1 (drawn as a break in the line)"""
+
+    indices = []
+    for i_point, j_point in pairs:
+        indices += [i_point, j_point, -1]
+    return np.array(indices, dtype=int)
+
+
+# =============================================================================
+class PlanarPreview:
+    """2D preview of the bodies, joints and springs of a model.
+    input:
+        Bodies, Points, Joints, Forces: the solver's entity arrays (object
+            column arrays of structures with None in row 0)
+    The state of the bodies is given as their locations r (..., nB, 2) and
+    angles p (..., nB), with the ground in row 0, as in the solver."""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, Bodies, Points, Joints, Forces):
+        """ """
+        self.nB = len(Bodies)
+        self.nP = len(Points)
+
+        # The body and body-fixed coordinates of every point (the ground is
+        # body 0, so that its points stay at their body-fixed coordinates)
+        self.point_body = np.zeros(self.nP, dtype=int)
+        self.sPlocal = np.zeros((self.nP, 2))
+        for Pi in range(1, self.nP):
+            self.point_body[Pi] = int(Points[Pi, 0].Bindex)
+            self.sPlocal[Pi] = np.ravel(Points[Pi, 0].sPlocal)
+        self.ground_points = [
+            Pi for Pi in range(1, self.nP) if self.point_body[Pi] == 0
+        ]
+
+        # The outlines of all the bodies as one line, with the rows of each
+        # outline point giving its body and body-fixed coordinates; rows of
+        # NaN break the line between the polylines
+        outline_body = []
+        outline_local = []
+        gap = np.full((1, 2), np.nan)
+        for Bi in range(1, self.nB):
+            polylines = [shapeOutline(Bodies[Bi, 0])]
+            for Pi in range(1, self.nP):
+                if self.point_body[Pi] == Bi:
+                    polylines.append(np.array([[0.0, 0.0], self.sPlocal[Pi]]))
+            for polyline in polylines:
+                if len(polyline) == 0:
+                    continue
+                outline_local += [polyline, gap]
+                outline_body += [Bi] * (len(polyline) + 1)
+        self.outline_body = np.array(outline_body, dtype=int)
+        self.outline_local = (
+            np.concatenate(outline_local) if outline_local else np.zeros((0, 2))
+        )
+
+        # The points of the joints, the links and the springs
+        joint_points = []
+        links = []
+        for Ji in range(1, len(Joints)):
+            joint = Joints[Ji, 0]
+            for point in [joint.iPindex, joint.jPindex]:
+                if point > 0:
+                    joint_points.append(int(point))
+            if joint.type in LINK_JOINTS:
+                links.append((int(joint.iPindex), int(joint.jPindex)))
+        self.joint_points = np.unique(np.array(joint_points, dtype=int))
+        self.links = pointPairs(links)
+        self.springs = pointPairs(
+            [
+                (int(Forces[Fi, 0].iPindex), int(Forces[Fi, 0].jPindex))
+                for Fi in range(1, len(Forces))
+                if Forces[Fi, 0].type in SPRING_FORCES
+            ]
+        )
+
+        self.figure = None
+        self.axes = None
+        self.animation = None
+
+    #  -------------------------------------------------------------------------
+    def bodyStates(self, u):
+        """Return the locations r (..., nB, 2) and angles p (..., nB) of the
+        bodies in the (rows of the) state vector u"""
+
+        n_coordinates = 3 * (self.nB - 1)
+        u = np.asarray(u)
+        q = u[..., 1 : n_coordinates + 1].reshape(u.shape[:-1] + (self.nB - 1, 3))
+        r = np.zeros(u.shape[:-1] + (self.nB, 2))
+        p = np.zeros(u.shape[:-1] + (self.nB,))
+        r[..., 1:, :] = q[..., 0:2]
+        p[..., 1:] = q[..., 2]
+        return r, p
+
+    #  -------------------------------------------------------------------------
+    @staticmethod
+    def transform(r, p, bodies, local):
+        """Return the global coordinates (..., n, 2) of the body-fixed
+        coordinates local (n, 2) of points on bodies (n)"""
+
+        cos = np.cos(p[..., bodies])
+        sin = np.sin(p[..., bodies])
+        x = r[..., bodies, 0] + cos * local[:, 0] - sin * local[:, 1]
+        y = r[..., bodies, 1] + sin * local[:, 0] + cos * local[:, 1]
+        return np.stack((x, y), axis=-1)
+
+    #  -------------------------------------------------------------------------
+    def pointPositions(self, r, p):
+        """Return the positions rP (..., nP, 2) of all the points"""
+
+        return self.transform(r, p, self.point_body, self.sPlocal)
+
+    #  -------------------------------------------------------------------------
+    def outlines(self, r, p):
+        """Return the outlines of all the bodies as one line (..., n, 2)"""
+
+        return self.transform(r, p, self.outline_body, self.outline_local)
+
+    #  -------------------------------------------------------------------------
+    @staticmethod
+    def segments(rP, indices):
+        """Return the line of the segments between points given by pointPairs()"""
+
+        line = rP[indices]
+        line[indices < 0] = np.nan
+        return line
+
+    #  -------------------------------------------------------------------------
+    def limits(self, r, p):
+        """Return the axis limits (xmin, xmax, ymin, ymax) containing the
+        drawing for the states r and p (..., nB, 2) and (..., nB)"""
+
+        drawn = np.concatenate(
+            (
+                self.outlines(r, p).reshape(-1, 2),
+                self.pointPositions(r, p).reshape(-1, 2),
+            )
+        )
+        low = np.nanmin(drawn, axis=0)
+        high = np.nanmax(drawn, axis=0)
+        margin = 0.05 * max(high[0] - low[0], high[1] - low[1], 1.0e-3)
+        return low[0] - margin, high[0] + margin, low[1] - margin, high[1] + margin
+
+    #  -------------------------------------------------------------------------
+    def createFigure(self, limits):
+        """Create the figure, with the static ground points, and the
+        (animated) artists of the moving parts of the drawing"""
+
+        import matplotlib.pyplot as plt
+
+        self.figure, self.axes = plt.subplots()
+        axes = self.axes
+        axes.set_aspect("equal")
+        axes.set_xlim(limits[0], limits[1])
+        axes.set_ylim(limits[2], limits[3])
+        axes.set_xlabel("x [m]")
+        axes.set_ylabel("y [m]")
+        axes.grid(True)
+        ground = self.sPlocal[self.ground_points]
+        axes.plot(ground[:, 0], ground[:, 1], "ks", markersize=5)
+
+        (self.outline_line,) = axes.plot([], [], "k-", linewidth=1.5, animated=True)
+        (self.link_line,) = axes.plot([], [], "b-", linewidth=1, animated=True)
+        (self.spring_line,) = axes.plot([], [], "m-", linewidth=1, animated=True)
+        (self.joint_markers,) = axes.plot(
+            [], [], "ko", markerfacecolor="w", markersize=5, animated=True
+        )
+        self.time_text = axes.text(
+            0.02, 0.95, "", transform=axes.transAxes, animated=True
+        )
+        self.artists = [
+            self.outline_line,
+            self.link_line,
+            self.spring_line,
+            self.joint_markers,
+            self.time_text,
+        ]
+
+    #  -------------------------------------------------------------------------
+    def setState(self, r, p, time=None):
+        """Move the artists to the state of the bodies r (nB, 2) and p (nB)"""
+
+        rP = self.pointPositions(r, p)
+        outlines = self.outlines(r, p)
+        links = self.segments(rP, self.links)
+        springs = self.segments(rP, self.springs)
+        joints = rP[self.joint_points]
+        self.outline_line.set_data(outlines[:, 0], outlines[:, 1])
+        self.link_line.set_data(links[:, 0], links[:, 1])
+        self.spring_line.set_data(springs[:, 0], springs[:, 1])
+        self.joint_markers.set_data(joints[:, 0], joints[:, 1])
+        if time is not None:
+            self.time_text.set_text("t = {0:.3f} s".format(time))
+        return self.artists
+
+    #  -------------------------------------------------------------------------
+    def show(self, r, p):
+        """Draw the bodies in one state r (nB, 2) and p (nB)"""
+
+        import matplotlib.pyplot as plt
+
+        self.createFigure(self.limits(r, p))
+        for artist in self.artists:
+            artist.set_animated(False)
+        self.setState(r, p)
+        plt.show()
+
+    #  -------------------------------------------------------------------------
+    def animate(self, store, play_speed=1.0, output=None):
+        """Animate the bodies from a results store, read through its memory
+        maps, at play_speed (the real-time factor), skipping reported time
+        steps to keep to the frame period.
+        The animation is shown, or saved to output (e.g. a .gif or .mp4 file).
+        Returns the matplotlib animation, which is kept as self.animation
+        (it stops when it is no longer referenced)"""
+
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        rows = store.rows
+        if rows == 0:
+            raise RuntimeError("The run has not reported any results yet")
+        u = store.channel("u")
+        times = store.channel("time")
+        stride = 1
+        if rows > 1:
+            reporting_time_step = (times[rows - 1] - times[0]) / (rows - 1)
+            stride = max(
+                1, int(round(play_speed * FRAME_PERIOD / 1000.0 / reporting_time_step))
+            )
+        frames = list(range(0, rows, stride))
+        if frames[-1] != rows - 1:
+            frames.append(rows - 1)
+
+        # The limits are taken from a sample of the reported time steps
+        samples = u[:: max(1, rows // LIMIT_SAMPLES)]
+        self.createFigure(self.limits(*self.bodyStates(samples)))
+
+        def update(frame):
+            return self.setState(*self.bodyStates(u[frame]), time=times[frame])
+
+        self.animation = FuncAnimation(
+            self.figure,
+            update,
+            frames=frames,
+            init_func=lambda: self.artists,
+            interval=FRAME_PERIOD,
+            blit=True,
+        )
+        if output is None:
+            plt.show()
+        else:
+            self.animation.save(output, fps=1000.0 / FRAME_PERIOD)
+        return self.animation
+
+
+#  -------------------------------------------------------------------------
+def readEntityArrays(folder):
+    """Return the solver's entity arrays of the model in a run folder"""
+
+    from DapModelFile import (
+        MODEL_FILE,
+        entityArrays,
+        modelFromInputFiles,
+        readModelFile,
+    )
+
+    if os.path.exists(os.path.join(folder, MODEL_FILE)):
+        return readModelFile(folder)
+    return entityArrays(modelFromInputFiles(folder))
+
+
+#  -------------------------------------------------------------------------
+def parseArguments(argv=None):
+    """ """
+    parser = argparse.ArgumentParser(
+        prog="python -m DapPreview",
+        description="Preview the motion of a solved DAP run folder in 2D",
+    )
+    parser.add_argument("folder", help="run folder with a results store")
+    parser.add_argument(
+        "--play-speed",
+        dest="play_speed",
+        type=float,
+        default=1.0,
+        help="simulated seconds played per second (default: 1)",
+    )
+    parser.add_argument(
+        "--output", help="save the animation to this file instead of showing it"
+    )
+    return parser.parse_args(argv)
+
+
+#  -------------------------------------------------------------------------
+def main(argv=None):
+    """ """
+    options = parseArguments(argv)
+    from DapResultsStore import ResultsStore
+
+    if options.output is not None:
+        import matplotlib
+
+        matplotlib.use("Agg")
+    try:
+        model = readEntityArrays(options.folder)
+        preview = PlanarPreview(
+            model["Bodies"], model["Points"], model["Joints"], model["Forces"]
+        )
+        preview.animate(
+            ResultsStore(options.folder), options.play_speed, options.output
+        )
+    except Exception as e:
+        sys.stderr.write(options.folder + ": failed: " + str(e) + "\n")
+        return 1
+    return 0
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
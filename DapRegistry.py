@@ -0,0 +1,211 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Per document index of the objects used by the DAP workbench: all objects by
+# label, the DAP containers and, per type, the members of the active container.
+# The index of a document is built on first use and dropped by a document
+# observer whenever its structure changes (objects are created or deleted, or
+# labels, groups or the active container change), so that lookups such as the
+# IsActive() checks of the commands do not scan the document every time.
+# The registry also counts the changes to each section of the solver model
+# (see DapSolverBuilder.update), so that only the sections which changed since
+# the last solve are regenerated:
+#     structure           objects created, deleted, relabelled or regrouped
+#     geometry            shape or placement of a (non DAP) object changed
+#     bodies              references or type of a DAP body changed
+#     initial_conditions  initial velocities of a DAP body changed
+#     joints, forces      a DAP joint or force changed
+#     materials           the material assignment changed
+#     plane               the plane of motion of the DAP solver changed
+
+import FreeCAD
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# Properties whose change invalidates the index of a document
+INDEXED_PROPERTIES = {"Label", "Group", "IsActiveContainer", "Proxy"}
+# Properties which are (re)computed by the objects or the GUI and do not
+# change the solver model
+OUTPUT_PROPERTIES = {"Shape", "Placement", "Visibility", "Label2"}
+
+_indices = {}
+_change_counts = {}
+_observer = None
+
+
+# =============================================================================
+class _DapDocumentIndex:
+    """Index of the objects of one document"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, doc):
+        """ """
+        from DapContainer import _DapContainer
+
+        self.objects_by_label = {}
+        self.containers = []
+        self.active_container = None
+        self.members = {}
+        # Memo of DapTools.getSolidIndex
+        self.solid_index = {}
+        for obj in doc.Objects:
+            # The first object with a label, as returned by getObjectsByLabel
+            self.objects_by_label.setdefault(obj.Label, obj)
+            if hasattr(obj, "Proxy") and isinstance(obj.Proxy, _DapContainer):
+                self.containers.append(obj)
+                if self.active_container is None and obj.IsActiveContainer:
+                    self.active_container = obj
+
+    #  -------------------------------------------------------------------------
+    def activeMembers(self, type_name):
+        """Return the members of the active container whose name contains
+        type_name (e.g. DapBody)"""
+
+        if self.active_container is None:
+            return []
+        if type_name not in self.members:
+            self.members[type_name] = [
+                obj for obj in self.active_container.Group if type_name in obj.Name
+            ]
+        return self.members[type_name]
+
+
+# =============================================================================
+class _DapDocumentObserver:
+    """Drops the index of a document when its structure changes"""
+
+    #  -------------------------------------------------------------------------
+    def slotCreatedObject(self, obj):
+        """ """
+        invalidate(obj.Document)
+
+    #  -------------------------------------------------------------------------
+    def slotDeletedObject(self, obj):
+        """ """
+        invalidate(obj.Document)
+
+    #  -------------------------------------------------------------------------
+    def slotChangedObject(self, obj, prop):
+        """ """
+        if prop in INDEXED_PROPERTIES:
+            invalidate(obj.Document)
+        elif prop == "Shape" or prop == "Placement":
+            # The DAP objects report their own changes, see objectChanged
+            if not type(getattr(obj, "Proxy", None)).__module__.startswith("Dap"):
+                markChanged(obj.Document, "geometry")
+
+    #  -------------------------------------------------------------------------
+    def slotUndoDocument(self, doc):
+        """ """
+        invalidate(doc)
+
+    #  -------------------------------------------------------------------------
+    def slotRedoDocument(self, doc):
+        """ """
+        invalidate(doc)
+
+    #  -------------------------------------------------------------------------
+    def slotFinishRestoreDocument(self, doc):
+        """ """
+        invalidate(doc)
+
+    #  -------------------------------------------------------------------------
+    def slotDeletedDocument(self, doc):
+        """ """
+        invalidate(doc)
+
+
+#  -------------------------------------------------------------------------
+def invalidate(doc):
+    """Drop the index of a document after a change of its structure"""
+
+    _indices.pop(doc.Name, None)
+    markChanged(doc, "structure")
+
+
+#  -------------------------------------------------------------------------
+def markChanged(doc, section):
+    """Count a change of a section of the solver model of doc"""
+
+    counts = _change_counts.setdefault(doc.Name, {})
+    counts[section] = counts.get(section, 0) + 1
+
+
+#  -------------------------------------------------------------------------
+def objectChanged(obj, prop, section):
+    """Called from onChanged of a DAP object: count a change of section,
+    unless prop is an output property"""
+
+    if prop not in OUTPUT_PROPERTIES:
+        markChanged(obj.Document, section)
+
+
+#  -------------------------------------------------------------------------
+def changeCounts(doc):
+    """Return a copy of the change counts of the sections of doc"""
+
+    return dict(_change_counts.get(doc.Name, {}))
+
+
+#  -------------------------------------------------------------------------
+def getIndex(doc=None):
+    """Return the index of doc (by default the active document), or None if
+    there is no document"""
+
+    if doc is None:
+        doc = FreeCAD.ActiveDocument
+        if doc is None:
+            return None
+    index = _indices.get(doc.Name)
+    if index is None:
+        index = _DapDocumentIndex(doc)
+        _indices[doc.Name] = index
+    return index
+
+
+#  -------------------------------------------------------------------------
+def installObserver():
+    """Add the document observer (once)"""
+
+    global _observer
+    if _observer is None:
+        _observer = _DapDocumentObserver()
+        FreeCAD.addDocumentObserver(_observer)
+
+
+installObserver()
@@ -0,0 +1,413 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Off-screen rendering of the animation of a run to a numbered PNG sequence,
+# at a fixed frame rate and resolution, without playing it in real time.
+# From the animation dialog, the frames are rendered from the 3D view one at a
+# time (the view has a single OpenGL context). Headless, from the command line
+# (with FreeCAD's lib folder on the Python path):
+#     python -m DapRenderFrames [options] document.FCStd folder
+# the parts of the moving bodies are tessellated into a scene of their own,
+# which is rendered by Coin's off-screen renderer; the frames can be rendered
+# in parallel by worker processes, if the OpenGL implementation provides an
+# off-screen context in each of them (e.g. Mesa).
+
+import os
+import sys
+import time
+import argparse
+import concurrent.futures
+import numpy as np
+import FreeCAD
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+FRAME_FILE = "frame_{0:05d}.png"
+# The colours given to the moving bodies in headless rendering, in turn
+BODY_COLOURS = [
+    (0.80, 0.80, 0.80),
+    (0.20, 0.45, 0.75),
+    (0.85, 0.45, 0.15),
+    (0.30, 0.65, 0.30),
+    (0.75, 0.25, 0.30),
+    (0.55, 0.40, 0.70),
+]
+
+
+#  -------------------------------------------------------------------------
+def frameTimes(times, frame_rate, play_speed=1.0):
+    """Return the simulated times of the frames of a clip of the reported
+    times, at frame_rate frames per second of the clip; play_speed is the
+    simulated seconds played per second (the real-time factor)"""
+
+    step = play_speed / frame_rate
+    n_frames = int(np.floor((times[-1] - times[0]) / step + 1.0e-9)) + 1
+    return times[0] + step * np.arange(n_frames)
+
+
+#  -------------------------------------------------------------------------
+def exportFrames(view, show_time, frame_times, folder, width, height):
+    """Render the frames of a 3D view to folder, at a fixed resolution.
+    show_time(t) moves the bodies shown in the view to simulated time t"""
+
+    start_time = time.perf_counter()
+    for frame, frame_time in enumerate(frame_times):
+        show_time(frame_time)
+        view.saveImage(
+            os.path.join(folder, FRAME_FILE.format(frame)), width, height, "Current"
+        )
+    FreeCAD.Console.PrintMessage(
+        "Exported "
+        + str(len(frame_times))
+        + " frames to "
+        + folder
+        + " in "
+        + "%.1f" % (time.perf_counter() - start_time)
+        + " s\n"
+    )
+
+
+#  -------------------------------------------------------------------------
+def rotateByQuaternions(quaternions, points):
+    """Rotate points (n, 3) by the quaternions (x, y, z, w) (..., 4),
+    returning (..., n, 3)"""
+
+    v = quaternions[..., np.newaxis, 0:3]
+    w = quaternions[..., np.newaxis, 3:4]
+    t = 2.0 * np.cross(v, points)
+    return points + w * t + np.cross(v, t)
+
+
+# =============================================================================
+class OffscreenAnimation:
+    """Scene of the moving bodies of the active container of a document,
+    rendered off-screen without the FreeCAD GUI.
+    The parts of each body are tessellated at their global placements, under a
+    transform with the motion of the body from its initial placement (as the
+    scene graph overlay of DapAnimationScene). The orthographic camera looks
+    onto the plane of motion, framing the bodies over all of frame_times.
+    input:
+        document: the (opened) document of the run
+        frame_times: the simulated times of the frames
+        width, height: the resolution of the frames in pixels
+        tolerance: the tessellation tolerance in mm
+    Raises a RuntimeError if the document has no results to render."""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, document, frame_times, width, height, tolerance):
+        """ """
+        import DapTools
+        from pivy import coin
+        from DapBodyMotion import (
+            BodyMotion,
+            centerOfGravityOfSolids,
+            interpolateMotion,
+            readMotion,
+        )
+
+        self.coin = coin
+        solver_object = DapTools.getSolverObject()
+        if solver_object is None:
+            raise RuntimeError(document.Name + " has no DapSolver")
+        moving_body_objects = [
+            body
+            for body in DapTools.getListOfBodyObjects()
+            if body.BodyType == "Moving"
+        ]
+        n_bodies = len(moving_body_objects)
+        times, locations, angles = readMotion(solver_object, n_bodies)[1:]
+        if len(times) == 0:
+            raise RuntimeError("The run has not reported any results yet")
+
+        self.root = coin.SoSeparator()
+        self.camera = coin.SoOrthographicCamera()
+        self.root.addChild(self.camera)
+        self.light = coin.SoDirectionalLight()
+        self.root.addChild(self.light)
+        hints = coin.SoShapeHints()
+        hints.vertexOrdering = coin.SoShapeHints.COUNTERCLOCKWISE
+        hints.shapeType = coin.SoShapeHints.SOLID
+        self.root.addChild(hints)
+
+        self.transforms = []
+        cogs = []
+        # The corners of the bounding box of each body, to frame the camera
+        corners = []
+        for body_number, body_object in enumerate(moving_body_objects):
+            body_separator = coin.SoSeparator()
+            body_transform = coin.SoTransform()
+            body_separator.addChild(body_transform)
+            material = coin.SoMaterial()
+            material.diffuseColor = BODY_COLOURS[body_number % len(BODY_COLOURS)]
+            body_separator.addChild(material)
+            body_solids = []
+            bound_box = FreeCAD.BoundBox()
+            for part_label in body_object.References:
+                part = DapTools.getObjectByLabel(document, part_label)
+                shape = part.Shape.copy()
+                shape.Placement = part.getGlobalPlacement()
+                body_solids += shape.Solids
+                bound_box.add(shape.BoundBox)
+                body_separator.addChild(self.faceSet(shape, tolerance))
+            self.root.addChild(body_separator)
+            self.transforms.append(body_transform)
+            cogs.append(centerOfGravityOfSolids(body_solids))
+            corners.append(
+                [
+                    [x, y, z]
+                    for x in [bound_box.XMin, bound_box.XMax]
+                    for y in [bound_box.YMin, bound_box.YMax]
+                    for z in [bound_box.ZMin, bound_box.ZMax]
+                ]
+            )
+
+        motion = BodyMotion(
+            solver_object.UnitVector,
+            solver_object.global_rotation_matrix,
+            angles[0],
+            cogs,
+            [FreeCAD.Placement() for cog in cogs],
+            1.0e3,
+        )
+        self.bases, self.quaternions = motion.transforms(
+            *interpolateMotion(times, locations, angles, frame_times)
+        )
+        self.frameCamera(motion, np.array(corners), width / height)
+
+        self.renderer = coin.SoOffscreenRenderer(coin.SbViewportRegion(width, height))
+        self.renderer.setBackgroundColor(coin.SbColor(1.0, 1.0, 1.0))
+        if not self.renderer.isWriteSupported("png"):
+            raise RuntimeError("Coin can not write PNG files (simage is missing)")
+
+    #  -------------------------------------------------------------------------
+    def faceSet(self, shape, tolerance):
+        """Return a separator with the triangles of the tessellation of shape"""
+
+        coin = self.coin
+        points, triangles = shape.tessellate(tolerance)
+        separator = coin.SoSeparator()
+        coordinates = coin.SoCoordinate3()
+        coordinates.point.setValues(0, len(points), [[p.x, p.y, p.z] for p in points])
+        separator.addChild(coordinates)
+        faces = coin.SoIndexedFaceSet()
+        indices = []
+        for triangle in triangles:
+            indices += [triangle[0], triangle[1], triangle[2], -1]
+        faces.coordIndex.setValues(0, len(indices), indices)
+        separator.addChild(faces)
+        return separator
+
+    #  -------------------------------------------------------------------------
+    def frameCamera(self, motion, corners, aspect_ratio):
+        """Point the camera at the plane of motion, from the side of its normal,
+        and fit the bodies in all the frames in its view.
+        corners: the corners of the bounding boxes of the bodies (bodies, 8, 3)"""
+
+        x_axis, y_axis = motion.plane_rotation
+        z_axis = np.cross(x_axis, y_axis)
+        # The corners of the bodies in every frame (frames, bodies, 8, 3)
+        moved = rotateByQuaternions(self.quaternions, corners)
+        moved += self.bases[:, :, np.newaxis, :]
+        moved = moved.reshape(-1, 3)
+        low = np.min(moved @ np.array([x_axis, y_axis, z_axis]).T, axis=0)
+        high = np.max(moved @ np.array([x_axis, y_axis, z_axis]).T, axis=0)
+        size = high - low
+        margin = 0.05 * max(size[0], size[1], 1.0)
+        centre = 0.5 * (low + high)
+
+        position = centre[0] * x_axis + centre[1] * y_axis + (high[2] + margin) * z_axis
+        self.camera.position.setValue(*position)
+        self.camera.orientation.setValue(
+            *FreeCAD.Rotation(
+                FreeCAD.Vector(*x_axis),
+                FreeCAD.Vector(*y_axis),
+                FreeCAD.Vector(*z_axis),
+                "ZXY",
+            ).Q
+        )
+        self.camera.aspectRatio = aspect_ratio
+        self.camera.height = max(size[1], size[0] / aspect_ratio) + 2.0 * margin
+        self.camera.nearDistance = 0.5 * margin
+        self.camera.farDistance = size[2] + 2.0 * margin
+        self.light.direction.setValue(*(-z_axis))
+
+    #  -------------------------------------------------------------------------
+    def render(self, frame, path):
+        """Render a frame to a PNG file"""
+
+        for transform, base, quaternion in zip(
+            self.transforms, self.bases[frame], self.quaternions[frame]
+        ):
+            transform.translation.setValue(base[0], base[1], base[2])
+            transform.rotation.setValue(
+                quaternion[0], quaternion[1], quaternion[2], quaternion[3]
+            )
+        if not self.renderer.render(self.root):
+            raise RuntimeError("Could not render off-screen (no OpenGL context)")
+        if not self.renderer.writeToFile(path, "png"):
+            raise RuntimeError("Could not write " + path)
+
+
+#  -------------------------------------------------------------------------
+def renderFrames(document_path, folder, frame_times, frames, options):
+    """Render frames (a range of frame numbers) of the animation of a
+    document to folder, in a worker process.
+    Every worker frames the camera over all frame_times, so that the frames
+    of all the workers match. Returns the number of frames rendered"""
+
+    document = FreeCAD.openDocument(document_path)
+    animation = OffscreenAnimation(
+        document, frame_times, options.width, options.height, options.tolerance
+    )
+    for frame in frames:
+        animation.render(frame, os.path.join(folder, FRAME_FILE.format(frame)))
+    FreeCAD.closeDocument(document.Name)
+    return len(frames)
+
+
+#  -------------------------------------------------------------------------
+def documentFrameTimes(document_path, options):
+    """Return the simulated times of the frames of the animation of a
+    document, for the command line options"""
+
+    import DapTools
+    from DapBodyMotion import readMotion
+
+    document = FreeCAD.openDocument(document_path)
+    solver_object = DapTools.getSolverObject()
+    if solver_object is None:
+        raise RuntimeError(document.Name + " has no DapSolver")
+    n_bodies = len(
+        [body for body in DapTools.getListOfBodyObjects() if body.BodyType == "Moving"]
+    )
+    times = readMotion(solver_object, n_bodies)[1]
+    FreeCAD.closeDocument(document.Name)
+    if len(times) == 0:
+        raise RuntimeError("The run has not reported any results yet")
+    return frameTimes(times, options.frame_rate, options.play_speed)
+
+
+#  -------------------------------------------------------------------------
+def parseArguments(argv=None):
+    """ """
+    parser = argparse.ArgumentParser(
+        prog="python -m DapRenderFrames",
+        description="Render the animation of a solved DAP document off-screen "
+        "to a numbered PNG sequence",
+    )
+    parser.add_argument("document", help="FreeCAD document of the solved run")
+    parser.add_argument("folder", help="folder to write the frames to")
+    parser.add_argument(
+        "--frame-rate",
+        dest="frame_rate",
+        type=float,
+        default=30.0,
+        help="frames per second of the clip (default: 30)",
+    )
+    parser.add_argument(
+        "--play-speed",
+        dest="play_speed",
+        type=float,
+        default=1.0,
+        help="simulated seconds per second of the clip (default: 1)",
+    )
+    parser.add_argument("--width", type=int, default=1920, help="(default: 1920)")
+    parser.add_argument("--height", type=int, default=1080, help="(default: 1080)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="tessellation tolerance in mm (default: 0.1)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes rendering frames in parallel",
+    )
+    return parser.parse_args(argv)
+
+
+#  -------------------------------------------------------------------------
+def main(argv=None):
+    """ """
+    options = parseArguments(argv)
+    start_time = time.perf_counter()
+    document_path = os.path.abspath(options.document)
+    folder = os.path.abspath(options.folder)
+    os.makedirs(folder, exist_ok=True)
+    try:
+        frame_times = documentFrameTimes(document_path, options)
+        n_frames = len(frame_times)
+        if options.workers > 1:
+            # Every worker renders a contiguous range of the frames
+            bounds = np.linspace(0, n_frames, options.workers + 1).astype(int)
+            with concurrent.futures.ProcessPoolExecutor(options.workers) as executor:
+                futures = [
+                    executor.submit(
+                        renderFrames,
+                        document_path,
+                        folder,
+                        frame_times,
+                        range(bounds[worker], bounds[worker + 1]),
+                        options,
+                    )
+                    for worker in range(options.workers)
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            renderFrames(document_path, folder, frame_times, range(n_frames), options)
+    except Exception as e:
+        sys.stderr.write(options.document + ": failed: " + str(e) + "\n")
+        return 1
+    print(
+        "Rendered "
+        + str(n_frames)
+        + " frames to "
+        + folder
+        + " in "
+        + "%.1f" % (time.perf_counter() - start_time)
+        + " s"
+    )
+    return 0
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import json
+import queue
+import shutil
+import threading
+import numpy as np
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+STORE_VERSION = 1
+RESULTS_FOLDER = "dapResults"
+MANIFEST = "manifest.json"
+CHECKPOINT = "dapCheckpoint.npz"
+ABORT = "dapAbort"
+
+
+#  -------------------------------------------------------------------------
+def writeManifest(results_folder, manifest):
+    """Atomically replace the manifest of a results store, so that a reader
+    (or a crash) never sees a partially written manifest"""
+
+    manifest_path = os.path.join(results_folder, MANIFEST)
+    temp_path = manifest_path + "." + str(os.getpid()) + ".tmp"
+    with open(temp_path, "w") as fid:
+        json.dump(manifest, fid, indent=1)
+        fid.flush()
+        os.fsync(fid.fileno())
+    os.replace(temp_path, manifest_path)
+
+
+#  -------------------------------------------------------------------------
+def writeCheckpoint(folder, checkpoint):
+    """Atomically replace the checkpoint of the run in folder with the
+    dictionary of scalars and arrays checkpoint"""
+
+    checkpoint_path = os.path.join(folder, CHECKPOINT)
+    temp_path = checkpoint_path + "." + str(os.getpid()) + ".tmp"
+    with open(temp_path, "wb") as fid:
+        np.savez(fid, **checkpoint)
+        fid.flush()
+        os.fsync(fid.fileno())
+    os.replace(temp_path, checkpoint_path)
+
+
+#  -------------------------------------------------------------------------
+def readCheckpoint(folder):
+    """Return the last checkpoint of the run in folder as a dictionary,
+    or None if there is none"""
+
+    checkpoint_path = os.path.join(folder, CHECKPOINT)
+    if not os.path.exists(checkpoint_path):
+        return None
+    with np.load(checkpoint_path) as data:
+        return {name: data[name] for name in data.files}
+
+
+#  -------------------------------------------------------------------------
+def requestAbort(folder):
+    """Ask the solver of the run in folder to stop; it stops once its next
+    chunk of results has been written, see ResultsWriter"""
+
+    with open(os.path.join(folder, ABORT), "w"):
+        pass
+
+
+# =============================================================================
+class ResultsWriter:
+    """Chunked writer of the binary results store of a run.
+    The solver appends the state vector u at each reporting time; every
+    chunk_size reports the chunk is handed to a background thread, which
+    computes the derived channels, appends all the channels to their binary
+    files and then updates the manifest. Only the rows listed in the manifest
+    are valid, so that a crash leaves a usable partial result.
+    At most a few chunks are held in memory at any time.
+    A checkpoint handed over with a chunk is written to the run folder once
+    the chunk is on disk, so that the results store always holds at least the
+    rows of the last checkpoint.
+    After each chunk the writer checks for an abort request (requestAbort()),
+    and sets abort_requested for the solver to stop at its next report.
+    input:
+        folder: run folder, the store is written to folder/dapResults
+        nu: length of the state vector u
+        derived: dictionary of derived channel names and their row shapes
+        derive: function(time, states) returning a dictionary with the
+                derived channels of a chunk of reported states
+        chunk_size: number of reports per chunk
+        info: dictionary of additional information stored in the manifest
+        append_rows: if not None, the existing store is reopened and appended
+                     to after its first append_rows rows (used when resuming)"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(
+        self,
+        folder,
+        nu,
+        derived=None,
+        derive=None,
+        chunk_size=100,
+        info=None,
+        append_rows=None,
+    ):
+        """ """
+        if derived is None:
+            derived = {}
+        if info is None:
+            info = {}
+        self.folder = folder
+        self.results_folder = os.path.join(folder, RESULTS_FOLDER)
+        self.abort_path = os.path.join(folder, ABORT)
+        self.abort_requested = False
+        if os.path.exists(self.abort_path):
+            os.remove(self.abort_path)
+        self.chunk_size = max(int(chunk_size), 1)
+        self.derive = derive
+        self.shapes = {"time": [], "u": [int(nu)]}
+        for name, shape in derived.items():
+            self.shapes[name] = [int(n) for n in shape]
+
+        channels = {
+            name: {"shape": shape, "dtype": "float64", "file": name + ".f64"}
+            for name, shape in self.shapes.items()
+        }
+        if append_rows is None:
+            # Start a new store, discarding the results and checkpoint of a
+            # previous run
+            if os.path.exists(self.results_folder):
+                shutil.rmtree(self.results_folder)
+            if os.path.exists(os.path.join(folder, CHECKPOINT)):
+                os.remove(os.path.join(folder, CHECKPOINT))
+            os.makedirs(self.results_folder)
+            self.manifest = {
+                "version": STORE_VERSION,
+                "rows": 0,
+                "complete": False,
+                "channels": channels,
+            }
+        else:
+            # Reopen the existing store, dropping any rows after append_rows
+            store = ResultsStore(folder)
+            if store.manifest["channels"] != channels:
+                raise RuntimeError("Results store does not match the model")
+            if store.rows < append_rows:
+                raise RuntimeError("Results store has fewer rows than the checkpoint")
+            self.manifest = store.manifest
+            for channel in channels.values():
+                os.truncate(
+                    os.path.join(self.results_folder, channel["file"]),
+                    append_rows * 8 * int(np.prod(channel["shape"])),
+                )
+            self.manifest["rows"] = int(append_rows)
+            self.manifest["complete"] = False
+        self.manifest.update(info)
+        writeManifest(self.results_folder, self.manifest)
+
+        # Chunk being filled by the solver
+        self.time = np.zeros(self.chunk_size)
+        self.u = np.zeros((self.chunk_size, int(nu)))
+        self.n = 0
+
+        # The background writer
+        self.error = None
+        self.queue = queue.Queue(maxsize=2)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    #  -------------------------------------------------------------------------
+    def append(self, t, u):
+        """Append the state vector u at reporting time t"""
+
+        self.checkError()
+        self.time[self.n] = t
+        self.u[self.n, :] = np.ravel(u)
+        self.n += 1
+        if self.n == self.chunk_size:
+            self.flush()
+
+    #  -------------------------------------------------------------------------
+    def flush(self, checkpoint=None):
+        """Hand the reports gathered so far, and optionally a checkpoint of the
+        state at the last of them, to the background writer
+        (blocks if the writer is more than two chunks behind)"""
+
+        if self.n > 0 or checkpoint is not None:
+            self.queue.put(
+                (self.time[0 : self.n].copy(), self.u[0 : self.n].copy(), checkpoint)
+            )
+            self.n = 0
+
+    #  -------------------------------------------------------------------------
+    def close(self, complete=True, checkpoint=None):
+        """Write the remaining reports (and checkpoint) and wait for the writer
+        to finish. complete is stored in the manifest, to tell a finished run
+        from a partial one"""
+
+        self.flush(checkpoint)
+        self.queue.put(None)
+        self.thread.join()
+        self.checkError()
+        self.manifest["complete"] = complete
+        writeManifest(self.results_folder, self.manifest)
+
+    #  -------------------------------------------------------------------------
+    def checkError(self):
+        """Raise the error of the background writer in the solver thread"""
+
+        if self.error is not None:
+            raise RuntimeError("Could not write results: " + str(self.error))
+
+    #  -------------------------------------------------------------------------
+    def run(self):
+        """Background writer loop"""
+
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            # After an error the remaining chunks are only drained, so that
+            # the solver does not block on a full queue
+            if self.error is None:
+                try:
+                    self.writeChunk(*chunk)
+                except Exception as e:
+                    self.error = e
+            if os.path.exists(self.abort_path):
+                self.abort_requested = True
+
+    #  -------------------------------------------------------------------------
+    def writeChunk(self, time, u, checkpoint):
+        """Append one chunk to the channel files, then update the manifest
+        and write the checkpoint"""
+
+        if len(time) > 0:
+            channels = {"time": time, "u": u}
+            if self.derive is not None:
+                channels.update(self.derive(time, u))
+            for name, channel in self.manifest["channels"].items():
+                data = np.ascontiguousarray(channels[name], dtype=np.float64)
+                file_path = os.path.join(self.results_folder, channel["file"])
+                with open(file_path, "ab") as fid:
+                    fid.write(data.tobytes())
+                    fid.flush()
+                    os.fsync(fid.fileno())
+            self.manifest["rows"] += len(time)
+            writeManifest(self.results_folder, self.manifest)
+        if checkpoint is not None:
+            checkpoint["rows"] = self.manifest["rows"]
+            writeCheckpoint(self.folder, checkpoint)
+
+
+# =============================================================================
+class ResultsStore:
+    """Read access to the binary results store of a run.
+    Channels are returned as read-only memory maps, limited to the rows
+    listed in the manifest. refresh() re-reads the manifest, e.g. to follow
+    a run which is still being written."""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, folder):
+        """ """
+        self.results_folder = os.path.join(folder, RESULTS_FOLDER)
+        self.refresh()
+
+    #  -------------------------------------------------------------------------
+    @staticmethod
+    def exists(folder):
+        """Determine if there is a results store in folder"""
+
+        return os.path.exists(os.path.join(folder, RESULTS_FOLDER, MANIFEST))
+
+    #  -------------------------------------------------------------------------
+    def refresh(self):
+        """(Re-)read the manifest"""
+
+        with open(os.path.join(self.results_folder, MANIFEST)) as fid:
+            self.manifest = json.load(fid)
+        if self.manifest["version"] != STORE_VERSION:
+            raise RuntimeError(
+                "Unsupported results store version: " + str(self.manifest["version"])
+            )
+        self.rows = self.manifest["rows"]
+        self.complete = self.manifest["complete"]
+
+    #  -------------------------------------------------------------------------
+    def channels(self):
+        """Return the list of channel names"""
+
+        return list(self.manifest["channels"].keys())
+
+    #  -------------------------------------------------------------------------
+    def channel(self, name):
+        """Return the valid rows of a channel as a read-only memory map"""
+
+        channel = self.manifest["channels"][name]
+        shape = tuple([self.rows] + channel["shape"])
+        if self.rows == 0:
+            return np.zeros(shape)
+        return np.memmap(
+            os.path.join(self.results_folder, channel["file"]),
+            dtype=channel["dtype"],
+            mode="r",
+            shape=shape,
+        )
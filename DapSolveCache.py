@@ -0,0 +1,198 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import shutil
+import hashlib
+from DapModelFile import modelInputFiles
+from DapResultsStore import RESULTS_FOLDER, MANIFEST, CHECKPOINT, STORE_VERSION
+from DapResultsStore import ResultsStore
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# NOTE: bump the version whenever a change to the solver changes its results,
+# so that results cached by an older version of the solver are not reused
+SOLVER_VERSION = 1
+CACHE_FOLDER = "dapSolveCache"
+SETTINGS_FILE = "dapInputSettings.py"
+# The result set of a solve: the results store, the text outputs and the
+# last checkpoint
+RESULT_FILES = [
+    "DapBodyPositions",
+    "DapBodyVelocities",
+    "DapBodyAccelerations",
+    "DapPointsPositions",
+    "DapPointsVelocities",
+    "DapSystemEnergy",
+    CHECKPOINT,
+]
+# Maximum size of the cache folder of a run folder in bytes; the least
+# recently used result sets are removed beyond this size
+cache_size_limit = 1024**3
+
+
+#  -------------------------------------------------------------------------
+def hashSolveInputs(folder):
+    """Hash the model file (or generated input files) and settings of a solve,
+    together with the solver version, to key the cache of result sets"""
+
+    sha = hashlib.sha1()
+    sha.update(
+        ("DapSolver " + str(SOLVER_VERSION) + " " + str(STORE_VERSION)).encode()
+    )
+    for file_name in modelInputFiles(folder) + [SETTINGS_FILE]:
+        sha.update(file_name.encode())
+        with open(os.path.join(folder, file_name), "rb") as fid:
+            sha.update(fid.read())
+    return sha.hexdigest()
+
+
+#  -------------------------------------------------------------------------
+def resultPaths(folder):
+    """Return the relative paths of the files of the result set in folder"""
+
+    paths = []
+    for file_name in RESULT_FILES:
+        if os.path.exists(os.path.join(folder, file_name)):
+            paths.append(file_name)
+    results_folder = os.path.join(folder, RESULTS_FOLDER)
+    if os.path.isdir(results_folder):
+        for file_name in sorted(os.listdir(results_folder)):
+            if not file_name.endswith(".tmp"):
+                paths.append(os.path.join(RESULTS_FOLDER, file_name))
+    return paths
+
+
+#  -------------------------------------------------------------------------
+def linkFile(source, destination):
+    """Hard link source to destination, or copy it where the file system
+    does not support hard links"""
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+#  -------------------------------------------------------------------------
+def removeResults(folder):
+    """Remove the result set in folder"""
+
+    for file_name in RESULT_FILES:
+        if os.path.exists(os.path.join(folder, file_name)):
+            os.remove(os.path.join(folder, file_name))
+    if os.path.exists(os.path.join(folder, RESULTS_FOLDER)):
+        shutil.rmtree(os.path.join(folder, RESULTS_FOLDER))
+
+
+#  -------------------------------------------------------------------------
+def storeResults(folder, key):
+    """Add the complete result set in folder to the cache under key.
+    The files are hard linked, so that the cache costs no extra disk space
+    as long as the run folder still holds the same results"""
+
+    if not ResultsStore.exists(folder) or not ResultsStore(folder).complete:
+        return
+    cache_folder = os.path.join(folder, CACHE_FOLDER)
+    entry = os.path.join(cache_folder, key)
+    if os.path.exists(entry):
+        shutil.rmtree(entry)
+    temp_entry = entry + "." + str(os.getpid()) + ".tmp"
+    if os.path.exists(temp_entry):
+        shutil.rmtree(temp_entry)
+    os.makedirs(os.path.join(temp_entry, RESULTS_FOLDER))
+    for path in resultPaths(folder):
+        linkFile(os.path.join(folder, path), os.path.join(temp_entry, path))
+    os.replace(temp_entry, entry)
+    pruneCache(folder, keep=key)
+
+
+#  -------------------------------------------------------------------------
+def fetchResults(folder, key):
+    """Replace the result set in folder by the one cached under key.
+    Returns False if there is no such result set"""
+
+    entry = os.path.join(folder, CACHE_FOLDER, key)
+    if not os.path.exists(os.path.join(entry, RESULTS_FOLDER, MANIFEST)):
+        return False
+    removeResults(folder)
+    os.makedirs(os.path.join(folder, RESULTS_FOLDER))
+    for path in resultPaths(entry):
+        linkFile(os.path.join(entry, path), os.path.join(folder, path))
+    # Mark the entry as recently used
+    os.utime(entry)
+    return True
+
+
+#  -------------------------------------------------------------------------
+def unshareResults(folder):
+    """Give every file of the result set in folder which is shared with the
+    cache a private copy, so that the solver does not modify cached results
+    in place (e.g. when appending to the results store on resuming)"""
+
+    for path in resultPaths(folder):
+        file_path = os.path.join(folder, path)
+        if os.stat(file_path).st_nlink > 1:
+            temp_path = file_path + "." + str(os.getpid()) + ".tmp"
+            shutil.copy2(file_path, temp_path)
+            os.replace(temp_path, file_path)
+
+
+#  -------------------------------------------------------------------------
+def pruneCache(folder, keep=None):
+    """Remove the least recently used result sets from the cache of folder
+    until it is smaller than cache_size_limit (the entry keep is retained)"""
+
+    cache_folder = os.path.join(folder, CACHE_FOLDER)
+    entries = []
+    total_size = 0
+    for key in os.listdir(cache_folder):
+        if key.endswith(".tmp"):
+            continue
+        entry = os.path.join(cache_folder, key)
+        size = 0
+        for path in resultPaths(entry):
+            size += os.path.getsize(os.path.join(entry, path))
+        entries.append((os.path.getmtime(entry), size, key))
+        total_size += size
+    for mtime, size, key in sorted(entries):
+        if total_size <= cache_size_limit:
+            break
+        if key != keep:
+            shutil.rmtree(os.path.join(cache_folder, key))
+            total_size -= size
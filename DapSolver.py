@@ -46,6 +46,8 @@ from DapStructures import (
     Funct_struct,
 )
 from DapHelperfunctions import RotMatrix, RotMatrix90
+from DapModelIndex import ModelIndex
+from DapModelFile import MODEL_FILE, readModelFile
 
 # Select if we want to be in debug mode
 global Debug
@@ -66,6 +68,16 @@ class DapSolver:
     #  -------------------------------------------------------------------------
     def readInputFiles(self):
         """ """
+        if os.path.exists(os.path.join(self.folder, MODEL_FILE)):
+            model = readModelFile(self.folder)
+            self.Bodies = model["Bodies"]
+            self.Forces = model["Forces"]
+            self.Functs = model["Functs"]
+            self.Joints = model["Joints"]
+            self.Points = model["Points"]
+            self.Uvectors = model["Uvectors"]
+            return
+        # Folders written before the model file was introduced
         exec(open(os.path.join(self.folder, "inBodies.py")).read())
         exec(open(os.path.join(self.folder, "inForces.py")).read())
         exec(open(os.path.join(self.folder, "inFuncts.py")).read())
@@ -116,14 +128,6 @@ class DapSolver:
                 self.Points[Pi, 0].sP = self.Points[Pi, 0].sPlocal
                 self.Points[Pi, 0].sP_r = RotMatrix90(self.Points[Pi, 0].sP)
                 self.Points[Pi, 0].rP = self.Points[Pi, 0].sP
-            for Bi in range(self.nB):
-                if int(self.Points[Pi, 0].Bindex) == int(Bi):
-                    length = len(
-                        self.Bodies[Bi, 0].pts
-                    )  # current length of pts - Assigned but never used
-                    self.Bodies[Bi, 0].pts = np.concatenate(
-                        (self.Bodies[Bi, 0].pts, np.array([[Pi]])), axis=0
-                    )
         # %%% Unit vectors
         self.nU = len(self.Uvectors)
         for Vi in range(self.nU):
@@ -253,6 +257,13 @@ class DapSolver:
         #        # #functionData(Ci)
         #  Compute number of constraints and determine row/column pointer
         self.nConst = 0
+        # %%% Model index
+        # Body -> points/unit vectors/joints/forces adjacency built in one pass
+        self.Index = ModelIndex(
+            self.nB, self.Points, self.Uvectors, self.Joints, self.Forces
+        )
+        for Bi in range(self.nB):
+            self.Bodies[Bi, 0].pts = np.atleast_2d(self.Index.pointsOfBody(Bi)).T
         # for Ji in range(1,self.nJ):
         #    # self.Joints[Ji, 0].rows = self.nConst
         #    # self.Joints[Ji, 0].rowe = self.nConst + self.Joints[Ji, 0].mrows
@@ -41,6 +41,10 @@ import os
 import sys
 import numpy as np
 import PySide
+import DapModelFile
+import DapModelCheck
+import DapMassProperties
+import DapRegistry
 
 # Select if we want to be in debug mode
 global Debug
@@ -49,6 +53,35 @@ Debug = True
 JOINT_TRANSLATION = {"Rotation": "rev", "Linear Movement": "tran"}
 module_path = DapTools.get_module_path()
 sys.path.append(os.path.join(module_path, "dap_solver"))
+# [solid, (volume, centre of mass, matrix of inertia)] of the solids of each
+# document, keyed by the hash code of the solid. They are kept between builders, so that
+# solving an unchanged assembly again does not repeat the (expensive) mass
+# integrations; a solid whose shape or placement has changed is no longer the
+# same shape (isSame) and is integrated again
+mass_property_cache = {}
+
+
+# Interval in msec at which a solve in the solver service is polled for its
+# events within the GUI
+SERVICE_POLL_PERIOD = 100
+
+# Builders of the solver objects, kept between solves so that only the
+# sections of the model which changed are regenerated
+_builders = {}
+
+
+#  -------------------------------------------------------------------------
+def getBuilder(obj):
+    """Return the builder of the solver object obj, brought up to date"""
+
+    key = (obj.Document.Name, obj.Name)
+    builder = _builders.get(key)
+    if builder is None:
+        builder = DapSolverBuilder(obj)
+        _builders[key] = builder
+    else:
+        builder.update(obj)
+    return builder
 
 
 # =============================================================================
@@ -58,33 +91,85 @@ class DapSolverBuilder:
     def __init__(self, obj):
         """ """
         self.obj = obj
+        self.scale = 1e-3  # convert mm to m
+        self.change_counts = None
+        # The solve which is running in the solver service, if any
+        self.service_job = None
+        self.update(obj)
+
+    #  -------------------------------------------------------------------------
+    def update(self, obj):
+        """Bring the model up to date with the document, regenerating only the
+        sections of the model which changed since the last update (according
+        to the change counts of DapRegistry); the first update builds the
+        whole model"""
+
+        self.obj = obj
+        self.readSettings()
+        change_counts = DapRegistry.changeCounts(self.obj.Document)
+        previous_counts = self.change_counts
+        # Should the update fail, the next one rebuilds the whole model
+        self.change_counts = None
+        if previous_counts is None:
+            changed = None
+        else:
+            changed = {
+                section
+                for section, count in change_counts.items()
+                if previous_counts.get(section) != count
+            }
+            # The task panel sets the plane on every solve, so only a change
+            # of its value counts
+            if "plane" in changed and self.obj.UnitVector == self.plane_norm:
+                changed.remove("plane")
+        if changed is None or changed & {"structure", "geometry", "bodies", "plane"}:
+            self.buildModel()
+        else:
+            if "materials" in changed:
+                self.material_dictionary = self.material_object.MaterialDictionary
+                self.computeMassProperties()
+            if "initial_conditions" in changed:
+                self.processBodyInitialConditions()
+            # The points of joints and forces are relative to the centres of
+            # gravity of the bodies
+            if changed & {"materials", "joints", "forces"}:
+                self.processConnectivity()
+        if changed is None or changed:
+            # The model file has to be written again
+            self.model_folder = None
+        self.change_counts = change_counts
+
+    #  -------------------------------------------------------------------------
+    def readSettings(self):
+        """Read the solve settings, which do not change the model"""
+
+        self.t_initial = self.obj.StartTime
+        self.t_final = self.obj.EndTime
+        self.reporting_time = self.obj.ReportingTimeStep
+        self.resume = self.obj.Resume
+        self.use_solver_service = self.obj.UseSolverService
+        self.spool_folder = self.obj.SpoolFolder
+        self.animate = False
+        self.folder = self.obj.FileDirectory
+
+    #  -------------------------------------------------------------------------
+    def buildModel(self):
+        """Build the whole model"""
+
         self.active_container = DapTools.getActiveContainer()
         self.doc_name = self.active_container.Document.Name
         self.doc = FreeCAD.getDocument(self.doc_name)
         (
             self.parts_shape_list_all,
             self.parent_assembly_all,
+            self.parent_placement_all,
         ) = DapTools.getSolidsFromAllShapes(self.doc)
-        self.dap_points = []
-        self.dap_joints = []
-        self.dap_forces = []
-        self.dap_uvectors = []
-        self.dap_funcs = []
-        self.scale = 1e-3  # convert mm to m
-        self.t_initial = self.obj.StartTime
-        self.t_final = self.obj.EndTime
-        self.reporting_time = self.obj.ReportingTimeStep
-        self.animate = False
-        self.folder = self.obj.FileDirectory
         self.list_of_bodies = DapTools.getListOfBodyLabels()
         self.body_objects = DapTools.getListOfBodyObjects()
         self.material_object = DapTools.getMaterialObject()
         self.list_of_force_ojects = DapTools.getListOfForceObjects()
         if not (self.material_object):
             raise RuntimeError("No material defined")
-        multiple_gravity_bool = DapTools.gravityChecker()
-        if multiple_gravity_bool:
-            raise RuntimeError("More than one gravity was specified")
         self.material_dictionary = self.material_object.MaterialDictionary
 
         if Debug:
@@ -98,22 +183,13 @@ class DapSolverBuilder:
             0, 0, 0
         )  # NOTE assuming for now that plane moves through global origin
 
-        # TODO run a number of validations
-        # Validations to run:
-        # 1.) There are bodies defined
-        # 2.) There are joints defined
-        # 3.) Check to make sure that not only ground parts are specified
-        # 4.) Make sure the same body part is not specified as both a ground and moving
-        # 5.) Check to make sure that there are moving bodies, and that everything is not by default ground
-        # 6.) Throw an error if both bodies of a joint is ground
-
         self.parts_of_bodies = {}
         for body_label in self.list_of_bodies:
-            body_obj = self.doc.getObjectsByLabel(body_label)[0]
+            body_obj = DapTools.getObjectByLabel(self.doc, body_label)
             list_of_parts = body_obj.References
             shape_complete_list = []
             for part in list_of_parts:
-                part_obj = self.doc.getObjectsByLabel(part)[0]
+                part_obj = DapTools.getObjectByLabel(self.doc, part)
                 # body_objects = FreeCAD.
                 # shape_label_list = DapTools.getListOfSolidsFromShape(part_obj, [])
                 shape_label_list = self.parts_shape_list_all[part_obj.Label]
@@ -122,22 +198,76 @@ class DapSolverBuilder:
             self.parts_of_bodies[body_label] = shape_complete_list
         self.listOfMovingBodies()
         self.global_rotation_matrix = self.computeRotationMatrix()
-        self.computeCentreOfGravity()
-        self.computeMomentOfInertia()
+        self.computeMassProperties()
         self.processBodyInitialConditions()
+        self.processConnectivity()
+        self.obj.global_rotation_matrix = self.global_rotation_matrix
+
+    #  -------------------------------------------------------------------------
+    def processConnectivity(self):
+        """(Re)generate the points, unit vectors, joints and forces"""
+
+        multiple_gravity_bool = DapTools.gravityChecker()
+        if multiple_gravity_bool:
+            raise RuntimeError("More than one gravity was specified")
+        self.dap_points = []
+        self.dap_joints = []
+        self.dap_forces = []
+        self.dap_uvectors = []
+        self.dap_funcs = []
         self.processJoints()  # this includes processing points included within joints
         self.processForces()
-        self.obj.global_rotation_matrix = self.global_rotation_matrix
+        self.checkModel()
+
+    #  -------------------------------------------------------------------------
+    def checkModel(self):
+        """Validate the indices, degrees of freedom and connectivity of the
+        generated model (see DapModelCheck), before any of it is solved"""
+
+        dof, warnings = DapModelCheck.checkModel(
+            DapModelFile.entityArrays(
+                {
+                    "Bodies": self.dapBodies(),
+                    "Points": self.dap_points,
+                    "Uvectors": self.dap_uvectors,
+                    "Joints": self.dap_joints,
+                    "Forces": self.dap_forces,
+                    "Functs": self.dap_funcs,
+                }
+            ),
+            {
+                "Body": self.moving_bodies,
+                "Joint": [joint.Label for joint in self.joints],
+                "Force": [force.Label for force in self.list_of_force_ojects],
+            },
+        )
+        for warning in warnings:
+            FreeCAD.Console.PrintWarning(warning + "\n")
+        if Debug:
+            FreeCAD.Console.PrintMessage("Degrees of freedom: " + str(dof) + "\n")
 
     #  -------------------------------------------------------------------------
     def writeInputFiles(self):
-        """ """
-        self.writeBodies()
-        self.writePoints()
-        self.writeJoints()
-        self.writeForces()
-        self.writeFunctions()
-        self.writeUVectors()
+        """Write the model to the model file of the run folder in one go,
+        unless the model file is up to date"""
+        if self.model_folder == self.folder and os.path.exists(
+            os.path.join(self.folder, DapModelFile.MODEL_FILE)
+        ):
+            FreeCAD.Console.PrintMessage("The model has not changed \n")
+            return
+        FreeCAD.Console.PrintMessage("Writing model file \n")
+        DapModelFile.writeModelFile(
+            self.folder,
+            {
+                "Bodies": self.dapBodies(),
+                "Points": self.dap_points,
+                "Uvectors": self.dap_uvectors,
+                "Joints": self.dap_joints,
+                "Forces": self.dap_forces,
+                "Functs": self.dap_funcs,
+            },
+        )
+        self.model_folder = self.folder
 
     #  -------------------------------------------------------------------------
     def processForces(self):
@@ -177,15 +307,11 @@ class DapSolverBuilder:
                 gravity_norm_rotated = (
                     self.global_rotation_matrix * gravity_norm_projected
                 )
-                force["type"] = "'weight'"
+                force["type"] = "weight"
                 force["gravity"] = gravity_mag
-                force["wgt"] = (
-                    "np.array([["
-                    + str(gravity_norm_rotated.x)
-                    + ", "
-                    + str(gravity_norm_rotated.y)
-                    + "]]).T"
-                )
+                force["wgt"] = np.array(
+                    [[gravity_norm_rotated.x, gravity_norm_rotated.y]]
+                ).T
                 # gravity_mag
                 # force['x'] = gravity_norm_rotated.x
                 # force['y'] = gravity_norm_rotated.y
@@ -219,7 +345,7 @@ class DapSolverBuilder:
                         str(force_obj.Label) + ":" + str(Joint2)
                     ] = (jIndex - 1)
                 # self.addJoint(joint_type, iIndex, jIndex)
-                force["type"] = "'ptp'"
+                force["type"] = "ptp"
                 force["iPindex"] = iIndex
                 force["jPindex"] = jIndex
                 force["k"] = k
@@ -242,7 +368,7 @@ class DapSolverBuilder:
                 # if body1_index != 0:
                 #    # self.obj.object_to_point[str(force_obj.Label)] = iIndex - 1
                 # jIndex = self.addDapPointUsingJointCoordAndBodyLabel(body2_index, body2, force_coord_1)
-                force["type"] = "'rot_sda'"
+                force["type"] = "rot_sda"
                 force["iBindex"] = body1_index
                 force["jBindex"] = body2_index
                 force["k"] = rot_stiffness
@@ -376,16 +502,12 @@ class DapSolverBuilder:
             uVector = rotated_vector.normalize()
             uvector_out = {}
             uvector_out["Bindex"] = body_index_1
-            uvector_out["uLocal"] = (
-                "np.array([[" + str(uVector.x) + ", " + str(uVector.y) + "]]).T"
-            )
+            uvector_out["uLocal"] = np.array([[uVector.x, uVector.y]]).T
             self.dap_uvectors.append(uvector_out)
             iIndex = len(self.dap_uvectors)
             uvector_out = {}
             uvector_out["Bindex"] = body_index_2
-            uvector_out["uLocal"] = (
-                "np.array([[" + str(uVector.x) + ", " + str(uVector.y) + "]]).T"
-            )
+            uvector_out["uLocal"] = np.array([[uVector.x, uVector.y]]).T
             self.dap_uvectors.append(uvector_out)
             jIndex = len(self.dap_uvectors)
             # FreeCAD.Console.PrintMessage("UVECTOR: " + str(self.dap_uvectors) + "\n")
@@ -406,7 +528,7 @@ class DapSolverBuilder:
     ):
         """ """
         joint = {}
-        joint["type"] = "'" + str(joint_type) + "'"
+        joint["type"] = str(joint_type)
         if joint_type == "tran" or joint_type == "rev":
             # NOTE: DAP.py is currently not 0 indexing, hence these indices should be 1 indexing
             joint["iPindex"] = iIndex
@@ -434,19 +556,13 @@ class DapSolverBuilder:
         #  if body index =0, then connecting body is ground, and coordinates should be
         #  defined in the global coordinates based on the current logic
         if body_index == 0:
-            point["sPlocal"] = (
-                "np.array([["
-                + str(rotated_coord.x)
-                + ", "
-                + str(rotated_coord.y)
-                + "]]).T"
-            )
+            point["sPlocal"] = np.array([[rotated_coord.x, rotated_coord.y]]).T
         else:
             # FreeCAD.Console.PrintMessage("Body rotated CoG: " + str(self.cog_of_body_rotated[body_label]) + "\n")
             bodyCoG = self.cog_of_body_rotated[body_label]
             x = rotated_coord.x - bodyCoG.x
             y = rotated_coord.y - bodyCoG.y
-            point["sPlocal"] = "np.array([[" + str(x) + ", " + str(y) + "]]).T"
+            point["sPlocal"] = np.array([[x, y]]).T
         self.dap_points.append(point)
         return len(self.dap_points)
 
@@ -515,6 +631,70 @@ class DapSolverBuilder:
         )
         return projected_point
 
+    #  -------------------------------------------------------------------------
+    def computeMassProperties(self):
+        """Compute the mass, centre of gravity and moment of inertia of every body.
+        The shapes of the bodies are resolved and their new solids are integrated
+        in one pass (see mass_property_cache and DapMassProperties), after which
+        the centres of gravity and moments of inertia only combine the stored
+        solid properties with the densities of the materials"""
+
+        self.shape_solids = {}
+        shapes = {}
+        for body_label in self.list_of_bodies:
+            for shape_label in self.parts_of_bodies[body_label]:
+                if shape_label in shapes:
+                    continue
+                # If a part is a subshape of an assemlby, then the part is in the underformed configuration relative
+                # to the placement expression link of the assembly 4 object, therefore have to move the
+                # calculated CoG by the same amount that the subassembly was moved by assembly 4
+                if self.parent_assembly_all[shape_label] != None:
+                    shape_obj = DapTools.getAssemblyObjectByLabel(
+                        self.doc, self.parent_assembly_all[shape_label], shape_label
+                    )
+                else:
+                    shape_obj = DapTools.getObjectByLabel(self.doc, shape_label)
+                # NOTE: Older versions of freecad does not have centerOfGravity function, therefore
+                # rather using centerOfMass, which does not exist for compound shapes.
+                #  Therefore the properties of all the subsolids of a compound shape are stored
+                #  (an empty compound has no mass)
+                shape = shape_obj.Shape
+                if shape.ShapeType == "Compound":
+                    shapes[shape_label] = (True, shape.Solids)
+                else:
+                    shapes[shape_label] = (False, [shape])
+
+        # Look the solids up in the cache; entries are [solid, properties]
+        cached_solids = mass_property_cache.get(self.doc_name, {})
+        used_solids = {}
+        new_entries = []
+        shape_entries = {}
+        for shape_label, (is_compound, solids) in shapes.items():
+            shape_entries[shape_label] = []
+            for solid in solids:
+                key = solid.hashCode()
+                entry = used_solids.get(key, cached_solids.get(key))
+                if entry is None or not entry[0].isSame(solid):
+                    entry = [solid, None]
+                    new_entries.append(entry)
+                used_solids[key] = entry
+                shape_entries[shape_label].append(entry)
+        # Integrate the new solids (in parallel for large assemblies)
+        properties = DapMassProperties.computeSolidMassProperties(
+            [entry[0] for entry in new_entries]
+        )
+        for entry, solid_properties in zip(new_entries, properties):
+            entry[1] = solid_properties
+        for shape_label, (is_compound, solids) in shapes.items():
+            self.shape_solids[shape_label] = (
+                is_compound,
+                [entry[1] for entry in shape_entries[shape_label]],
+            )
+        # Only the solids of the current model are retained
+        mass_property_cache[self.doc_name] = used_solids
+        self.computeCentreOfGravity()
+        self.computeMomentOfInertia()
+
     #  -------------------------------------------------------------------------
     def computeMomentOfInertia(self):
         """ """
@@ -530,33 +710,20 @@ class DapSolverBuilder:
         for body_label in self.list_of_bodies:
             J_global_body = 0
             for shape_label in self.parts_of_bodies[body_label]:
-                # shape_obj = self.doc.getObjectsByLabel(shape_label)[0]
-                if self.parent_assembly_all[shape_label] != None:
-                    shape_obj = DapTools.getAssemblyObjectByLabel(
-                        self.doc, self.parent_assembly_all[shape_label], shape_label
-                    )
-                else:
-                    shape_obj = self.doc.getObjectsByLabel(shape_label)[0]
-                if shape_obj.Shape.ShapeType == "Compound":
-                    if len(shape_obj.Shape.Solids) >= 1:
-                        for i in range(len(shape_obj.Shape.Solids)):
-                            J_global_body += self.computeShapeMomentOfInertia(
-                                shape_obj.Shape.Solids[i], shape_label, body_label
-                            )
-                else:
+                for solid_properties in self.shape_solids[shape_label][1]:
                     J_global_body += self.computeShapeMomentOfInertia(
-                        shape_obj.Shape, shape_label, body_label
+                        solid_properties, shape_label, body_label
                     )
             self.J[body_label] = J_global_body
             FreeCAD.Console.PrintMessage("Total J: " + str(self.J) + "\n")
             # Iij =
 
     #  -------------------------------------------------------------------------
-    def computeShapeMomentOfInertia(self, shape_obj, shape_label, body_label):
+    def computeShapeMomentOfInertia(self, solid_properties, shape_label, body_label):
         """ """
         #  Compound shapes with more than one solid does not have a MatrixOfInertia function
-        #  Therefore creating recursive function to iteratively loop through subsolids
-        Iij = shape_obj.MatrixOfInertia
+        #  Therefore the contribution of each subsolid is computed separately
+        volume, centre_of_mass, Iij = solid_properties
         density = FreeCAD.Units.Quantity(
             self.material_dictionary[shape_label]["density"]
         ).getValueAs("kg/mm^3")
@@ -565,16 +732,13 @@ class DapSolverBuilder:
         # If a part is a subshape of an assemlby, then the part is in the underformed configuration relative
         # to the placement expression link of the assembly 4 object, therefore have to move the
         # calculated CoG by the same amount that the subassembly was moved by assembly 4
-        if self.parent_assembly_all[shape_label] != None:
-            parent_assembly_obj = self.doc.getObjectsByLabel(
-                self.parent_assembly_all[shape_label]
-            )[0]
-            parent_assebly_placement_matrix = parent_assembly_obj.Placement.Matrix
+        parent_assebly_placement_matrix = self.parent_placement_all[shape_label]
+        if parent_assebly_placement_matrix != None:
             centre_of_gravity = (
-                parent_assebly_placement_matrix * shape_obj.CenterOfMass * self.scale
+                parent_assebly_placement_matrix * centre_of_mass * self.scale
             )
         else:
-            centre_of_gravity = shape_obj.CenterOfMass * self.scale
+            centre_of_gravity = centre_of_mass * self.scale
         # Project CoG of shape onto plane and compute distance of projected CoG of current shape to projected
         #  body CoG
         CoG_me_proj = self.projectPointOntoPlane(centre_of_gravity)
@@ -584,23 +748,22 @@ class DapSolverBuilder:
         planar_dist_CoG_to_CogBody = (CoG_body_proj - CoG_me_proj).Length
         # to convert density back to kg/m^3
         density = density / self.scale ** 3
-        shape_mass = shape_obj.Volume * self.scale ** 3 * density
+        shape_mass = volume * self.scale ** 3 * density
         # NOTE: Using parallel axis theoram to compute the moment of inertia of the full body comprised of
         # multiple shapes
         J_body = J + shape_mass * planar_dist_CoG_to_CogBody ** 2
         return J_body
 
     #  -------------------------------------------------------------------------
-    def centerOfGravityOfCompound(self, compound):
+    def centerOfGravityOfCompound(self, solids):
         """Necessary because older versions of FreeCAD do not have centerOfGravity
         and compound shapes do not have centerOfMass"""
 
         totVol = 0
         CoG = FreeCAD.Vector(0, 0, 0)
-        for solid in compound.Shape.Solids:
-            vol = solid.Volume
+        for vol, centre_of_mass, Iij in solids:
             totVol += vol
-            CoG += solid.CenterOfMass * vol
+            CoG += centre_of_mass * vol
         CoG /= totVol
         return CoG, totVol
 
@@ -617,40 +780,20 @@ class DapSolverBuilder:
             total_mass = 0
             centre_of_gravity_global = FreeCAD.Vector(0, 0, 0)
             for shape_label in self.parts_of_bodies[body_label]:
-                # If a part is a subshape of an assemlby, then the part is in the underformed configuration relative
-                # to the placement expression link of the assembly 4 object, therefore have to move the
-                # calculated CoG by the same amount that the subassembly was moved by assembly 4
-                if self.parent_assembly_all[shape_label] != None:
-                    shape_obj = DapTools.getAssemblyObjectByLabel(
-                        self.doc, self.parent_assembly_all[shape_label], shape_label
-                    )
-                    parent_assembly_obj = self.doc.getObjectsByLabel(
-                        self.parent_assembly_all[shape_label]
-                    )[0]
-                    parent_assebly_placement_matrix = (
-                        parent_assembly_obj.Placement.Matrix
-                    )
+                is_compound, solids = self.shape_solids[shape_label]
+                if len(solids) == 0:
+                    continue
+                if is_compound:
+                    centre_of_gravity, volume = self.centerOfGravityOfCompound(solids)
                 else:
-                    shape_obj = self.doc.getObjectsByLabel(shape_label)[0]
-                    parent_assebly_placement_matrix = None
-                # NOTE: Older versions of freecad does not have centerOfGravity function, therefore
-                # rather using centerOfMass, which does not exist for compound shapes.
-                #  Therefore performing the check and if body object is a compound shape
-                #  then perform weighted average of all the subsolid shapes of the compound
-                if shape_obj.Shape.ShapeType == "Compound":
-                    if len(shape_obj.Shape.Solids) >= 1:
-                        centre_of_gravity, volume = self.centerOfGravityOfCompound(
-                            shape_obj
-                        )
-                else:
-                    centre_of_gravity = shape_obj.Shape.CenterOfMass
-                    volume = shape_obj.Shape.Volume
+                    volume, centre_of_gravity, Iij = solids[0]
+                parent_assebly_placement_matrix = self.parent_placement_all[shape_label]
                 if parent_assebly_placement_matrix != None:
                     centre_of_gravity = (
                         parent_assebly_placement_matrix * centre_of_gravity
                     )
-                volume *= self.scale ** 3
-                centre_of_gravity *= self.scale
+                volume = volume * self.scale ** 3
+                centre_of_gravity = centre_of_gravity * self.scale
                 # NOTE: Converting density to base units which is mm?
                 density = FreeCAD.Units.Quantity(
                     self.material_dictionary[shape_label]["density"]
@@ -669,193 +812,44 @@ class DapSolverBuilder:
             )
         # self.obj.BodiesCoG = self.centre_of_gravity_of_body
 
-    # TODO: find a more elegant way of writing the input files instead of line by line writing
-
     #  -------------------------------------------------------------------------
-    def writeBodies(self):
-        """ """
-        FreeCAD.Console.PrintMessage("Writing bodies \n")
-        file_path = os.path.join(self.folder, "inBodies.py")
-        fid = open(file_path, "w")
-        fid.write("global Bodies \n")
-        # for i in range(len(self.list_of_bodies)):
-        for i in range(len(self.moving_bodies)):
-            body_index = self.list_of_bodies.index(self.moving_bodies[i])
-            body_label = self.list_of_bodies[body_index]
-            fid.write("B" + str(i + 1) + " = Body_struct()\n")
-            fid.write(
-                "B"
-                + str(i + 1)
-                + ".m = "
-                + str(self.total_mass_of_body[body_label])
-                + "\n"
-            )
-            fid.write("B" + str(i + 1) + ".J = " + str(self.J[body_label]) + "\n")
-            fid.write(
-                "B"
-                + str(i + 1)
-                + ".r = np.array([["
-                + str(self.cog_of_body_rotated[body_label].x)
-                + ", "
-                + str(self.cog_of_body_rotated[body_label].y)
-                + "]]).T\n"
-            )
-            fid.write("B" + str(i + 1) + ".p = " + str(0) + "\n")
-            fid.write(
-                "B"
-                + str(i + 1)
-                + ".r_d = np.array([["
-                + str(self.body_init[body_label]["init_x"])
-                + ", "
-                + str(self.body_init[body_label]["init_y"])
-                + "]]).T\n"
-            )
-            fid.write(
-                "B"
-                + str(i + 1)
-                + ".p_d = "
-                + str(self.body_init[body_label]["init_p"])
-                + "\n"
-            )
-            fid.write("\n")
-            # bodies.append("B"+str(i))
-        fid.write("Bodies = np.array([[None")
-        for i in range(len(self.moving_bodies)):
-            fid.write(", B" + str(i + 1))
-        fid.write("]]).T\n")
-        fid.close()
+    def dapBodies(self):
+        """Return the list of moving bodies, as entities of the model file"""
+        bodies = []
+        for body_label in self.moving_bodies:
+            body = {}
+            body["m"] = self.total_mass_of_body[body_label]
+            body["J"] = self.J[body_label]
+            body["r"] = np.array(
+                [
+                    [
+                        self.cog_of_body_rotated[body_label].x,
+                        self.cog_of_body_rotated[body_label].y,
+                    ]
+                ]
+            ).T
+            body["p"] = 0
+            body["r_d"] = np.array(
+                [
+                    [
+                        self.body_init[body_label]["init_x"],
+                        self.body_init[body_label]["init_y"],
+                    ]
+                ]
+            ).T
+            body["p_d"] = self.body_init[body_label]["init_p"]
+            bodies.append(body)
+        return bodies
 
     #  -------------------------------------------------------------------------
-    def writePoints(self):
-        """ """
-        # FreeCAD.Console.PrintMessage(str(self.dap_points) + "\n")
-        file_path = os.path.join(self.folder, "inPoints.py")
-        fid = open(file_path, "w")
-        fid.write("global Points\n")
-        for i in range(len(self.dap_points)):
-            fid.write("P" + str(i + 1) + " = Point_struct()\n")
-            for key in self.dap_points[i].keys():
-                fid.write(
-                    "P"
-                    + str(i + 1)
-                    + "."
-                    + str(key)
-                    + " = "
-                    + str(self.dap_points[i][key])
-                    + "\n"
-                )
-            fid.write("\n")
-        fid.write("Points = np.array([[None")
-        for i in range(len(self.dap_points)):
-            fid.write(", P" + str(i + 1))
-        fid.write("]]).T\n")
-        fid.close()
-
-    #  -------------------------------------------------------------------------
-    def writeJoints(self):
-        """ """
-        # FreeCAD.Console.PrintMessage(str(self.dap_joints)+"\n")
-        file_path = os.path.join(self.folder, "inJoints.py")
-        fid = open(file_path, "w")
-        fid.write("global Joints\n")
-        for i in range(len(self.dap_joints)):
-            fid.write("J" + str(i + 1) + " = Joint_struct()\n")
-            for key in self.dap_joints[i].keys():
-                fid.write(
-                    "J"
-                    + str(i + 1)
-                    + "."
-                    + str(key)
-                    + " = "
-                    + str(self.dap_joints[i][key])
-                    + "\n"
-                )
-            fid.write("\n")
-        fid.write("Joints = np.array([[None")
-        for i in range(len(self.dap_joints)):
-            fid.write(", J" + str(i + 1))
-        fid.write("]]).T\n")
-        fid.close()
-
-    #  -------------------------------------------------------------------------
-    def writeForces(self):
-        """ """
-        file_path = os.path.join(self.folder, "inForces.py")
-        fid = open(file_path, "w")
-        fid.write("global Forces\n")
-        for i in range(len(self.dap_forces)):
-            fid.write("F" + str(i + 1) + " = Force_struct()\n")
-            for key in self.dap_forces[i].keys():
-                fid.write(
-                    "F"
-                    + str(i + 1)
-                    + "."
-                    + str(key)
-                    + " = "
-                    + str(self.dap_forces[i][key])
-                    + "\n"
-                )
-            fid.write("\n")
-        fid.write("Forces = np.array([[None")
-        for i in range(len(self.dap_forces)):
-            fid.write(", F" + str(i + 1))
-        fid.write("]]).T\n")
-        fid.close()
-
-    #  -------------------------------------------------------------------------
-    def writeFunctions(self):
-        """ """
-        file_path = os.path.join(self.folder, "inFuncts.py")
-        fid = open(file_path, "w")
-        fid.write("global Functs\n")
-        for i in range(len(self.dap_funcs)):
-            fid.write("F" + str(i + 1) + " = Funct_struct()\n")
-            for key in self.dap_funcs[i].keys():
-                fid.write(
-                    "F"
-                    + str(i + 1)
-                    + "."
-                    + str(key)
-                    + " = "
-                    + str(self.dap_funcs[i][key])
-                    + "\n"
-                )
-            fid.write("\n")
-        # TODO include writer for functions
-        fid.write("\n")
-        fid.write("Functs = np.array([[None")
-        for i in range(len(self.dap_funcs)):
-            fid.write(", F" + str(i + 1))
-        fid.write("]]).T\n")
-
-    #  -------------------------------------------------------------------------
-    def writeUVectors(self):
-        """ """
-        file_path = os.path.join(self.folder, "inUvectors.py")
-        fid = open(file_path, "w")
-        fid.write("global Uvectors\n")
-        for i in range(len(self.dap_uvectors)):
-            fid.write("U" + str(i + 1) + " = Unit_struct()\n")
-            for key in self.dap_uvectors[i].keys():
-                fid.write(
-                    "U"
-                    + str(i + 1)
-                    + "."
-                    + str(key)
-                    + " = "
-                    + str(self.dap_uvectors[i][key])
-                    + "\n"
-                )
-        # TODO include writer for UVectors, needed for translational joints
-        fid.write("\n")
-        fid.write("Uvectors = np.array([[None")
-        for i in range(len(self.dap_uvectors)):
-            fid.write(", U" + str(i + 1))
-        fid.write("]]).T\n")
-
-    #  -------------------------------------------------------------------------
-    def solve(self):
-        """ """
+    def solve(self, progress=None):
+        """progress: optional function(event) receiving the events of a solve
+        in the solver service (see DapSolverService)"""
+        if self.solving():
+            FreeCAD.Console.PrintError(
+                "The run is still being solved in the solver service \n"
+            )
+            return
         # NOTE: Temporary for temp dap python solver, create input settings file that can be read by main solver
         inputFile = os.path.join(self.folder, "dapInputSettings.py")
         fid = open(inputFile, "w")
@@ -888,6 +882,24 @@ class DapSolverBuilder:
         # import os
         # result = subprocess.run(["python", dap_solver, self.folder])
         # os.system(dap_solver + " " + str(self.folder))
+        import DapSolveCache
+
+        # Reuse the results of an earlier solve of exactly the same inputs
+        solve_key = DapSolveCache.hashSolveInputs(self.folder)
+        if DapSolveCache.fetchResults(self.folder, solve_key):
+            FreeCAD.Console.PrintMessage(
+                "The inputs have not changed, using the cached results \n"
+            )
+            self.loadResults()
+            return
+        if self.spool_folder != "":
+            self.solveInSpool(solve_key)
+            return
+
+        FreeCAD.Console.PrintMessage("DAP solver started.\n")
+        if self.use_solver_service:
+            self.solveInService(solve_key, progress)
+            return
         import DapTemp
 
         DapTemp.folder = self.folder
@@ -896,25 +908,136 @@ class DapSolverBuilder:
         DapTemp.t_initial = self.t_initial
         DapTemp.dt = self.reporting_time
         DapTemp.t_final = self.t_final
-        FreeCAD.Console.PrintMessage("DAP solver started.\n")
+        DapTemp.resume = self.resume
         solution_success = DapTemp.solve()
+        write_success = False
         if solution_success:
-            FreeCAD.Console.PrintMessage("Solver solved Successfully \n")
             DapTemp.writeOutputs()
-            if DapTemp.write_success:
+            write_success = DapTemp.write_success
+        self.finishSolve(solve_key, solution_success, write_success)
+        # FreeCAD.Console.PrintMessage("Python runnable" + sys.executable + "\n")
+        # result = subprocess.run([sys.executable, dap_solver, self.folder])
+        # FreeCAD.Console.PrintMessage(result)
+
+    #  -------------------------------------------------------------------------
+    def finishSolve(self, solve_key, solution_success, write_success):
+        """Keep the results of a solve in the solve cache and load them"""
+
+        import DapSolveCache
+
+        if solution_success:
+            FreeCAD.Console.PrintMessage("Solver solved Successfully \n")
+            if write_success:
+                DapSolveCache.storeResults(self.folder, solve_key)
                 FreeCAD.Console.PrintMessage(
                     "Results successfully loaded. Should now be able to animate and \
 plot the generated results \n"
                 )
                 self.loadResults()
         else:
+            FreeCAD.Console.PrintError("There was an error solving the system \n")
+
+    #  -------------------------------------------------------------------------
+    def solving(self):
+        """Determine if the run is being solved in the solver service"""
+
+        return self.service_job is not None
+
+    #  -------------------------------------------------------------------------
+    def solveInSpool(self, solve_key):
+        """Submit the run folder as a job to the spool folder, to be solved by
+        the spool workers, or load the results of the job once it is done"""
+
+        import DapSolveCache
+        import DapSolverSpool
+
+        status = DapSolverSpool.jobStatus(self.spool_folder, solve_key)
+        if status == "done":
+            DapSolverSpool.fetchJobResults(self.spool_folder, solve_key, self.folder)
+            DapSolveCache.storeResults(self.folder, solve_key)
+            FreeCAD.Console.PrintMessage(
+                "Results of spool job " + solve_key + " loaded \n"
+            )
+            self.loadResults()
+            return
+        if status == "incoming" or status == "running":
+            FreeCAD.Console.PrintMessage(
+                "Spool job " + solve_key + " is " + status + ". Solve again once \
+it is done to load its results \n"
+            )
+            return
+        if status == "failed":
+            FreeCAD.Console.PrintError(
+                "Spool job "
+                + solve_key
+                + " failed: "
+                + DapSolverSpool.jobError(self.spool_folder, solve_key)
+                + "Submitting it again \n"
+            )
+        DapSolverSpool.submitJob(
+            self.spool_folder, self.folder, solve_key, {"resume": self.resume}
+        )
+        FreeCAD.Console.PrintMessage(
+            "Submitted spool job " + solve_key + ". Solve again once it is done \
+to load its results \n"
+        )
+
+    #  -------------------------------------------------------------------------
+    def solveInService(self, solve_key, progress=None):
+        """Solve the run folder in the local solver service (starting it if it
+        is not running), passing its events to progress.
+        Within the GUI the solve does not block FreeCAD: its events are polled
+        by a timer, so that the run can be animated while it is being solved,
+        and its results are loaded when it is done"""
+
+        import DapSolveCache
+        import DapSolverService
+
+        # Remove the results of the previous run now, rather than once the
+        # service starts the job, so that the animation does not open them
+        # instead of following the new run
+        if not self.resume:
+            DapSolveCache.removeResults(self.folder)
+        self.service_job = DapSolverService.DapSolverJob(
+            self.folder, {"resume": self.resume}
+        )
+        self.service_solve_key = solve_key
+        self.service_progress = progress
+        if FreeCAD.GuiUp:
+            self.service_timer = PySide.QtCore.QTimer()
+            self.service_timer.setInterval(SERVICE_POLL_PERIOD)
+            self.service_timer.timeout.connect(self.pollServiceJob)
+            self.service_timer.start()
+        else:
+            self.pollServiceJob(self.service_job.wait())
+
+    #  -------------------------------------------------------------------------
+    def pollServiceJob(self, events=None):
+        """Pass the new events of the solve in the solver service to progress,
+        and finish the solve once it is done"""
+
+        job = self.service_job
+        if events is None:
+            events = job.poll()
+        if self.service_progress is not None:
+            for event in events:
+                self.service_progress(event)
+        event = job.final_event
+        if event is None:
+            return
+        if FreeCAD.GuiUp:
+            self.service_timer.stop()
+        self.service_job = None
+        if event["event"] != "finished":
             FreeCAD.Console.PrintError(
-                "There was an error solving the system. Proper error checking has not yet been\
-included. \n"
+                "Solver service: " + event.get("error", "solve failed") + "\n"
             )
-        # FreeCAD.Console.PrintMessage("Python runnable" + sys.executable + "\n")
-        # result = subprocess.run([sys.executable, dap_solver, self.folder])
-        # FreeCAD.Console.PrintMessage(result)
+            self.finishSolve(self.service_solve_key, False, False)
+            return
+        FreeCAD.Console.PrintMessage(
+            "Solve time: " + str(round(event["solve_time"], 3)) + " s\n"
+        )
+        self.finishSolve(self.service_solve_key, True, True)
 
     #  -------------------------------------------------------------------------
     # def onFinished(self,  exitCode,  exitStatus):
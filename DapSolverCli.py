@@ -0,0 +1,244 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Headless command line entry point of the DAP solver:
+#     python -m DapSolverCli [options] folder [folder ...]
+# Solves the models in the given run folders (as written by the workbench, or
+# converted with DapModelFile) without importing FreeCAD or a GUI toolkit, so
+# that solves can run on compute nodes and be timed in isolation.
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import concurrent.futures
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+INTEGRATORS = ["dop853", "dopri5", "vode", "lsoda"]
+OUTPUT_FORMATS = ["text", "store", "npz"]
+SETTINGS_FILE = "dapInputSettings.py"
+NPZ_FILE = "dapResults.npz"
+
+
+#  -------------------------------------------------------------------------
+def readSettings(folder):
+    """Return the solve settings (t_initial, dt, t_final) of a run folder"""
+
+    settings = {}
+    with open(os.path.join(folder, SETTINGS_FILE)) as fid:
+        exec(fid.read(), {}, settings)
+    return settings
+
+
+#  -------------------------------------------------------------------------
+def exportResults(folder):
+    """Export all the channels of the results store of folder to one .npz"""
+
+    import numpy as np
+    from DapResultsStore import ResultsStore
+
+    store = ResultsStore(folder)
+    np.savez(
+        os.path.join(folder, NPZ_FILE),
+        **{name: store.channel(name) for name in store.channels()}
+    )
+
+
+#  -------------------------------------------------------------------------
+def solveFolder(folder, options):
+    """Solve the model in folder with the command line options.
+    Returns the solve time and total time in seconds.
+    Each worker process solves one folder at a time, as the solver keeps
+    its model in module globals"""
+
+    import DapTemp
+    import DapKernels
+
+    # Selected for every solve, as a worker process may solve several folders
+    # with different options
+    DapKernels.selectKernels(not options.no_jit)
+
+    start_time = time.perf_counter()
+    folder = os.path.abspath(folder)
+    settings = readSettings(folder)
+    for name in ["t_initial", "dt", "t_final"]:
+        if getattr(options, name) is not None:
+            settings[name] = getattr(options, name)
+    integrator_options = {}
+    if options.rtol is not None:
+        integrator_options["rtol"] = options.rtol
+    if options.atol is not None:
+        integrator_options["atol"] = options.atol
+    if options.nsteps is not None:
+        integrator_options["nsteps"] = options.nsteps
+
+    output = open(os.devnull, "w") if options.quiet else sys.stdout
+    with contextlib.redirect_stdout(output):
+        DapTemp.folder = folder
+        DapTemp.readInputFiles()
+        DapTemp.initialize()
+        DapTemp.t_initial = settings["t_initial"]
+        DapTemp.dt = settings["dt"]
+        DapTemp.t_final = settings["t_final"]
+        DapTemp.integrator = options.integrator
+        DapTemp.integrator_options = integrator_options
+        DapTemp.resume = options.resume
+        solve_start_time = time.perf_counter()
+        DapTemp.solve()
+        solve_time = time.perf_counter() - solve_start_time
+        if options.output_format == "text":
+            DapTemp.writeOutputs()
+            if not DapTemp.write_success:
+                raise RuntimeError("Could not write the results")
+        elif options.output_format == "npz":
+            exportResults(folder)
+    if options.quiet:
+        output.close()
+    return solve_time, time.perf_counter() - start_time
+
+
+#  -------------------------------------------------------------------------
+def parseArguments(argv=None):
+    """ """
+    parser = argparse.ArgumentParser(
+        prog="python -m DapSolverCli",
+        description="Solve DAP models without FreeCAD",
+    )
+    parser.add_argument("folders", nargs="+", help="run folders to solve")
+    parser.add_argument(
+        "--integrator",
+        choices=INTEGRATORS,
+        default="dop853",
+        help="scipy.integrate.ode integrator (default: dop853)",
+    )
+    parser.add_argument("--rtol", type=float, help="relative tolerance")
+    parser.add_argument("--atol", type=float, help="absolute tolerance")
+    parser.add_argument(
+        "--nsteps", type=int, help="maximum number of steps per reporting interval"
+    )
+    parser.add_argument("--t-initial", dest="t_initial", type=float)
+    parser.add_argument("--t-final", dest="t_final", type=float)
+    parser.add_argument("--dt", type=float, help="reporting time step")
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="text: the Dap* text files (as the workbench), store: only the "
+        "binary results store, npz: the results store exported to "
+        + NPZ_FILE
+        + " (default: text)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes solving folders in parallel",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the last checkpoint of each folder",
+    )
+    parser.add_argument(
+        "--no-jit", action="store_true", help="do not use the JIT compiled kernels"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="suppress the solver's progress output"
+    )
+    return parser.parse_args(argv)
+
+
+#  -------------------------------------------------------------------------
+def solverOptions(folder, changes=None):
+    """Return the (default) command line options for solving folder, changed
+    by the dictionary changes (used by the solver service and job spool)"""
+
+    options = parseArguments([folder])
+    if changes is not None:
+        for name, value in changes.items():
+            if name == "folders" or not hasattr(options, name):
+                raise RuntimeError("Unknown option: " + str(name))
+            setattr(options, name, value)
+    return options
+
+
+#  -------------------------------------------------------------------------
+def main(argv=None):
+    """ """
+    options = parseArguments(argv)
+    failed = 0
+    if options.workers > 1 and len(options.folders) > 1:
+        with concurrent.futures.ProcessPoolExecutor(options.workers) as executor:
+            futures = [
+                executor.submit(solveFolder, folder, options)
+                for folder in options.folders
+            ]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+    else:
+        results = []
+        for folder in options.folders:
+            try:
+                results.append(solveFolder(folder, options))
+            except Exception as e:
+                results.append(e)
+    for folder, result in zip(options.folders, results):
+        if isinstance(result, Exception):
+            failed += 1
+            sys.stderr.write(folder + ": failed: " + str(result) + "\n")
+        else:
+            print(
+                folder
+                + ": solved in "
+                + "%.3f" % result[0]
+                + " s ("
+                + "%.3f" % result[1]
+                + " s in total)"
+            )
+    return 1 if failed else 0
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
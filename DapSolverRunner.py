@@ -38,18 +38,28 @@
 import FreeCAD
 import os
 import DapTools
+import DapRegistry
 import pivy
 import Part
 
 if FreeCAD.GuiUp:
     import FreeCADGui
-    import PySide
 
 # Select if we want to be in debug mode
 global Debug
 Debug = True
 
 MOTION_PLANES = ["X-Y Plane", "Y-Z Plane", "X-Z Plane", "Custom Plane..."]
+# Properties which define the plane of motion
+PLANE_PROPERTIES = [
+    "MotionPlane",
+    "SelectionType",
+    "PlaneObjectName",
+    "XVector",
+    "YVector",
+    "ZVector",
+    "UnitVector",
+]
 MOTION_PLANES_HELPER_TEXT = [
     "Planar Motion is in XY Plane",
     "Planar Motion is in YZ Plane",
@@ -82,23 +92,21 @@ class _CommandDapSolver:
     #  -------------------------------------------------------------------------
     def GetResources(self):
         """Called by FreeCAD when 'FreeCADGui.addCommand' is run in InitGui.py
-        Returns a dictionary defining the icon, the menu text and the tooltip"""
-
-        return {
-            "Pixmap": os.path.join(DapTools.get_module_path(), "icons", "Icon7.png"),
-            "MenuText": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Solver_alias", "Run the analysis"
-            ),
-            "ToolTip": PySide.QtCore.QT_TRANSLATE_NOOP(
-                "Dap_Solver_alias", "Run the analysis."
-            ),
-        }
+        Returns a dictionary defining the icon, the menu text and the tooltip
+        (see DapCommands.COMMANDS)"""
+
+        from DapCommands import commandResources
+
+        return commandResources("Dap_Solver_alias")
 
     #  -------------------------------------------------------------------------
     def IsActive(self):
-        """Determine if the command/icon must be active or greyed out"""
+        """Determine if the command/icon must be active or greyed out
+        (see DapCommands.COMMANDS)"""
 
-        return DapTools.getActiveContainer() is not None
+        from DapCommands import commandIsActive
+
+        return commandIsActive("Dap_Solver_alias")
 
     #  -------------------------------------------------------------------------
     def Activated(self):
@@ -187,6 +195,38 @@ class _DapSolver:
             "",
             "Time intervals for the solution",
         )
+        DapTools.addObjectProperty(
+            obj,
+            "Resume",
+            False,
+            "App::PropertyBool",
+            "",
+            "Continue from the last checkpoint of the previous run",
+        )
+        DapTools.addObjectProperty(
+            obj,
+            "UseSolverService",
+            False,
+            "App::PropertyBool",
+            "",
+            "Solve in the local solver service instead of in FreeCAD",
+        )
+        DapTools.addObjectProperty(
+            obj,
+            "SpoolFolder",
+            "",
+            "App::PropertyString",
+            "",
+            "Submit solves as jobs to this spool folder of solver workers",
+        )
+        DapTools.addObjectProperty(
+            obj,
+            "SceneGraphAnimation",
+            True,
+            "App::PropertyBool",
+            "",
+            "Animate the bodies in the 3D view instead of in a copy of the document",
+        )
         DapTools.addObjectProperty(
             obj,
             "UnitVector",
@@ -279,6 +319,8 @@ class _DapSolver:
     #  -------------------------------------------------------------------------
     def onChanged(self, obj, prop):
         """ """
+        if prop in PLANE_PROPERTIES:
+            DapRegistry.objectChanged(obj, prop, "plane")
         standard_planes = ["X-Y Plane", "Y-Z Plane", "X-Z Plane"]
         if prop == "FileDirectory":
             if obj.FileDirectory == "":
@@ -0,0 +1,454 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# Optional long-lived local solver service. It keeps the solver modules (NumPy,
+# SciPy, Numba and the compiled kernels) loaded in a pool of worker processes,
+# so that a solve does not pay the start-up and import cost of a new process.
+# Clients connect through a Unix-domain socket (local only, no network) and
+# exchange one JSON object per line:
+#     request: {"command": "solve", "folder": ..., "options": {...}}
+#     events:  {"event": "accepted", "job": n, "rows": total}
+#              {"event": "progress", "job": n, "rows": n_done, "t": t}
+#              {"event": "heartbeat", "job": n}
+#              {"event": "finished", "job": n, "solve_time": s, "total_time": s}
+#              {"event": "failed", "job": n, "error": message}
+#     other requests: {"command": "ping"} and {"command": "shutdown"}
+# While a job is running, an event is sent every PROGRESS_INTERVAL: a progress
+# event if the job reported new results, else a heartbeat.
+# The options of a solve are those of DapSolverCli. Run
+#     python -m DapSolverService serve | ping | shutdown | solve folder
+# to start the service or to use it from the command line.
+# This module does not import FreeCAD.
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import tempfile
+import argparse
+import itertools
+import threading
+import subprocess
+import socketserver
+import concurrent.futures
+import DapSolverCli
+from DapResultsStore import ResultsStore
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+# Interval between progress events in seconds
+PROGRESS_INTERVAL = 0.25
+# Python interpreter used to start the service from within FreeCAD, where
+# sys.executable is FreeCAD itself
+python_executable = None
+
+
+#  -------------------------------------------------------------------------
+def defaultSocketPath():
+    """Return the socket path of the service of the current user"""
+
+    return os.path.join(
+        tempfile.gettempdir(), "dapSolverService-" + str(os.getuid()) + ".sock"
+    )
+
+
+#  -------------------------------------------------------------------------
+def findPython():
+    """Return the Python interpreter with which to start the service"""
+
+    if python_executable is not None:
+        return python_executable
+    if os.path.basename(sys.executable).startswith("python"):
+        return sys.executable
+    # Inside FreeCAD, use the interpreter installed next to it, if any
+    for name in ["python3", "python"]:
+        candidate = os.path.join(os.path.dirname(sys.executable), name)
+        if os.path.exists(candidate):
+            return candidate
+    return "python3"
+
+
+#  -------------------------------------------------------------------------
+def warmUp():
+    """Worker process initialiser: import the solver and its dependencies"""
+
+    import DapTemp
+    import DapKernels
+    from scipy import integrate
+    from scipy.linalg import lapack
+
+    if DapKernels.USE_JIT:
+        import numba
+
+
+#  -------------------------------------------------------------------------
+def solveJob(folder, options):
+    """Solve a job in a worker process"""
+
+    return DapSolverCli.solveFolder(folder, options)
+
+
+#  -------------------------------------------------------------------------
+def expectedRows(folder, options):
+    """Return the number of reporting times of a job"""
+
+    import numpy as np
+
+    settings = DapSolverCli.readSettings(folder)
+    for name in ["t_initial", "dt", "t_final"]:
+        if getattr(options, name) is not None:
+            settings[name] = getattr(options, name)
+    return len(np.arange(settings["t_initial"], settings["t_final"], settings["dt"]))
+
+
+#  -------------------------------------------------------------------------
+def jobProgress(folder):
+    """Return the number of rows and the last reported time in the results
+    store of a running job, or None if the store is not (yet) being written"""
+
+    try:
+        store = ResultsStore(folder)
+        if store.complete or store.rows == 0:
+            return None
+        return store.rows, float(store.channel("time")[-1])
+    except (OSError, ValueError, KeyError):
+        # The store is being replaced by a new run
+        return None
+
+
+# =============================================================================
+class _DapSolverRequestHandler(socketserver.StreamRequestHandler):
+    """Handles the requests of one client connection"""
+
+    #  -------------------------------------------------------------------------
+    def handle(self):
+        """ """
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.send({"event": "error", "error": "Invalid request"})
+                continue
+            command = request.get("command")
+            if command == "ping":
+                self.send({"event": "pong", "pid": os.getpid()})
+            elif command == "shutdown":
+                self.send({"event": "shutdown"})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            elif command == "solve":
+                self.solve(request)
+            else:
+                self.send({"event": "error", "error": "Unknown command"})
+
+    #  -------------------------------------------------------------------------
+    def send(self, event):
+        """Send an event to the client"""
+
+        self.wfile.write((json.dumps(event) + "\n").encode())
+        self.wfile.flush()
+
+    #  -------------------------------------------------------------------------
+    def solve(self, request):
+        """Run a solve job and stream its events to the client"""
+
+        job = next(self.server.job_counter)
+        try:
+            folder = os.path.abspath(request["folder"])
+            options = DapSolverCli.solverOptions(folder, request.get("options"))
+            options.quiet = True
+            total_rows = expectedRows(folder, options)
+        except Exception as e:
+            self.send({"event": "failed", "job": job, "error": str(e)})
+            return
+        self.send({"event": "accepted", "job": job, "rows": total_rows})
+        future = self.server.executor.submit(solveJob, folder, options)
+        last_progress = None
+        while True:
+            try:
+                solve_time, total_time = future.result(timeout=PROGRESS_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                progress = jobProgress(folder)
+                if progress is not None and progress != last_progress:
+                    last_progress = progress
+                    self.send(
+                        {
+                            "event": "progress",
+                            "job": job,
+                            "rows": progress[0],
+                            "t": progress[1],
+                        }
+                    )
+                else:
+                    self.send({"event": "heartbeat", "job": job})
+                continue
+            except Exception as e:
+                self.send({"event": "failed", "job": job, "error": str(e)})
+                return
+            break
+        self.send(
+            {
+                "event": "finished",
+                "job": job,
+                "solve_time": solve_time,
+                "total_time": total_time,
+            }
+        )
+
+
+# =============================================================================
+class DapSolverServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """The solver service: accepts clients on a Unix-domain socket, which is
+    only accessible to the current user, and runs their jobs in a pool of
+    worker processes"""
+
+    daemon_threads = True
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, socket_path=None, workers=1):
+        """ """
+        if socket_path is None:
+            socket_path = defaultSocketPath()
+        if os.path.exists(socket_path):
+            if DapSolverClient(socket_path).running():
+                raise RuntimeError("A solver service is already running")
+            # Left behind by a service which did not shut down
+            os.remove(socket_path)
+        self.socket_path = socket_path
+        self.job_counter = itertools.count(1)
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=warmUp
+        )
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(
+                self, socket_path, _DapSolverRequestHandler
+            )
+        finally:
+            os.umask(umask)
+
+    #  -------------------------------------------------------------------------
+    def serve(self):
+        """Serve until a client requests a shutdown"""
+
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            self.executor.shutdown(wait=True)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+# =============================================================================
+class DapSolverClient:
+    """Client of the solver service"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, socket_path=None):
+        """ """
+        if socket_path is None:
+            socket_path = defaultSocketPath()
+        self.socket_path = socket_path
+
+    #  -------------------------------------------------------------------------
+    def request(self, request):
+        """Send a request and yield the events sent in reply"""
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(request) + "\n").encode())
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as fid:
+                for line in fid:
+                    yield json.loads(line)
+
+    #  -------------------------------------------------------------------------
+    def running(self):
+        """Determine if the service is running"""
+
+        try:
+            for event in self.request({"command": "ping"}):
+                return event["event"] == "pong"
+        except OSError:
+            pass
+        return False
+
+    #  -------------------------------------------------------------------------
+    def start(self, workers=1, timeout=30.0):
+        """Start the service in the background if it is not running yet"""
+
+        if self.running():
+            return
+        subprocess.Popen(
+            [
+                findPython(),
+                "-m",
+                "DapSolverService",
+                "serve",
+                "--socket",
+                self.socket_path,
+                "--workers",
+                str(workers),
+            ],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        start_time = time.time()
+        while not self.running():
+            if time.time() - start_time > timeout:
+                raise RuntimeError("Could not start the solver service")
+            time.sleep(0.1)
+
+    #  -------------------------------------------------------------------------
+    def solve(self, folder, options=None, callback=None):
+        """Solve the model in folder, calling callback(event) for every event.
+        Returns the final (finished or failed) event"""
+
+        request = {"command": "solve", "folder": folder, "options": options or {}}
+        event = None
+        for event in self.request(request):
+            if callback is not None:
+                callback(event)
+        if event is None or event["event"] not in ["finished", "failed"]:
+            event = {"event": "failed", "error": "The solver service disconnected"}
+            if callback is not None:
+                callback(event)
+        return event
+
+    #  -------------------------------------------------------------------------
+    def shutdown(self):
+        """Stop the service after its running jobs have finished"""
+
+        for event in self.request({"command": "shutdown"}):
+            pass
+
+
+# =============================================================================
+class DapSolverJob:
+    """A solve in the solver service (which is started if it is not running),
+    run by a client in a background thread, so that the caller is not blocked
+    while waiting for its events: poll() returns the events received since
+    the previous poll"""
+
+    #  -------------------------------------------------------------------------
+    def __init__(self, folder, options=None, client=None):
+        """ """
+        if client is None:
+            client = DapSolverClient()
+        self.client = client
+        self.events = queue.Queue()
+        # The finished or failed event, once it has been polled
+        self.final_event = None
+        self.thread = threading.Thread(
+            target=self.run, args=(folder, options), daemon=True
+        )
+        self.thread.start()
+
+    #  -------------------------------------------------------------------------
+    def run(self, folder, options):
+        """Solve the job, queueing its events"""
+
+        try:
+            self.client.start()
+            self.client.solve(folder, options, self.events.put)
+        except (OSError, RuntimeError) as e:
+            self.events.put({"event": "failed", "error": str(e)})
+
+    #  -------------------------------------------------------------------------
+    def poll(self):
+        """Return the events received since the previous poll, without
+        waiting for new ones"""
+
+        events = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return events
+            events.append(event)
+            if event["event"] in ["finished", "failed"]:
+                self.final_event = event
+
+    #  -------------------------------------------------------------------------
+    def wait(self):
+        """Wait until the job is done, and return its remaining events"""
+
+        self.thread.join()
+        return self.poll()
+
+
+#  -------------------------------------------------------------------------
+def main(argv=None):
+    """ """
+    parser = argparse.ArgumentParser(prog="python -m DapSolverService")
+    parser.add_argument("command", choices=["serve", "ping", "shutdown", "solve"])
+    parser.add_argument("folder", nargs="?", help="run folder to solve")
+    parser.add_argument("--socket", help="socket path of the service")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        DapSolverServer(args.socket, args.workers).serve()
+        return 0
+    client = DapSolverClient(args.socket)
+    if args.command == "ping":
+        print("running" if client.running() else "not running")
+        return 0 if client.running() else 1
+    if args.command == "shutdown":
+        client.shutdown()
+        return 0
+    if args.folder is None:
+        parser.error("solve requires a folder")
+    event = client.solve(
+        os.path.abspath(args.folder),
+        {"resume": args.resume},
+        lambda event: print(json.dumps(event)),
+    )
+    return 0 if event["event"] == "finished" else 1
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+# File based job queue for solving on several machines which share a file
+# system (e.g. over NFS), without any network service.
+# A job is a folder holding the model file (or generated input files), the
+# solve settings and job.json with the solver options. It is named by the
+# solve cache key of its inputs (see DapSolveCache) and moves through the
+# sub-folders of the spool folder:
+#     submitting/  being written by DapSolverBuilder
+#     incoming/    waiting for a worker
+#     running/     claimed by a worker
+#     done/        solved, the results are written beside the inputs
+#     failed/      not solved, see error.txt
+# Every move is a rename within the spool, which is atomic (also on NFS), so
+# a job is claimed by exactly one worker: the rename of any other worker
+# fails, as the job is no longer in incoming/.
+# A worker keeps the heartbeat file of its running job up to date, so that
+# jobs of crashed workers can be put back in incoming/ (requeue); they resume
+# from their last checkpoint. Run
+#     python -m DapSolverSpool worker spool [--workers N]
+#     python -m DapSolverSpool requeue spool [--stale SECONDS]
+#     python -m DapSolverSpool status spool
+# This module does not import FreeCAD.
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import threading
+import multiprocessing
+import DapSolverCli
+import DapSolveCache
+from DapModelFile import modelInputFiles
+from DapResultsStore import CHECKPOINT
+
+# Select if we want to be in debug mode
+global Debug
+Debug = True
+
+JOB_FILE = "job.json"
+ERROR_FILE = "error.txt"
+HEARTBEAT_FILE = "heartbeat"
+STAGES = ["submitting", "incoming", "running", "done", "failed"]
+# Interval in seconds at which a worker updates the heartbeat of its job
+HEARTBEAT_INTERVAL = 10.0
+# Age in seconds of the heartbeat beyond which a running job is stale
+STALE_AFTER = 60.0
+
+
+#  -------------------------------------------------------------------------
+def stageFolder(spool, stage):
+    """Return the sub-folder of a stage of the spool, creating it if needed"""
+
+    stage_folder = os.path.join(spool, stage)
+    os.makedirs(stage_folder, exist_ok=True)
+    return stage_folder
+
+
+#  -------------------------------------------------------------------------
+def jobStatus(spool, key):
+    """Return the stage of the job key in the spool, or None if there is none"""
+
+    for stage in STAGES[1:]:
+        if os.path.isdir(os.path.join(spool, stage, key)):
+            return stage
+    return None
+
+
+#  -------------------------------------------------------------------------
+def jobError(spool, key):
+    """Return the error message of a failed job"""
+
+    error_path = os.path.join(spool, "failed", key, ERROR_FILE)
+    if not os.path.exists(error_path):
+        return ""
+    with open(error_path) as fid:
+        return fid.read()
+
+
+#  -------------------------------------------------------------------------
+def submitJob(spool, folder, key, options=None):
+    """Copy the inputs of the run folder to a new job key in the spool.
+    options is a dictionary of solver options (see DapSolverCli)"""
+
+    submit_folder = os.path.join(
+        stageFolder(spool, "submitting"),
+        key + "." + socket.gethostname() + "." + str(os.getpid()),
+    )
+    if os.path.exists(submit_folder):
+        shutil.rmtree(submit_folder)
+    os.makedirs(submit_folder)
+    for file_name in modelInputFiles(folder) + [DapSolveCache.SETTINGS_FILE]:
+        shutil.copy2(os.path.join(folder, file_name), submit_folder)
+    with open(os.path.join(submit_folder, JOB_FILE), "w") as fid:
+        json.dump(
+            {
+                "options": options or {},
+                "folder": folder,
+                "host": socket.gethostname(),
+                "submitted": time.time(),
+            },
+            fid,
+            indent=1,
+        )
+    # A job with the same key which failed before is replaced
+    failed_folder = os.path.join(spool, "failed", key)
+    if os.path.exists(failed_folder):
+        shutil.rmtree(failed_folder)
+    os.rename(submit_folder, os.path.join(stageFolder(spool, "incoming"), key))
+
+
+#  -------------------------------------------------------------------------
+def fetchJobResults(spool, key, folder):
+    """Replace the result set in the run folder by the results of the
+    finished job key"""
+
+    job_folder = os.path.join(spool, "done", key)
+    DapSolveCache.removeResults(folder)
+    os.makedirs(os.path.join(folder, DapSolveCache.RESULTS_FOLDER))
+    for path in DapSolveCache.resultPaths(job_folder):
+        shutil.copy2(os.path.join(job_folder, path), os.path.join(folder, path))
+
+
+#  -------------------------------------------------------------------------
+def claimJob(spool):
+    """Claim the oldest job in incoming/ by moving it to running/.
+    Returns the key of the job, or None if there is none"""
+
+    incoming = stageFolder(spool, "incoming")
+    running = stageFolder(spool, "running")
+    jobs = []
+    for key in os.listdir(incoming):
+        try:
+            jobs.append((os.path.getmtime(os.path.join(incoming, key)), key))
+        except OSError:
+            # Claimed by another worker in the meantime
+            pass
+    for mtime, key in sorted(jobs):
+        try:
+            os.rename(os.path.join(incoming, key), os.path.join(running, key))
+        except OSError:
+            continue
+        writeHeartbeat(os.path.join(running, key))
+        return key
+    return None
+
+
+#  -------------------------------------------------------------------------
+def writeHeartbeat(job_folder):
+    """Update the heartbeat of a running job"""
+
+    with open(os.path.join(job_folder, HEARTBEAT_FILE), "w") as fid:
+        fid.write(socket.gethostname() + " " + str(os.getpid()) + "\n")
+
+
+#  -------------------------------------------------------------------------
+def runJob(spool, key):
+    """Solve a claimed job and move it to done/ or failed/"""
+
+    job_folder = os.path.join(spool, "running", key)
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            writeHeartbeat(job_folder)
+
+    thread = threading.Thread(target=heartbeat, daemon=True)
+    thread.start()
+    try:
+        with open(os.path.join(job_folder, JOB_FILE)) as fid:
+            job = json.load(fid)
+        options = DapSolverCli.solverOptions(job_folder, job["options"])
+        options.quiet = True
+        result = DapSolverCli.solveFolder(job_folder, options)
+        stage = "done"
+    except Exception as e:
+        result = e
+        stage = "failed"
+        with open(os.path.join(job_folder, ERROR_FILE), "w") as fid:
+            fid.write(str(e) + "\n")
+    finally:
+        stop.set()
+        thread.join()
+    destination = os.path.join(stageFolder(spool, stage), key)
+    if os.path.exists(destination):
+        shutil.rmtree(destination)
+    os.rename(job_folder, destination)
+    return result
+
+
+#  -------------------------------------------------------------------------
+def runWorker(spool, once=False, poll_interval=2.0):
+    """Claim and solve jobs from the spool; with once, return when there are
+    no more jobs, or else keep polling for new jobs"""
+
+    worker = socket.gethostname() + ":" + str(os.getpid())
+    while True:
+        key = claimJob(spool)
+        if key is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        print(worker + ": solving " + key, flush=True)
+        result = runJob(spool, key)
+        if isinstance(result, Exception):
+            print(worker + ": " + key + " failed: " + str(result), flush=True)
+        else:
+            print(
+                worker + ": " + key + " solved in " + "%.3f" % result[0] + " s",
+                flush=True,
+            )
+
+
+#  -------------------------------------------------------------------------
+def requeueStaleJobs(spool, stale_after=STALE_AFTER):
+    """Move the running jobs whose heartbeat is older than stale_after seconds
+    (i.e. whose worker has died) back to incoming/, resuming them from their
+    last checkpoint. Returns the keys of the requeued jobs"""
+
+    running = stageFolder(spool, "running")
+    incoming = stageFolder(spool, "incoming")
+    requeued = []
+    for key in os.listdir(running):
+        job_folder = os.path.join(running, key)
+        try:
+            age = time.time() - os.path.getmtime(
+                os.path.join(job_folder, HEARTBEAT_FILE)
+            )
+        except OSError:
+            continue
+        if age < stale_after:
+            continue
+        if os.path.exists(os.path.join(job_folder, CHECKPOINT)):
+            with open(os.path.join(job_folder, JOB_FILE)) as fid:
+                job = json.load(fid)
+            job["options"]["resume"] = True
+            with open(os.path.join(job_folder, JOB_FILE), "w") as fid:
+                json.dump(job, fid, indent=1)
+        try:
+            os.remove(os.path.join(job_folder, HEARTBEAT_FILE))
+            os.rename(job_folder, os.path.join(incoming, key))
+        except OSError:
+            continue
+        requeued.append(key)
+    return requeued
+
+
+#  -------------------------------------------------------------------------
+def main(argv=None):
+    """ """
+    parser = argparse.ArgumentParser(prog="python -m DapSolverSpool")
+    parser.add_argument("command", choices=["worker", "requeue", "status"])
+    parser.add_argument("spool", help="spool folder")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="number of worker processes"
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="stop when there are no more jobs"
+    )
+    parser.add_argument(
+        "--poll", type=float, default=2.0, help="polling interval in seconds"
+    )
+    parser.add_argument(
+        "--stale",
+        type=float,
+        default=STALE_AFTER,
+        help="heartbeat age in seconds of a stale job",
+    )
+    args = parser.parse_args(argv)
+    spool = os.path.abspath(args.spool)
+
+    if args.command == "worker":
+        if args.workers > 1:
+            workers = [
+                multiprocessing.Process(
+                    target=runWorker, args=(spool, args.once, args.poll)
+                )
+                for n in range(args.workers)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        else:
+            runWorker(spool, args.once, args.poll)
+    elif args.command == "requeue":
+        for key in requeueStaleJobs(spool, args.stale):
+            print("requeued " + key)
+    else:
+        for stage in STAGES[1:]:
+            for key in sorted(os.listdir(stageFolder(spool, stage))):
+                print(stage + " " + key)
+    return 0
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,18 +34,31 @@
 # *                                                                                  *
 # ************************************************************************************
 
-import FreeCAD
+# NOTE: FreeCAD and matplotlib are not imported here, so that the solver can
+# run headless (see DapSolverCli). SciPy is only imported once a model is
+# initialised (dgesv) or solved (integrate), to keep importing this module fast
 
 # Select if we want to be in debug mode
 global Debug
 Debug = True
 
 import numpy as np
-from scipy import integrate
-import matplotlib.pyplot as plt
 import os
 import sys
-from DapHelperFunctions import RotMatrix, RotMatrix90
+from DapHelperFunctions import (
+    RotMatrix,
+    RotMatrix90,
+    RotMatrixArray,
+    RotatePointArray,
+    RotMatrix90Array,
+)
+from DapModelIndex import ModelIndex
+from DapModelCompiler import loadCompiledModel, hashInputFiles
+from DapKernels import ModelArrays
+from DapResultsStore import ResultsWriter, ResultsStore, readCheckpoint
+from DapSolveCache import removeResults, unshareResults
+from DapModelFile import MODEL_FILE, readModelFile
+from DapModelCheck import checkModel, checkJacobian
 from DapStructures import (
     Body_struct,
     Force_struct,
@@ -69,6 +82,33 @@ global num, D, Dt, Lambda
 global xmin, xmax, ymin, ymax
 global showtime, t10
 global flags, pen_d0
+global Index, Compiled, Arrays
+global M_array_, M_inv_array_
+global DMD_mass, DMD_work, rhs_work, g_work, rhsA_work, c_dd_work
+global dgesv
+global results_chunk_size
+global resume, checkpoint_interval
+global integrator, integrator_options
+
+# Number of reported time steps written to the results store at a time
+results_chunk_size = 100
+# Continue from the last checkpoint of the previous run (if there is one)
+resume = False
+# Number of reported time steps between checkpoints
+checkpoint_interval = 100
+# scipy.integrate.ode integrator and its options (e.g. rtol, atol, nsteps)
+integrator = "dop853"
+integrator_options = {}
+
+
+#  -------------------------------------------------------------------------
+def printMessage(message):
+    """Print a message to the FreeCAD console when running inside FreeCAD,
+    or else to standard output"""
+    if "FreeCAD" in sys.modules:
+        sys.modules["FreeCAD"].Console.PrintMessage(message)
+    else:
+        sys.stdout.write(str(message))
 
 # TODO clean up dap code. build into proper class structure
 # for now just getting it to work within the workbench
@@ -94,34 +134,44 @@ def analysis(t, u):
     global xmin, xmax, ymin, ymax
     global showtime, t10
     global flags, pen_d0
+    global Index, Compiled, Arrays
     global M_array_, M_inv_array_
-    M_array_ = np.atleast_2d(M_array[1 : 3 * (nB - 1) + 1, 0]).T
-    M_inv_array_ = np.atleast_2d(M_inv_array[1 : 3 * (nB - 1) + 1, 0]).T
-    u_to_Bodies(u)
+    global DMD_mass, DMD_work, rhs_work, g_work, rhsA_work, c_dd_work
+    # NOTE: all the work arrays are allocated once in initialize() and are
+    # filled in place here, so that a call does not allocate new arrays
+    nc = 3 * (nB - 1)
+    Arrays.unpack(u)
     Update_Position()
     Update_Velocity()
+    if Compiled is None:
+        # The generic evaluators work on the Bodies, Points and Uvectors
+        Arrays.toStructs(Bodies, Points, Uvectors)
     h_a = Force_array(t)
-    h_a_ = np.atleast_2d(h_a[1 : 3 * (nB - 1) + 1, 0]).T
     if nConst == 0:
-        c_dd = M_inv_array_ * h_a_
+        c_dd = c_dd_work
+        np.multiply(M_inv_array_, h_a[1 : nc + 1], out=c_dd)
     else:
         D = Jacobian(t)
-        D_ = D[:, 0 : 3 * (nB - 1)]
         rhsA = RHSAcc(t)
-        DMD1 = np.concatenate((np.diag(M_array_[:, 0]), -D_.T), axis=1)
-        DMD2 = np.concatenate((D_, np.zeros((nConst, nConst))), axis=1)
-        DMD = np.concatenate((DMD1, DMD2), axis=0)
-        rhs = np.concatenate((h_a_, rhsA), axis=0)
-        sol = np.linalg.solve(DMD, rhs)
-        c_dd = sol[0 : 3 * (nB - 1)]
-        Lambda = sol[3 * (nB - 1) : len(sol)]
-    for Bi in range(1, nB):
-        ir = Bodies[Bi, 0].irc
-        i2 = ir + 1
-        i3 = i2 + 1
-        Bodies[Bi, 0].r_dd = c_dd[ir - 1 : i2]
-        Bodies[Bi, 0].p_dd = c_dd[i3 - 1]
-    u_d = Bodies_to_u_d()
+        #  [ M  -D_' ] [ c_dd   ]   [ h_a  ]
+        #  [ D_   0  ] [ Lambda ] = [ rhsA ]
+        # is solved for -Lambda with the matrix [ M  D_' ; D_  0 ] instead,
+        # as negating D_' into the Fortran ordered matrix would need a
+        # temporary buffer (the solution is the same, as a change of sign
+        # is exact)
+        np.copyto(DMD_work, DMD_mass)
+        DMD_work[nc:, 0:nc] = D[:, 0:nc]
+        np.copyto(DMD_work[0:nc, nc:].T, D[:, 0:nc])
+        rhs_work[0:nc] = h_a[1 : nc + 1]
+        rhs_work[nc:] = rhsA
+        # Both the (Fortran ordered) matrix and the right-hand side are
+        # overwritten, the solution is returned in rhs_work
+        lu, piv, sol, info = dgesv(DMD_work, rhs_work, overwrite_a=1, overwrite_b=1)
+        if info > 0:
+            raise np.linalg.LinAlgError("Singular matrix")
+        c_dd = sol[0:nc]
+        np.negative(sol[nc:], out=Lambda)
+    u_d = Arrays.derivative(u, c_dd)
     global num
     num = num + 1
     # NOTE: hardcoding showtime for now
@@ -130,7 +180,7 @@ def analysis(t, u):
         if np.mod(t10, 100) == 0:
             print(t)
         t10 = t10 + 1
-    return np.concatenate((u_d), axis=None)
+    return u_d
 
 
 # ###############################################################
@@ -143,7 +193,11 @@ def analysis(t, u):
 def Constraints():
     global nConst, nJ
     global Joints
+    global Compiled
     phi = np.zeros((nConst, 1))
+    if Compiled is not None:
+        Compiled.Constraints(*Arrays.state, phi[:, 0])
+        return phi
     for Ji in range(1, nJ):
         print("Joints[Ji]", Joints[Ji, 0])
         if Joints[Ji, 0].type == "rev":
@@ -301,6 +355,11 @@ def SDA_rot(Fi):  # Rotational spring - damper - actuator
 # %%% Force_array
 # -------------------------------------------------------------------------
 def Force_array(t):
+    global Compiled
+    global g_work
+    if Compiled is not None:
+        Compiled.Force_array(t, *Arrays.state, g_work[:, 0])
+        return g_work
     #  initialise body force vectors
     for Bi in range(1, nB):
         Bodies[Bi, 0].f = np.array([[0], [0]])
@@ -363,7 +422,8 @@ def Force_array(t):
                     print("Undefined User Force")
 
         switch().force_type(Forces[Fi, 0].type)  # implement switch
-    g = np.zeros((nB3, 1))
+    g = g_work
+    g.fill(0.0)
     for Bi in range(1, nB):
         ks = Bodies[Bi, 0].irc
         ke = ks + 3
@@ -623,6 +683,26 @@ def initialize():
     global xmin, xmax, ymin, ymax
     global showtime, t10
     global flags, pen_d0
+    global Index, Compiled, Arrays
+    global M_array_, M_inv_array_
+    global DMD_mass, DMD_work, rhs_work, g_work, rhsA_work, c_dd_work
+    global dgesv
+    from scipy.linalg.lapack import dgesv
+
+    # Validate the model before any of it is processed
+    dof, warnings = checkModel(
+        {
+            "Bodies": Bodies,
+            "Points": Points,
+            "Uvectors": Uvectors,
+            "Joints": Joints,
+            "Forces": Forces,
+            "Functs": Functs,
+        }
+    )
+    for warning in warnings:
+        printMessage("Warning: " + warning + "\n")
+    printMessage("Degrees of freedom: " + str(dof) + "\n")
     bodycolor = ["r", "g", "b", "c", "m"]
     num = 0  # number of function evaluations
     t10 = 0
@@ -638,7 +718,7 @@ def initialize():
         Bodies[Bi, 0].m_inv = 1 / Bodies[Bi, 0].m
         Bodies[Bi, 0].J_inv = 1 / Bodies[Bi, 0].J
         Bodies[Bi, 0].A = RotMatrix(Bodies[Bi, 0].p)
-        Bodies[Bi, 0].color = bodycolor[Bi]
+        Bodies[Bi, 0].color = bodycolor[Bi % len(bodycolor)]
     # %%% Mass (inertia) matrix as an array
     M_array = np.zeros((nB3, 1))
     M_inv_array = np.zeros((nB3, 1))
@@ -663,24 +743,16 @@ def initialize():
         print("Pi", Pi)
         if Points[Pi, 0].Bindex == 0:
             Points[Pi, 0].sP = Points[Pi, 0].sPlocal
-            FreeCAD.Console.PrintMessage("\nbefore\n")
-            FreeCAD.Console.PrintMessage(Points[Pi, 0].sP)
+            printMessage("\nbefore\n")
+            printMessage(Points[Pi, 0].sP)
             Points[Pi, 0].sP_r = RotMatrix90(Points[Pi, 0].sP)
-            FreeCAD.Console.PrintMessage("\nmiddle\n")
-            FreeCAD.Console.PrintMessage(Points[Pi, 0].sP_r)
-            FreeCAD.Console.PrintMessage("\nafter\n")
+            printMessage("\nmiddle\n")
+            printMessage(Points[Pi, 0].sP_r)
+            printMessage("\nafter\n")
             Points[Pi, 0].rP = Points[Pi, 0].sP
         print(Points[Pi, 0].Bindex)
-        print("nB", nB)
-        for Bi in range(1, nB):
-            if int(Points[Pi, 0].Bindex) == int(Bi):
-                length = len(
-                    Bodies[Bi, 0].pts
-                )  # current length of pts Assigned but not used
-                Bodies[Bi, 0].pts = np.concatenate(
-                    (Bodies[Bi, 0].pts, np.array([[Pi]])), axis=0
-                )
-                print(Bodies[Bi, 0].pts)
+    # NOTE: The points associated with each body (Bodies[Bi, 0].pts) are
+    # filled in from the model index once the joints and forces are known
     print("==================================")
     # %%% Unit vectors
     nU = len(Uvectors)
@@ -849,6 +921,47 @@ def initialize():
         if Bj != 0:
             Joints[Ji, 0].coljs = 3 * (Bj - 1) + 1
             Joints[Ji, 0].colje = 3 * Bj
+    # %%% Model index
+    # Body -> points/unit vectors/joints/forces adjacency built in one pass
+    Index = ModelIndex(nB, Points, Uvectors, Joints, Forces)
+    for Bi in range(1, nB):
+        Bodies[Bi, 0].pts = np.atleast_2d(Index.pointsOfBody(Bi)).T
+    # %%% Compiled model
+    # Load (or generate) the evaluators specialised to this model, the generic
+    # dispatch over joint and force types is used if this is not possible
+    Compiled = loadCompiledModel(folder, Bodies, Points, Uvectors, Joints, Forces)
+    # %%% Model arrays
+    # Flat state arrays on which the position/velocity kernels and the
+    # compiled evaluators operate
+    Arrays = ModelArrays(Bodies, Points, Uvectors)
+    # %%% Work arrays
+    # Allocated once here and filled in place by analysis()
+    nc = 3 * (nB - 1)
+    M_array_ = np.atleast_2d(M_array[1 : nc + 1, 0]).T
+    M_inv_array_ = np.atleast_2d(M_inv_array[1 : nc + 1, 0]).T
+    # Mass part of the coefficient matrix, copied into the (Fortran ordered,
+    # as required by LAPACK to work in place) matrix before each solve
+    DMD_mass = np.zeros((nc + nConst, nc + nConst), order="F")
+    DMD_mass[0:nc, 0:nc] = np.diag(M_array_[:, 0])
+    DMD_work = np.zeros((nc + nConst, nc + nConst), order="F")
+    rhs_work = np.zeros((nc + nConst, 1), order="F")
+    g_work = np.zeros((nB3, 1))
+    rhsA_work = np.zeros((nConst, 1))
+    c_dd_work = np.zeros((nc, 1))
+    D = np.zeros((nConst, nB3))
+    Lambda = np.zeros((nConst, 1))
+    if Compiled is None:
+        printMessage(
+            "Model could not be compiled, using generic joint and force evaluation\n"
+        )
+    # %%% Initial Jacobian
+    # The constraints must be independent at the initial configuration, or
+    # else the coefficient matrix is singular at the first step of the solve
+    if nConst > 0:
+        Update_Position()
+        if Compiled is None:
+            Arrays.toStructs(Bodies, Points, Uvectors)
+        checkJacobian(Jacobian(0.0)[:, 0:nc], Joints)
 
 
 ################################################################
@@ -861,7 +974,10 @@ def initialize():
 #  -------------------------------------------------------------------------
 def Jacobian(t):
     global nJ, nConst, nB3, D  # rs, re, cis, cie, cjs, cje
-    D = np.zeros((nConst, nB3))
+    global Compiled
+    if Compiled is not None:
+        return Compiled.Jacobian(t, *Arrays.state, D)
+    D.fill(0.0)
     for Ji in range(1, nJ):
         if Joints[Ji, 0].type == "rev":
             Di, Dj = J_rev(Ji)
@@ -1314,7 +1430,13 @@ def J_tran(Ji):
 #  -------------------------------------------------------------------------
 def RHSAcc(t):
     global nConst, nJ
-    rhs = np.zeros((nConst, 1))
+    global Compiled
+    global rhsA_work
+    rhs = rhsA_work
+    if Compiled is not None:
+        Compiled.RHSAcc(t, *Arrays.state, rhs[:, 0])
+        return rhs
+    rhs.fill(0.0)
     for Ji in range(1, nJ):
         if Joints[Ji, 0].type == "rev":
             f = A_rev(Ji)
@@ -1551,184 +1673,24 @@ def Bodies_to_u_d():
 
 #  -------------------------------------------------------------------------
 def plot_system():  # 2D Animation
-
-    global Bodies, nB, nB3, nB6
-    global Points, nP, Points_anim, nPanim, nPtot
-    global Uvectors, nU
-    global Joints, nJ, nConst
-    global Forces, nF
-    global M_array, M_inv_array
-    global Functs, nFc
-    global ZZ, redund, cfriction
-    global num, D, Dt, Lambda
-    global xmin, xmax, ymin, ymax
-    global showtime, t10
-    global flags, pen_d0
-    # #### set axis limits
-    # max_val = max(xmax, ymax)
-    # min_val = min(xmin, ymin)
-    # plt.xlim(xmin, xmax)
-    # plt.ylim(ymin, ymax)
-    plt.gca().set_aspect("equal")
-    # #### Plot body centre points
-    for Bi in range(1, nB):
-        plt.plot(Bodies[Bi, 0].r[0, 0], Bodies[Bi, 0].r[1, 0], "ko")
-        plt.text(Bodies[Bi, 0].r[0, 0], Bodies[Bi, 0].r[1, 0], "   (%i" % Bi)
-        plt.text(Bodies[Bi, 0].r[0, 0], Bodies[Bi, 0].r[1, 0], "      )")
-    # plt.show()
-    # #### Draw lines between body centers and points on those bodies
-    print("NUmber of bodies ", nB)
-    for Bi in range(1, nB):
-        print("BODY INDEX", Bi)
-        npts = len(Bodies[Bi, 0].pts)
-        linecolor = Bodies[Bi, 0].color
-        linecolor = "k"
-        # for j in range(1 - 1, npts):
-        print("NUmber of points: ", npts)
-        print(Bodies[Bi, 0].pts)
-        for j in range(npts):
-            a1 = Bodies[Bi, 0].r[0, 0]
-            a2 = Points[int(Bodies[Bi, 0].pts[j, 0]), 0].rP[0][0]
-            b1 = Bodies[Bi, 0].r[1, 0]
-            b2 = Points[int(Bodies[Bi, 0].pts[j, 0]), 0].rP[1][0]
-            plt.plot([a1, a2], [b1, b2], color=linecolor, linewidth=1)
-            # print(Bi,j)
-            # print(Bodies[Bi, 0].pts)
-            # print(Points[int(Bodies[Bi, 0].pts[j, 0]), 0].rP)
-            print("Point index", int(Bodies[Bi, 0].pts[j, 0]))
-            print(Points[int(Bodies[Bi, 0].pts[j, 0]), 0].rP[0][0])
-            print(Points[int(Bodies[Bi, 0].pts[j, 0]), 0].rP[1][0])
-            # print(Bodies[Bi, 0].pts)
-            # print(Points
-    # plt.show()
-    # print("Number of points",nP)
-    # #### Plot points that are defined by 's' vectors
-    for i in range(1, nP):
-        plt.plot(
-            Points[i, 0].rP[0][0],
-            Points[i, 0].rP[1][0],
-            "ko",
-            markerfacecolor="k",
-            markersize=2,
-        )
-        plt.plot(
-            Points[i, 0].rP[0][0],
-            Points[i, 0].rP[1][0],
-            "ko",
-            markerfacecolor="k",
-            markersize=2,
-        )
-        print("POINTS")
-        print(i)
-        print(Points[i, 0].rP[0][0])
-        print(Points[i, 0].rP[1][0])
-    # plt.show()
-    # #### Draw lines between points that are connected by springs
-    for i in range(1, nF):
-        #  define switch
-        class switch(object):
-            def force_type(self, argument):  # Dispatch method
-                method_name = argument
-                method = getattr(
-                    self, method_name, lambda: "Invalid"
-                )  # Get the method from 'self'. Default to a lambda.
-                return method()  # Call the method as we return it
-
-            #  define "cases"
-
-            def ptp(self):
-                pt1 = Forces[i, 0].iPindex
-                pt2 = Forces[i, 0].jPindex
-                a1 = Points[int(pt1), 0].rP[0][0]
-                a2 = Points[int(pt2), 0].rP[0][0]
-                b1 = Points[int(pt1), 0].rP[1][0]
-                b2 = Points[int(pt2), 0].rP[1][0]
-                plt.plot([a1, a2], [b1, b2], color="m", linestyle="-")
-
-        switch().force_type(Forces[i, 0].type)  # implement switch
-    for Ji in range(1, nJ):
-        #  define switch
-        class switch(object):
-            def joint_type(self, argument):  # Dispatch method
-                method_name = argument
-                method = getattr(
-                    self, method_name, lambda: "Invalid"
-                )  # Get the method from 'self'. Default to a lambda.
-                return method()  # Call the method as we return it
-
-            #  define "cases"
-
-            def rev_rev(self):
-                Pi = Joints[Ji, 0].iPindex
-                Pj = Joints[Ji, 0].jPindex
-                a1 = Points[Pi, 0].rP[0][0]
-                a2 = Points[Pj, 0].rP[0][0]
-                b1 = Points[Pi, 0].rP[1][0]
-                b2 = Points[Pj, 0].rP[1][0]
-                plt.plot([a1, a2], [b1, b2], color="k")
-
-            def rev_tran(self):
-                Pi = Joints[Ji, 0].iPindex
-                plt.plot(
-                    Points[Pi, 0].rP[0][0],
-                    Points[Pi - 1, 0].rP[1][0],
-                    "ko",
-                    markerfacecolor="k",
-                    markersize=4,
-                )
-
-        #  implement switch
-        switch().joint_type(Joints[Ji, 0].type)
-    for Bi in range(1, nB):
-        linecolor = Bodies[Bi, 0].color
-        #  define switch
-
-        class switch(object):
-            def body_shape(self, argument):  # Dispatch method
-                method_name = argument
-                method = getattr(
-                    self, method_name, lambda: "Invalid"
-                )  # Get the method from 'self'. Default to a lambda.
-                return method()  # Call the method as we return it
-
-            #  define "cases"
-
-            def circle(self):
-                radius = Bodies[Bi, 0].R
-                w1x = Bodies[Bi, 0].r[0, 0]
-                w1y = Bodies[Bi, 0].r[1, 0]
-                w1 = plt.Circle((w1x, w1y), radius, color="k", fill=False)
-                plt.gca().add_patch(w1)
-
-            def rect(self):
-                P5 = np.zeros((2, 5))
-                for i in range(0, 4):
-                    P5[:, i] = (
-                        Bodies[Bi, 0].r.T + Bodies[Bi, 0].A @ Bodies[Bi, 0].P4[:, i].T
-                    )
-                P5[:, 5 - 1] = P5[:, 1 - 1]
-                for i in range(0, 4):
-                    plt.plot(
-                        [P5[1 - 1, i], P5[1 - 1, i + 1]],
-                        [P5[2 - 1, i], P5[2 - 1, i + 1]],
-                        color="k",
-                    )
-
-            def line(self):
-                P5 = np.zeros((2, 2))
-                for i in range(1 - 1, 2):
-                    P5[:, i] = (
-                        Bodies[Bi, 0].r.T + Bodies[Bi, 0].A @ Bodies[Bi, 0].P4[:, i]
-                    )
-                plt.plot(
-                    [P5[1 - 1, 1 - 1], P5[1 - 1, 2 - 1]],
-                    [P5[2 - 1, 1 - 1], P5[2 - 1, 2 - 1]],
-                    color="k",
-                )
-
-        switch().body_shape(Bodies[Bi, 0].shape)  # implement switch
-    plt.grid()
-    return None
+    """Preview the motion of the model in 2D (see DapPreview): animated from
+    the results store of the run folder, if it has results, or else showing
+    the current configuration of the bodies.
+    Returns the preview"""
+    global Bodies, Points, Joints, Forces
+    from DapPreview import PlanarPreview
+
+    preview = PlanarPreview(Bodies, Points, Joints, Forces)
+    if ResultsStore.exists(folder) and ResultsStore(folder).rows > 0:
+        preview.animate(ResultsStore(folder))
+        return preview
+    r = np.zeros((len(Bodies), 2))
+    p = np.zeros(len(Bodies))
+    for Bi in range(1, len(Bodies)):
+        r[Bi] = np.ravel(Bodies[Bi, 0].r)
+        p[Bi] = Bodies[Bi, 0].p
+    preview.show(r, p)
+    return preview
 
 
 # ###############################################################
@@ -1741,53 +1703,20 @@ def plot_system():  # 2D Animation
 # %%% Update_Position
 #  -------------------------------------------------------------------------
 def Update_Position():
-    global Bodies
-    global Points
-    global nB
-    global nP
-    global nU
-    global Uvectors
+    global Arrays
     #  Update_Position
-    #  Compute A's
-    for Bi in range(1, nB):
-        B_A_ = np.concatenate((RotMatrix(Bodies[Bi, 0].p)), axis=None)
-        B_A_1 = np.array([[B_A_[0], B_A_[1]]])
-        B_A_2 = np.array([[B_A_[2], B_A_[3]]])
-        Bodies[Bi, 0].A = np.concatenate((B_A_1, B_A_2), axis=0)
-    #  Compute sP = A * sP_prime; rP = r + sP
-    for Pi in range(1, nP):
-        Bi = Points[Pi, 0].Bindex
-        if Bi != 0:
-            Points[Pi, 0].sP = np.matmul(Bodies[Bi, 0].A, Points[Pi, 0].sPlocal)
-            Points[Pi, 0].sP_r = RotMatrix90(Points[Pi, 0].sP)
-            Points[Pi, 0].rP = Bodies[Bi, 0].r + Points[Pi, 0].sP
-    for Vi in range(1, nU):
-        Bi = Uvectors[Vi, 0].Bindex
-        if Bi != 0:
-            Uvectors[Vi, 0].u = np.matmul(Bodies[Bi, 0].A, Uvectors[Vi, 0].ulocal)
-            Uvectors[Vi, 0].u_r = RotMatrix90(Uvectors[Vi, 0].u)
+    #  Compute A's, then sP = A * sP_prime; rP = r + sP for all the points
+    #  (and u = A * u_prime for all the unit vectors) in one kernel call
+    Arrays.updatePosition()
 
 
 # %%% Update_Velocity
 #  -------------------------------------------------------------------------
 def Update_Velocity():
     #  Update_Velocity
-    #  Compute sP_dot and rP_dot vectors
-    global Points
-    global Uvectors
-    global Bodies
-    global nP
-    global nU
-    for Pi in range(1, nP):
-        Bi = Points[Pi, 0].Bindex
-        if Bi != 0:
-            Points[Pi, 0].sP_d = Points[Pi, 0].sP_r * Bodies[Bi, 0].p_d
-            Points[Pi, 0].rP_d = Bodies[Bi, 0].r_d + Points[Pi, 0].sP_d
-    #  Compute u_dot vectors
-    for Vi in range(1, nU):
-        Bi = Uvectors[Vi, 0].Bindex
-        if Bi != 0:
-            Uvectors[Vi, 0].u_d = Uvectors[Vi, 0].u_r * Bodies[Bi, 0].p_d
+    #  Compute sP_dot and rP_dot vectors, and the u_dot vectors
+    global Arrays
+    Arrays.updateVelocity()
 
 
 # #TODO: not working
@@ -1920,13 +1849,24 @@ def readInputFiles():
     global xmin, xmax, ymin, ymax
     global showtime, t10
     global flags, pen_d0
+    global Index
     print("Reading input files")
-    exec(open(os.path.join(folder, "inBodies.py")).read())
-    exec(open(os.path.join(folder, "inForces.py")).read())
-    exec(open(os.path.join(folder, "inFuncts.py")).read())
-    exec(open(os.path.join(folder, "inJoints.py")).read())
-    exec(open(os.path.join(folder, "inPoints.py")).read())
-    exec(open(os.path.join(folder, "inUvectors.py")).read())
+    if os.path.exists(os.path.join(folder, MODEL_FILE)):
+        model = readModelFile(folder)
+        Bodies = model["Bodies"]
+        Forces = model["Forces"]
+        Functs = model["Functs"]
+        Joints = model["Joints"]
+        Points = model["Points"]
+        Uvectors = model["Uvectors"]
+    else:
+        # Folders written before the model file was introduced
+        exec(open(os.path.join(folder, "inBodies.py")).read())
+        exec(open(os.path.join(folder, "inForces.py")).read())
+        exec(open(os.path.join(folder, "inFuncts.py")).read())
+        exec(open(os.path.join(folder, "inJoints.py")).read())
+        exec(open(os.path.join(folder, "inPoints.py")).read())
+        exec(open(os.path.join(folder, "inUvectors.py")).read())
     print("Bodies inside DapTemp", Bodies)
 
 
@@ -1950,26 +1890,144 @@ def solve():
     global xmin, xmax, ymin, ymax
     global showtime, t10
     global flags, pen_d0
+    global Index, Arrays
     global solution_success
     global Tarray
+    global results_chunk_size
+    global resume, checkpoint_interval
+    global integrator, integrator_options
+    from scipy import integrate
+
     solution_success = False
     exec(open(os.path.join(folder, "dapInputSettings.py")).read())
+    # The result files may be hard linked into the solve cache, so they are
+    # never modified in place: a new run replaces them, and a resumed run
+    # first gives them private copies
+    if resume:
+        unshareResults(folder)
+    else:
+        removeResults(folder)
     u = np.zeros((6 * (nB), 1))
     u = Bodies_to_u(u)
     Tspan = np.arange(t_initial, t_final, dt)
-    Tarray = np.zeros((len(Tspan), len(u)))
-    Tarray[0, :] = np.concatenate((u), axis=None)
-    r = integrate.ode(analysis).set_integrator("dop853")  # choice of method
-    r.set_initial_value(u, t_initial)  # initial values
-    for i in range(1, Tspan.size):
-        Tarray[i, :] = np.concatenate((r.integrate(Tspan[i])), axis=None)
-    Tarray_final = Tarray[:, 1 : (6 * (nB - 1) + 1)]  # Assigned to but never used
-    if not r.successful():
+    input_hash = hashInputFiles(folder)
+
+    # When resuming, the run continues from the state of the last checkpoint,
+    # which may be extended to a later t_final than that of the previous run
+    rows = 0
+    checkpoint = readCheckpoint(folder) if resume else None
+    if checkpoint is not None:
+        if str(checkpoint["input_hash"]) != input_hash:
+            raise RuntimeError("The model has changed since the checkpoint was written")
+        if checkpoint["t_initial"] != t_initial or checkpoint["dt"] != dt:
+            raise RuntimeError(
+                "The start time or reporting time step has changed since "
+                "the checkpoint was written"
+            )
+        rows = int(checkpoint["rows"])
+        if rows > Tspan.size:
+            raise RuntimeError("The checkpoint lies beyond the end time")
+        u = np.reshape(checkpoint["u"], (6 * nB, 1))
+        flags = checkpoint["flags"]
+        pen_d0 = checkpoint["pen_d0"]
+        num = int(checkpoint["num"])
+        t10 = int(checkpoint["t10"])
+        print("Resuming from t =", float(checkpoint["t"]))
+
+    # The reported states are streamed to the results store in chunks, rather
+    # than being kept in memory for the whole run
+    writer = ResultsWriter(
+        folder,
+        len(u),
+        derived={"rP": [nP, 2], "rP_d": [nP, 2]},
+        derive=pointChannels,
+        chunk_size=results_chunk_size,
+        info={"nB": nB, "nP": nP, "t_initial": t_initial, "dt": dt},
+        append_rows=None if checkpoint is None else rows,
+    )
+    complete = False
+    aborted = False
+    try:
+        if rows == 0:
+            writer.append(Tspan[0], u)
+            rows = 1
+        # dop853 and dopri5 are restarted at every reporting time, so that
+        # restarting them from a checkpoint reproduces the uninterrupted run
+        r = integrate.ode(analysis).set_integrator(
+            integrator, **integrator_options
+        )  # choice of method
+        r.set_initial_value(u, Tspan[rows - 1])  # initial values
+        for i in range(rows, Tspan.size):
+            u = r.integrate(Tspan[i])
+            writer.append(Tspan[i], u)
+            if (i + 1) % checkpoint_interval == 0:
+                writer.flush(solverCheckpoint(Tspan[i], u, input_hash))
+            if writer.abort_requested:
+                aborted = True
+                break
+        complete = not aborted and r.successful()
+    finally:
+        # An aborted run is checkpointed at its last report, to be resumed
+        writer.close(
+            complete,
+            solverCheckpoint(r.t, r.y, input_hash) if complete or aborted else None,
+        )
+    Tarray = ResultsStore(folder).channel("u")
+    if aborted:
+        raise RuntimeError("The solve was aborted (it can be resumed)")
+    if not complete:
         raise RuntimeError("Could not integrate")
     solution_success = True
     return solution_success
 
 
+#  -------------------------------------------------------------------------
+def solverCheckpoint(t, u, input_hash):
+    """The state needed to continue the integration from reporting time t"""
+    global flags, pen_d0, num, t10
+    return {
+        "t": t,
+        "u": np.array(u, dtype=np.float64),
+        "flags": np.array(flags),
+        "pen_d0": np.array(pen_d0),
+        "num": num,
+        "t10": t10,
+        "t_initial": t_initial,
+        "dt": dt,
+        "input_hash": input_hash,
+    }
+
+
+#  -------------------------------------------------------------------------
+def pointChannels(time, states):
+    """Derived channels of a chunk of reported states (one row per report):
+    the positions (rP) and velocities (rP_d) of all the points, with all the
+    points of all the reports rotated in one call"""
+    global nB, nP, Arrays
+    nt = len(time)
+    nc = 3 * (nB - 1)
+    r = np.zeros((nt, nB, 2))
+    p = np.zeros((nt, nB))
+    rd = np.zeros((nt, nB, 2))
+    pd = np.zeros((nt, nB))
+    q = np.reshape(states[:, 1 : nc + 1], (nt, nB - 1, 3))
+    q_d = np.reshape(states[:, nc + 1 : 2 * nc + 1], (nt, nB - 1, 3))
+    r[:, 1:, :] = q[:, :, 0:2]
+    p[:, 1:] = q[:, :, 2]
+    rd[:, 1:, :] = q_d[:, :, 0:2]
+    pd[:, 1:] = q_d[:, :, 2]
+    #  sP = A * sPlocal, rP = r + sP, rP_d = r_d + sP_r * p_d
+    Pb = Arrays.point_body
+    A = RotMatrixArray(np.ravel(p[:, Pb]))
+    sP = RotatePointArray(A, np.tile(Arrays.sPlocal, (nt, 1)))
+    sP_r = RotMatrix90Array(sP)
+    rP = r[:, Pb, :] + np.reshape(sP, (nt, nP, 2))
+    rPd = rd[:, Pb, :] + np.reshape(sP_r, (nt, nP, 2)) * pd[:, Pb, np.newaxis]
+    rP[:, 0, :] = 0.0
+    rPd[:, 0, :] = 0.0
+    return {"rP": rP, "rP_d": rPd}
+
+
 #  -------------------------------------------------------------------------
 def writeOutputs():
     global Bodies, nB, nB3, nB6
@@ -1984,104 +2042,28 @@ def writeOutputs():
     global xmin, xmax, ymin, ymax
     global showtime, t10
     global flags, pen_d0
+    global Index, Arrays
     global solution_success
     global Tarray
+    global results_chunk_size
     global write_success
     write_success = False
     Tspan = np.arange(t_initial, t_final, dt)
     nt = len(Tspan)  # number of time steps
-    r = np.zeros((nt, nB, 2))  # translational coordinates
-    rd = np.zeros((nt, nB, 2))  # translational velocities
-    rdd = np.zeros((nt, nB, 2))  # #translational acceleration
-    p = np.zeros((nt, nB))  # rotational coordinate
-    pd = np.zeros((nt, nB))  # angular velocity
-    pdd = np.zeros((nt, nB))  # angular acceleration
-    rP = np.zeros((nt, nP, 2))  # coordinates of points
-    rPd = np.zeros((nt, nP, 2))  # velocity of points
-    Jac = np.zeros((nt, nConst, nB3))  # Jacobian matrix
-    Lam = np.zeros((nt, nConst))  # Lagrange multipliers
-    eng = np.zeros((nt, 3))  # Energy (kinetic, potential, total)
-    for i in range(0, nt):
-        t = Tspan[i]
-        u = Tarray[i, :].T
-        u_to_Bodies(u)
-        analysis(t, u)
-        for Bi in range(1, nB):
-            r[i, Bi, :] = (Bodies[Bi, 0].r).T
-            p[i, Bi] = (Bodies[Bi, 0].p).T
-            rd[i, Bi, :] = (Bodies[Bi, 0].r_d).T
-            pd[i, Bi] = (Bodies[Bi, 0].p_d).T
-            rdd[i, Bi, :] = (Bodies[Bi, 0].r_dd).T
-            pdd[i, Bi] = (Bodies[Bi, 0].p_dd).T
-        for j in range(1, nP):
-            rP[i, j, :] = (Points[j, 0].rP).T
-            rPd[i, j, :] = (Points[j, 0].rP_d).T
-        if nConst > 0:
-            Jac[i, :, :] = D
-            Lam[i, :] = Lambda.T
-        #  Compute kinetic and potential energies
-        kin = (
-            (Tarray[i, 3 * (nB - 1) + 1 : (6 * (nB - 1) + 1)])
-            @ (
-                (
-                    M_array_
-                    @ np.atleast_2d(Tarray[i, 3 * (nB - 1) + 1 : (6 * (nB - 1) + 1)].T)
-                )
-            )
-        ) / 2
-        potential = 0
-        for Fi in range(1, nF):
-            if Forces[Fi, 0].type == "weight":
-                for Bi in range(1, nB):
-                    potential = (
-                        potential - Bodies[Bi, 0].wgt.T @ Bodies[Bi, 0].r
-                    )  # #### np.dot()?????
-            if Forces[Fi, 0].type == "ptp":
-                SDA_ptp(Fi)
-                potential = potential + 0.5 * Forces[Fi, 0].k * delta_ptp ** 2
-            if Forces[Fi, 0].type == "rot_sda":
-                SDA_rot(Fi)
-            if Forces[Fi, 0].type == "flocal":
-                Bi = Forces[Fi, 0].iBindex
-                Bodies[Bi, 0].f = (
-                    Bodies[Bi, 0].f + Bodies[Bi, 0].A * Forces[Fi, 0].flocal
-                )
-            if Forces[Fi, 0].type == "f":
-                Bi = Forces[Fi, 0].iBindex
-                Bodies[Bi, 0].f = Bodies[Bi, 0].f + Forces[Fi, 0].f
-            if Forces[Fi, 0].type == "trq":
-                Bi = Forces[Fi, 0].iBindex
-                Bodies[Bi, 0].n = Bodies[Bi, 0].n + Forces[Fi, 0].trq
-            # NOTE: TODO include user force
-            # if Forces[Fi, 0].type == 'user':
-            #    # if selection == 'a':
-            #        # user_force_AA()
-            #    # elif selection == 'b':
-            #        # user_force_Cart_C()
-            #    # elif selection =='c':
-            #        # user_force_Cart_D()
-            #    # # elif selection == 'd':
-            #    # #     user_force_CB()
-            #    # elif selection == 'd':
-            #        # user_force_MP_A()
-            #    # # elif selection == 'h':
-            #    # #     user_force_MP_B()
-            #    # # elif selection == 'i':
-            #    # #     user_force_MP_C()
-            #    # # elif selection == 'f':
-            #    # #     user_force_Rod()
-            #    # else:
-            #        # print('Undefined User Force')
-        tot = kin + potential
-        eng[i, :] = np.concatenate((kin[0], potential[0, 0], tot[0, 0]), axis=None)
-    print("Done")
-    # WRITE OUTPUT TO FILES
+    results = ResultsStore(folder)
+    rP_store = results.channel("rP")  # coordinates of points
+    rPd_store = results.channel("rP_d")  # velocity of points
     time_size = 5
     num_size = 15
-    # write out positions, velocities and accelerations
+    # The outputs are written one chunk of the results store at a time, so
+    # that only a chunk of the run is held in memory
     bodyPositionsFid = open(os.path.join(folder, "DapBodyPositions"), "w")
     bodyVelocitiesFid = open(os.path.join(folder, "DapBodyVelocities"), "w")
     bodyAcclerationFid = open(os.path.join(folder, "DapBodyAccelerations"), "w")
+    energyFid = open(os.path.join(folder, "DapSystemEnergy"), "w")
+    pointsFid = open(os.path.join(folder, "DapPointsPositions"), "w")
+    pointsVelFid = open(os.path.join(folder, "DapPointsVelocities"), "w")
+    # write out the headers of the positions, velocities and accelerations
     bodyPositionsFid.write("{}".format(str("Time").ljust(time_size)))
     bodyVelocitiesFid.write("{}".format(str("Time").ljust(time_size)))
     bodyAcclerationFid.write("{}".format(str("Time").ljust(time_size)))
@@ -2105,28 +2087,7 @@ def writeOutputs():
     bodyPositionsFid.write("\n")
     bodyVelocitiesFid.write("\n")
     bodyAcclerationFid.write("\n")
-    for i in range(0, nt):
-        bodyPositionsFid.write("{}".format(str(Tspan[i]).ljust(time_size)))
-        bodyVelocitiesFid.write("{}".format(str(Tspan[i]).ljust(time_size)))
-        bodyAcclerationFid.write("{}".format(str(Tspan[i]).ljust(time_size)))
-        for Bi in range(1, nB):
-            bodyPositionsFid.write(
-                "{:15f}{:15f}{:15f}".format(r[i][Bi][0], r[i][Bi][1], p[i][Bi])
-            )
-            bodyVelocitiesFid.write(
-                "{:15f}{:15f}{:15f}".format(rd[i][Bi][0], rd[i][Bi][1], pd[i][Bi])
-            )
-            bodyAcclerationFid.write(
-                "{:15f}{:15f}{:15f}".format(rdd[i][Bi][0], rdd[i][Bi][1], pdd[i][Bi])
-            )
-        bodyPositionsFid.write("\n")
-        bodyVelocitiesFid.write("\n")
-        bodyAcclerationFid.write("\n")
-    bodyPositionsFid.close()
-    bodyVelocitiesFid.close()
-    bodyAcclerationFid.close()
-    # write out system energy
-    energyFid = open(os.path.join(folder, "DapSystemEnergy"), "w")
+    # write out the header of the system energy
     energyFid.write(
         "{}{}{}{}".format(
             str("Time").ljust(time_size),
@@ -2136,16 +2097,7 @@ def writeOutputs():
         )
     )
     energyFid.write("\n")
-    for i in range(nt):
-        energyFid.write(
-            "{}{:15e}{:15e}{:15e}".format(
-                str(Tspan[i]).ljust(time_size), eng[i, 0], eng[i, 1], eng[i, 2]
-            )
-        )
-        energyFid.write("\n")
-    energyFid.close()
-    pointsFid = open(os.path.join(folder, "DapPointsPositions"), "w")
-    pointsVelFid = open(os.path.join(folder, "DapPointsVelocities"), "w")
+    # write out the headers of the points
     pointsFid.write("{}".format(str("Time").ljust(time_size)))
     pointsVelFid.write("{}".format(str("Time").ljust(time_size)))
     for Pi in range(1, nP):
@@ -2155,14 +2107,121 @@ def writeOutputs():
         pointsVelFid.write("{}".format(("Point" + str(Pi) + "_y").rjust(num_size)))
     pointsFid.write("\n")
     pointsVelFid.write("\n")
-    for i in range(0, nt):
-        pointsFid.write("{}".format(str(Tspan[i]).ljust(time_size)))
-        pointsVelFid.write("{}".format(str(Tspan[i]).ljust(time_size)))
-        for Pi in range(1, nP):
-            pointsFid.write("{:15f}{:15f}".format(rP[i][Pi][0], rP[i][Pi][1]))
-            pointsVelFid.write("{:15f}{:15f}".format(rPd[i][Pi][0], rPd[i][Pi][1]))
-        pointsFid.write("\n")
-        pointsVelFid.write("\n")
+    chunk_size = max(int(results_chunk_size), 1)
+    nc = 3 * (nB - 1)
+    for start in range(0, nt, chunk_size):
+        stop = min(start + chunk_size, nt)
+        n = stop - start
+        states = np.array(Tarray[start:stop, :])
+        rP = np.array(rP_store[start:stop])
+        rPd = np.array(rPd_store[start:stop])
+        r = np.zeros((n, nB, 2))  # translational coordinates
+        rd = np.zeros((n, nB, 2))  # translational velocities
+        rdd = np.zeros((n, nB, 2))  # #translational acceleration
+        p = np.zeros((n, nB))  # rotational coordinate
+        pd = np.zeros((n, nB))  # angular velocity
+        pdd = np.zeros((n, nB))  # angular acceleration
+        eng = np.zeros((n, 3))  # Energy (kinetic, potential, total)
+        #  Coordinates and velocities of the bodies for the chunk at once
+        q = np.reshape(states[:, 1 : nc + 1], (n, nB - 1, 3))
+        q_d = np.reshape(states[:, nc + 1 : 2 * nc + 1], (n, nB - 1, 3))
+        r[:, 1:, :] = q[:, :, 0:2]
+        p[:, 1:] = q[:, :, 2]
+        rd[:, 1:, :] = q_d[:, :, 0:2]
+        pd[:, 1:] = q_d[:, :, 2]
+        for i in range(0, n):
+            t = Tspan[start + i]
+            u = states[i, :].T
+            u_to_Bodies(u)
+            analysis(t, u)
+            Arrays.toStructs(Bodies, Points, Uvectors)
+            rdd[i, :, :] = Arrays.r_dd
+            pdd[i, :] = Arrays.p_dd
+            #  Compute kinetic and potential energies
+            kin = (
+                (states[i, 3 * (nB - 1) + 1 : (6 * (nB - 1) + 1)])
+                @ (
+                    (
+                        M_array_
+                        @ np.atleast_2d(
+                            states[i, 3 * (nB - 1) + 1 : (6 * (nB - 1) + 1)].T
+                        )
+                    )
+                )
+            ) / 2
+            potential = 0
+            # NOTE: only the conservative force elements contribute to the
+            # potential energy, so the force elements are looked up by type in
+            # the model index
+            for Fi in Index.forcesOfType("weight"):
+                for Bi in range(1, nB):
+                    potential = (
+                        potential - Bodies[Bi, 0].wgt.T @ Bodies[Bi, 0].r
+                    )  # #### np.dot()?????
+            for Fi in Index.forcesOfType("ptp"):
+                SDA_ptp(Fi)
+                potential = potential + 0.5 * Forces[Fi, 0].k * delta_ptp ** 2
+            # NOTE: TODO include user force
+            # if Forces[Fi, 0].type == 'user':
+            #    # if selection == 'a':
+            #        # user_force_AA()
+            #    # elif selection == 'b':
+            #        # user_force_Cart_C()
+            #    # elif selection =='c':
+            #        # user_force_Cart_D()
+            #    # # elif selection == 'd':
+            #    # #     user_force_CB()
+            #    # elif selection == 'd':
+            #        # user_force_MP_A()
+            #    # # elif selection == 'h':
+            #    # #     user_force_MP_B()
+            #    # # elif selection == 'i':
+            #    # #     user_force_MP_C()
+            #    # # elif selection == 'f':
+            #    # #     user_force_Rod()
+            #    # else:
+            #        # print('Undefined User Force')
+            tot = kin + potential
+            eng[i, :] = np.concatenate((kin[0], potential[0, 0], tot[0, 0]), axis=None)
+        # WRITE OUTPUT TO FILES
+        for i in range(0, n):
+            time_label = str(Tspan[start + i]).ljust(time_size)
+            bodyPositionsFid.write("{}".format(time_label))
+            bodyVelocitiesFid.write("{}".format(time_label))
+            bodyAcclerationFid.write("{}".format(time_label))
+            for Bi in range(1, nB):
+                bodyPositionsFid.write(
+                    "{:15f}{:15f}{:15f}".format(r[i][Bi][0], r[i][Bi][1], p[i][Bi])
+                )
+                bodyVelocitiesFid.write(
+                    "{:15f}{:15f}{:15f}".format(rd[i][Bi][0], rd[i][Bi][1], pd[i][Bi])
+                )
+                bodyAcclerationFid.write(
+                    "{:15f}{:15f}{:15f}".format(
+                        rdd[i][Bi][0], rdd[i][Bi][1], pdd[i][Bi]
+                    )
+                )
+            bodyPositionsFid.write("\n")
+            bodyVelocitiesFid.write("\n")
+            bodyAcclerationFid.write("\n")
+            energyFid.write(
+                "{}{:15e}{:15e}{:15e}".format(
+                    time_label, eng[i, 0], eng[i, 1], eng[i, 2]
+                )
+            )
+            energyFid.write("\n")
+            pointsFid.write("{}".format(time_label))
+            pointsVelFid.write("{}".format(time_label))
+            for Pi in range(1, nP):
+                pointsFid.write("{:15f}{:15f}".format(rP[i][Pi][0], rP[i][Pi][1]))
+                pointsVelFid.write("{:15f}{:15f}".format(rPd[i][Pi][0], rPd[i][Pi][1]))
+            pointsFid.write("\n")
+            pointsVelFid.write("\n")
+    print("Done")
+    bodyPositionsFid.close()
+    bodyVelocitiesFid.close()
+    bodyAcclerationFid.close()
+    energyFid.close()
     pointsFid.close()
     pointsVelFid.close()
     write_success = True
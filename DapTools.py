@@ -41,6 +41,7 @@
 
 import FreeCAD
 import os
+import DapRegistry
 
 # Select if we want to be in debug mode
 global Debug
@@ -49,60 +50,102 @@ Debug = True
 
 #  -------------------------------------------------------------------------
 def setActiveContainer(container):
-    from DapContainer import _DapContainer
-
-    for obj in FreeCAD.ActiveDocument.Objects:
-        if hasattr(obj, "Proxy") and isinstance(obj.Proxy, _DapContainer):
-            obj.IsActiveContainer = False
+    for obj in list(DapRegistry.getIndex().containers):
+        obj.IsActiveContainer = False
     container.IsActiveContainer = True
 
 
 #  -------------------------------------------------------------------------
 def getActiveContainer():
-    from DapContainer import _DapContainer
+    index = DapRegistry.getIndex()
+    if index is None:
+        return None
+    return index.active_container
 
-    for obj in FreeCAD.ActiveDocument.Objects:
-        if hasattr(obj, "Proxy") and isinstance(obj.Proxy, _DapContainer):
-            if obj.IsActiveContainer:
-                return obj
-    return None
+
+#  -------------------------------------------------------------------------
+def getObjectByLabel(doc, label):
+    """Return the (first) object of doc with label, or None if there is none"""
+
+    return DapRegistry.getIndex(doc).objects_by_label.get(label)
 
 
 #  -------------------------------------------------------------------------
-def getListOfSolidsFromShape(
-    obj, shape_label_list=[], parent_object=None, parent_assembly={}
-):
-    """Recursively loops through assemblies or shape objects to find all the sub shapes
+def getActiveMembers(type_name):
+    """Return the objects of the active container whose name contains
+    type_name, e.g. DapBody"""
+
+    index = DapRegistry.getIndex()
+    if index is None:
+        return []
+    return index.activeMembers(type_name)
+
+
+#  -------------------------------------------------------------------------
+def getSolidIndex(obj):
+    """Loops through assemblies or shape objects to find all the sub shapes
     input:
         obj: object, such as assembly container, part, body
     returns:
-        shape_label_list: list of the labels of objects contained within obj"""
-
+        list of (label, parent assembly) of the shapes contained within obj,
+        where parent assembly is the Assembly 4 assembly object containing
+        the shape, or None.
+    The traversal is remembered in the index of the document (see DapRegistry)
+    per object name and shape, so that it is only repeated once the object
+    has been recomputed or the document structure has changed"""
+
+    memo = DapRegistry.getIndex(obj.Document).solid_index
     if hasattr(obj, "Shape"):
-        solids = obj.Shape.Solids
+        key = (obj.Name, obj.Shape.hashCode())
+    else:
+        key = (obj.Name, None)
+    if key in memo:
+        return memo[key]
+
+    solid_index = []
+    # Objects still to visit, with their parent assembly, in visiting order
+    stack = [(obj, None)]
+    while stack:
+        current_obj, parent_object = stack.pop()
+        if not hasattr(current_obj, "Shape"):
+            continue
+        solids = current_obj.Shape.Solids
         if len(solids) == 1:
-            shape_label_list.append(obj.Label)
-            if parent_object == None:
-                parent_assembly[obj.Label] = None
-            else:
-                parent_assembly[obj.Label] = parent_object.Label
+            solid_index.append((current_obj.Label, parent_object))
         elif len(solids) > 1:
             # if hasattr(obj, "Group"):
-            if hasattr(obj, "Type"):
-                if obj.Type == "Assembly":
+            if hasattr(current_obj, "Type"):
+                if current_obj.Type == "Assembly":
                     # This applies to assemlby 4 assemblies
                     # TODO add in a formal checker for assemblies
-                    for sub_object in obj.Group:
-                        getListOfSolidsFromShape(
-                            sub_object, shape_label_list, obj, parent_assembly
-                        )
-            elif obj.Shape.ShapeType == "Compound":
-                shape_label_list.append(obj.Label)
-                if parent_object == None:
-                    parent_assembly[obj.Label] = None
-                else:
-                    parent_assembly[obj.Label] = parent_object.Label
+                    for sub_object in reversed(current_obj.Group):
+                        stack.append((sub_object, current_obj))
+            elif current_obj.Shape.ShapeType == "Compound":
+                solid_index.append((current_obj.Label, parent_object))
+    memo[key] = solid_index
+    return solid_index
+
 
+#  -------------------------------------------------------------------------
+def getListOfSolidsFromShape(obj, shape_label_list=None, parent_assembly=None):
+    """Find all the sub shapes of obj (see getSolidIndex)
+    input:
+        obj: object, such as assembly container, part, body
+    returns:
+        shape_label_list: list of the labels of objects contained within obj
+        parent_assembly: dictionary of the label of the parent assembly of
+                         each of these objects (or None)"""
+
+    if shape_label_list is None:
+        shape_label_list = []
+    if parent_assembly is None:
+        parent_assembly = {}
+    for label, parent_object in getSolidIndex(obj):
+        shape_label_list.append(label)
+        if parent_object == None:
+            parent_assembly[label] = None
+        else:
+            parent_assembly[label] = parent_object.Label
     return shape_label_list, parent_assembly
 
 
@@ -110,27 +153,33 @@ def getListOfSolidsFromShape(
 def getSolidsFromAllShapes(doc):
     """Function loops through all defined bodies, and return the list
     of shapes making up each body, as well as return the parent assembly
-    for each sub part. If the subpart does not have a parent assembly then
-    it is defined as None."""
+    for each sub part and the placement matrix of that parent assembly.
+    If the subpart does not have a parent assembly then both are None."""
 
     body_labels = getListOfBodyLabels()
     parts_shape_list_all = {}
     parent_assembly_all = {}
-    if len(body_labels):
-        for i in range(len(body_labels)):
-            selection_object = doc.getObjectsByLabel(body_labels[i])[0]
-            list_of_parts = selection_object.References
-            for current_body_label in list_of_parts:
-                obj = doc.getObjectsByLabel(current_body_label)[0]
-                shape_label_list, parent_assembly = getListOfSolidsFromShape(obj, [])
-                parts_shape_list_all[current_body_label] = shape_label_list
-                parent_assembly_all.update(parent_assembly)
-    return parts_shape_list_all, parent_assembly_all
+    parent_placement_all = {}
+    for body_label in body_labels:
+        selection_object = getObjectByLabel(doc, body_label)
+        for current_body_label in selection_object.References:
+            obj = getObjectByLabel(doc, current_body_label)
+            shape_label_list = []
+            for label, parent_object in getSolidIndex(obj):
+                shape_label_list.append(label)
+                if parent_object == None:
+                    parent_assembly_all[label] = None
+                    parent_placement_all[label] = None
+                else:
+                    parent_assembly_all[label] = parent_object.Label
+                    parent_placement_all[label] = parent_object.Placement.Matrix
+            parts_shape_list_all[current_body_label] = shape_label_list
+    return parts_shape_list_all, parent_assembly_all, parent_placement_all
 
 
 #  -------------------------------------------------------------------------
 def getAssemblyObjectByLabel(doc, parent_assembly_label, part_label):
-    parent_assembly_obj = doc.getObjectsByLabel(parent_assembly_label)[0]
+    parent_assembly_obj = getObjectByLabel(doc, parent_assembly_label)
     for sub_object in parent_assembly_obj.Group:
         if sub_object.Label == part_label:
             return sub_object
@@ -157,22 +206,12 @@ def addObjectProperty(obj, prop, init_val, type, *args):
 
 #  -------------------------------------------------------------------------
 def getListOfBodyLabels():
-    body_labels = []
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapBody" in i.Name:
-            body_labels.append(i.Label)
-    return body_labels
+    return [i.Label for i in getActiveMembers("DapBody")]
 
 
 #  -------------------------------------------------------------------------
 def getListOfBodyObjects():
-    body_objects = []
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapBody" in i.Name:
-            body_objects.append(i)
-    return body_objects
+    return list(getActiveMembers("DapBody"))
 
 
 #  -------------------------------------------------------------------------
@@ -180,7 +219,7 @@ def getListOfMovingBodies(list_of_body_labels, solver_document):
     moving_bodies = []
     # for body in self.body_objects:
     for i in range(len(list_of_body_labels)):
-        body_objects = solver_document.getObjectsByLabel(list_of_body_labels[i])[0]
+        body_objects = getObjectByLabel(solver_document, list_of_body_labels[i])
         if body_objects.BodyType == "Moving":
             moving_bodies.append(list_of_body_labels[i])
     return moving_bodies
@@ -189,59 +228,36 @@ def getListOfMovingBodies(list_of_body_labels, solver_document):
 #  -------------------------------------------------------------------------
 def getListOfBodyReferences():
     body_references = []
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapBody" in i.Name:
-            body_references = body_references + i.References
+    for i in getActiveMembers("DapBody"):
+        body_references = body_references + i.References
     return body_references
 
 
 #  -------------------------------------------------------------------------
 def getListOfForces():  # Mod
-    forces = []
-    active_container = getActiveContainer()
-    for j in active_container.Group:
-        if "DapForce" in j.Name:
-            forces.append(j.ForceTypes)
-    return forces
+    return [j.ForceTypes for j in getActiveMembers("DapForce")]
 
 
 #  -------------------------------------------------------------------------
 def getMaterialObject():
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapMaterial" in i.Name:
-            return i
-    return None
+    materials = getActiveMembers("DapMaterial")
+    return materials[0] if materials else None
 
 
 #  -------------------------------------------------------------------------
 def getSolverObject():
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapSolver" in i.Name:
-            return i
-    return None
+    solvers = getActiveMembers("DapSolver")
+    return solvers[0] if solvers else None
 
 
 #  -------------------------------------------------------------------------
 def getListOfForceObjects():
-    force_objects = []
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapForce" in i.Name:
-            force_objects.append(i)
-    return force_objects
+    return list(getActiveMembers("DapForce"))
 
 
 #  -------------------------------------------------------------------------
 def getListOfJointObjects():
-    joints = []
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapRelativeMovement" in i.Name:
-            joints.append(i)
-    return joints
+    return list(getActiveMembers("DapRelativeMovement"))
 
 
 #  -------------------------------------------------------------------------
@@ -256,11 +272,9 @@ def get_module_path():
 #  -------------------------------------------------------------------------
 def gravityChecker():
     counter = 0
-    active_container = getActiveContainer()
-    for i in active_container.Group:
-        if "DapForce" in i.Name:
-            if i.ForceTypes == "Gravity":
-                counter += 1
+    for i in getActiveMembers("DapForce"):
+        if i.ForceTypes == "Gravity":
+            counter += 1
     if counter > 1:
         return True
     else:
@@ -69,27 +69,12 @@ class DapWorkbench(Workbench):
         if Debug:
             FreeCAD.Console.PrintMessage("Running: DapWorkbench->Initialize\n")
 
-        # Import all the commands we might use from the respective files
-        from DapContainer import _CommandDapContainer
-        from DapBodySelection import _CommandDapBody
-        from DapJointSelection import _CommandDapJoint
-        from DapMaterialSelection import _CommandDapMaterial
-        from DapForceSelection import _CommandDapForce
-        from DapSolverRunner import _CommandDapSolver
-        from DapAnimation import _CommandDapAnimation
-        from DapPlot import _CommandDapPlot
-        from DapPointSelection import _CommandDapPoint
-
-        # Define which commands will be called with each command alias
-        FreeCADGui.addCommand("Dap_Container_alias", _CommandDapContainer())
-        FreeCADGui.addCommand("Dap_Body_alias", _CommandDapBody())
-        FreeCADGui.addCommand("Dap_Joint_alias", _CommandDapJoint())
-        FreeCADGui.addCommand("Dap_Force_alias", _CommandDapMaterial())
-        FreeCADGui.addCommand("Dap_Material_alias", _CommandDapForce())
-        FreeCADGui.addCommand("Dap_Solver_alias", _CommandDapSolver())
-        FreeCADGui.addCommand("Dap_Animation_alias", _CommandDapAnimation())
-        FreeCADGui.addCommand("Dap_Plot_alias", _CommandDapPlot())
-        FreeCADGui.addCommand("Dap_Point_alias", _CommandDapPoint())
+        # Register the commands through lightweight stubs, which import the
+        # module of a command only when the command is run
+        from DapCommands import COMMANDS, _CommandDapStub
+
+        for alias in COMMANDS:
+            FreeCADGui.addCommand(alias, _CommandDapStub(alias))
 
         # Create a toolbar with the DAP commands (icons)
         self.appendToolbar("Nikra-DAP Commands", self.MakeCommandList())
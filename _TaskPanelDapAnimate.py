@@ -35,10 +35,19 @@
 # ************************************************************************************
 
 import os
+import time
 import FreeCAD
 import DapTools
 import numpy as np
-import math
+from DapResultsStore import requestAbort
+from DapBodyMotion import (
+    BodyMotion,
+    centerOfGravityOfSolids,
+    interpolateMotion,
+    readMotion,
+    readStoreRows,
+)
+from DapRenderFrames import exportFrames, frameTimes
 
 if FreeCAD.GuiUp:
     import FreeCADGui
@@ -60,7 +69,11 @@ class TaskPanelDapAnimate:
         solver_document,
         animation_document,
         list_of_bodies,
+        scene=None,
     ):
+        """animation_document holds the copies of the bodies which are moved,
+        unless the bodies are moved in the scene graph overlay scene
+        (see DapAnimationScene), in which case it is None"""
 
         if Debug:
             FreeCAD.Console.PrintMessage("Opening TaskPanelDapAnimate\n")
@@ -72,13 +85,10 @@ class TaskPanelDapAnimate:
         self.solver_object = solver_object
         self.solver_document = solver_document
         self.animation_document = animation_document
+        self.scene = scene
         self.results = np.array(solver_object.DapResults)
         self.list_of_bodies = list_of_bodies
         self.rotation_matrix = solver_object.global_rotation_matrix
-        # The list of all the body locations for each clock tick
-        self.Bodies_r = solver_object.Bodies_r
-        # The list of all the body angles for each clock tick
-        self.Bodies_p = solver_object.Bodies_p
 
         # Set the scale to convert from meters to mm
         self.scale = 1.0e3
@@ -88,23 +98,32 @@ class TaskPanelDapAnimate:
         self.t_final = solver_object.EndTime
         self.reporting_time_step = solver_object.ReportingTimeStep
         self.plane_norm = solver_object.UnitVector
-        self.reportedTimes = solver_object.ReportedTimes
 
-        # Set play back period to mid-range
-        self.play_back_period = 100  # msec
+        self.list_of_moving_bodies = DapTools.getListOfMovingBodies(
+            self.list_of_bodies, self.solver_document
+        )
+        if self.scene is None:
+            self.moving_body_objects = [
+                self.animation_body_objects[self.list_of_bodies.index(body_label)]
+                for body_label in self.list_of_moving_bodies
+            ]
+        self.readMotion()
+
+        # The timer refreshes the display at about the display frame rate;
+        # the time shown is taken from the playback clock, so that frames are
+        # skipped when rendering falls behind
+        self.frame_period = 16  # msec
+        self.clock_origin = (time.perf_counter(), self.reportedTimes[0])
+        self.current_time = self.reportedTimes[0]
 
         # Set up the timer parameters
-        self.n_time_steps = len(self.Bodies_r) - 1
+        self.n_time_steps = len(self.angles) - 1
         self.timer = PySide.QtCore.QTimer()
-        self.timer.setInterval(self.play_back_period)
+        self.timer.setInterval(self.frame_period)
         self.timer.timeout.connect(
             self.onTimerTimeout  # callback function after each tick
         )
 
-        self.list_of_moving_bodies = DapTools.getListOfMovingBodies(
-            self.list_of_bodies, self.solver_document
-        )
-
         # Load the Dap Animate ui form
         ui_path = os.path.join(os.path.dirname(__file__), "TaskPanelDapAnimate.ui")
         self.form = FreeCADGui.PySideUic.loadUi(ui_path)
@@ -120,34 +139,184 @@ class TaskPanelDapAnimate:
         self.form.startButton.clicked.connect(self.playStart)
         self.form.stopButton.clicked.connect(self.stopStop)
         self.form.playSpeed.valueChanged.connect(self.changePlaySpeed)
+        self.form.abortButton.clicked.connect(self.abortRun)
+        self.form.exportButton.clicked.connect(self.exportFrames)
+
+        # The placements of all the moving bodies for each clock tick
+        self.computeMotion()
+
+        # The results of a run which is still being solved are refreshed
+        # periodically, to follow the run
+        self.refresh_period = 500  # msec
+        self.refresh_timer = PySide.QtCore.QTimer()
+        self.refresh_timer.setInterval(self.refresh_period)
+        self.refresh_timer.timeout.connect(self.onRefreshTimeout)
+        self.setRunning(self.store is not None and not self.store.complete)
+
+    #  -------------------------------------------------------------------------
+    def readMotion(self):
+        """Read the reported times, and the locations and angles of the moving
+        bodies for each clock tick, from the results store of the run, or else
+        from the results loaded into the solver object"""
+
+        self.store, self.reportedTimes, self.locations, self.angles = readMotion(
+            self.solver_object, len(self.list_of_moving_bodies)
+        )
+
+    #  -------------------------------------------------------------------------
+    def appendMotion(self, start):
+        """Append the rows of the results store from start on to the motion,
+        see computeMotion()"""
+
+        times, locations, angles = readStoreRows(
+            self.store, len(self.list_of_moving_bodies), start
+        )
+        bases, quaternions = self.motion.transforms(locations, angles)
+        self.reportedTimes = np.concatenate((self.reportedTimes, times))
+        self.locations = np.concatenate((self.locations, locations))
+        self.angles = np.concatenate((self.angles, angles))
+        self.bases = np.concatenate((self.bases, bases))
+        self.quaternions = np.concatenate((self.quaternions, quaternions))
+        if self.scene is None:
+            self.placements += [
+                self.makePlacements(body_bases, body_quaternions)
+                for body_bases, body_quaternions in zip(bases, quaternions)
+            ]
+        self.n_time_steps = len(self.reportedTimes) - 1
+        self.form.horizontalSlider.setRange(0, self.n_time_steps)
+
+    #  -------------------------------------------------------------------------
+    def setRunning(self, running):
+        """Follow the run while it is still being solved"""
+
+        self.form.followCheckBox.setEnabled(running)
+        self.form.abortButton.setEnabled(running)
+        if running:
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    #  -------------------------------------------------------------------------
+    def onRefreshTimeout(self):
+        """Append the results reported since the last refresh of a run which
+        is still being solved, and show the newest of them when following the
+        run (and not playing)"""
+
+        n_ticks = len(self.reportedTimes)
+        self.store.refresh()
+        if self.store.rows < n_ticks:
+            FreeCAD.Console.PrintWarning("The run has been restarted\n")
+            self.setRunning(False)
+            return
+        if self.store.rows > n_ticks:
+            self.appendMotion(n_ticks)
+            if self.form.followCheckBox.isChecked() and not self.timer.isActive():
+                self.form.horizontalSlider.setValue(self.n_time_steps)
+        if self.store.complete:
+            self.setRunning(False)
+
+    #  -------------------------------------------------------------------------
+    def abortRun(self):
+        """Ask the solver of the run to stop"""
+
+        requestAbort(self.solver_object.FileDirectory)
+        self.form.abortButton.setEnabled(False)
+        FreeCAD.Console.PrintMessage("Abort of the run requested\n")
 
-        self.current_pose = self.thisTick_Pose(0)
+    #  -------------------------------------------------------------------------
+    def exportFrames(self):
+        """Render the animation off-screen to a numbered PNG sequence in a
+        folder chosen by the user, at the frame rate, play speed and frame
+        size chosen in the dialog (see DapRenderFrames)"""
+
+        folder = PySide.QtGui.QFileDialog.getExistingDirectory()
+        if not folder:
+            return
+        self.timer.stop()
+        shown_time = self.current_time
+        if self.scene is None:
+            view = FreeCADGui.ActiveDocument.ActiveView
+        else:
+            view = self.scene.view
+        exportFrames(
+            view,
+            self.showTime,
+            frameTimes(
+                self.reportedTimes,
+                self.form.frameRate.value(),
+                self.form.playSpeed.value(),
+            ),
+            folder,
+            self.form.frameWidth.value(),
+            self.form.frameHeight.value(),
+        )
+        self.showTime(shown_time)
+
+    #  -------------------------------------------------------------------------
+    def computeMotion(self):
+        """Compute the placement of every moving body at every clock tick in
+        one pass, so that moving to a tick only assigns placements
+        (see DapBodyMotion.BodyMotion).
+        The translations and rotations are kept in self.bases and
+        self.quaternions; for the copies of the bodies they are those of the
+        absolute placements (also kept as self.placements), while for the
+        scene graph overlay they are relative to the initial placements"""
+
+        if self.scene is None:
+            cogs = [
+                centerOfGravityOfSolids(body_object.Shape.Solids)
+                for body_object in self.moving_body_objects
+            ]
+            placements = [
+                body_object.Placement for body_object in self.moving_body_objects
+            ]
+        else:
+            cogs = [centerOfGravityOfSolids(solids) for solids in self.scene.solids]
+            placements = [FreeCAD.Placement() for solids in self.scene.solids]
+        self.motion = BodyMotion(
+            self.plane_norm,
+            self.rotation_matrix,
+            self.angles[0],
+            cogs,
+            placements,
+            self.scale,
+        )
+
+        self.bases, self.quaternions = self.motion.transforms(
+            self.locations, self.angles
+        )
+        if self.scene is None:
+            self.placements = [
+                self.makePlacements(bases, quaternions)
+                for bases, quaternions in zip(self.bases, self.quaternions)
+            ]
 
     #  -------------------------------------------------------------------------
-    def thisTick_Pose(self, clock_tick):
-        """Generate the list of poses for all the bodies at this clock_tick
-        A pose is in polar coordinates, and consists of a radius (r) and
-        angle (p)"""
-
-        PoseAtThisTick = []
-        for body_number in range(len(self.Bodies_p[clock_tick])):
-            location = self.Bodies_r[clock_tick][body_number]
-            angle = self.Bodies_p[clock_tick][body_number]
-            PoseAtThisTick.append([location, angle])
-        return PoseAtThisTick
+    def makePlacements(self, bases, quaternions):
+        """Return the placements of the bodies for one row of their transforms"""
+
+        return [
+            FreeCAD.Placement(FreeCAD.Vector(*base), FreeCAD.Rotation(*quaternion))
+            for base, quaternion in zip(bases, quaternions)
+        ]
 
     #  -------------------------------------------------------------------------
     def reject(self):
         """This is called when the 'close' button is pressed
         Closes document and sets the active document
-        back to the solver document""" 
+        back to the solver document"""
 
         if Debug:
             FreeCAD.Console.PrintMessage("Animate 'close' button pressed\n")
 
+        self.timer.stop()
+        self.refresh_timer.stop()
         FreeCADGui.Control.closeDialog()
-        FreeCAD.closeDocument(self.animation_document.Name)
-        FreeCAD.setActiveDocument(self.solver_document.Name)
+        if self.scene is None:
+            FreeCAD.closeDocument(self.animation_document.Name)
+            FreeCAD.setActiveDocument(self.solver_document.Name)
+        else:
+            self.scene.close()
 
     #  -------------------------------------------------------------------------
     def getStandardButtons(self):
@@ -157,8 +326,12 @@ class TaskPanelDapAnimate:
 
     #  -------------------------------------------------------------------------
     def playStart(self):
-        """Start the Qt timer when the play button is pressed"""
+        """Start playing from the time shown when the play button is pressed
+        (or from the start, if the end has been reached)"""
 
+        if self.current_time >= self.reportedTimes[-1]:
+            self.current_time = self.reportedTimes[0]
+        self.startClock(self.current_time)
         self.timer.start()
 
     #  -------------------------------------------------------------------------
@@ -168,95 +341,120 @@ class TaskPanelDapAnimate:
         self.timer.stop()
 
     #  -------------------------------------------------------------------------
-    def onTimerTimeout(self):
-        """Increment the tick position in the player, looping, if requested"""
+    def startClock(self, simulated_time):
+        """Start the playback clock at simulated_time"""
 
-        tickPosition = self.form.horizontalSlider.value()
-        tickPosition += 1
-        if tickPosition >= self.n_time_steps:
-            if self.form.loopCheckBox.isChecked():
-                tickPosition = 0
-            else:
-                self.timer.stop()
-
-        # Update the slider on the dialog
-        self.form.horizontalSlider.setValue(tickPosition + 1)
+        self.clock_origin = (time.perf_counter(), simulated_time)
 
     #  -------------------------------------------------------------------------
-    def changePlaySpeed(self, newSpeed):
-        """Alter the play back period by a factor of 1/newSpeed"""
-
-        self.timer.setInterval(self.play_back_period * (1.0 / newSpeed))
+    def playbackTime(self):
+        """The simulated time of the playback clock: the wall time since the
+        clock was started, times the play speed (the real-time factor)"""
+
+        wall_time, simulated_time = self.clock_origin
+        return (
+            simulated_time
+            + (time.perf_counter() - wall_time) * self.form.playSpeed.value()
+        )
 
     #  -------------------------------------------------------------------------
-    def centerOfGravityOfCompound(self, compound):
-        """Necessary because older versions of FreeCAD do not have centerOfGravity
-            and compound shapes do not have centerOfMass
-        The Centre of Mass of a compound object:
-          The vector sum of the centre of mass of each solid,
-          weighted by volume"""
-
-        totVol = 0
-        CoG = FreeCAD.Vector(0, 0, 0)
-        for solid in compound.Shape.Solids:
-            vol = solid.Volume
-            totVol += vol
-            CoG += solid.CenterOfMass * vol
+    def onTimerTimeout(self):
+        """Show the bodies at the time of the playback clock, looping, if
+        requested"""
+
+        playback_time = self.playbackTime()
+        if playback_time >= self.reportedTimes[-1]:
+            if self.refresh_timer.isActive() and self.form.followCheckBox.isChecked():
+                # Wait at the newest results of the run for more
+                playback_time = self.reportedTimes[-1]
+                self.startClock(playback_time)
+            elif self.form.loopCheckBox.isChecked():
+                playback_time = self.reportedTimes[0]
+                self.startClock(playback_time)
+            else:
+                playback_time = self.reportedTimes[-1]
+                self.timer.stop()
+        self.showTime(playback_time)
 
-        CoG /= totVol
+    #  -------------------------------------------------------------------------
+    def changePlaySpeed(self, newSpeed):
+        """Continue playing from the time shown at the new play speed"""
 
-        return CoG
+        self.startClock(self.current_time)
 
     #  -------------------------------------------------------------------------
-    def moveObjects(self, clock_tick):
-        """Move all the bodies to their location at this clock tick"""
+    def showTimeLabel(self, simulated_time):
+        """Update the time label in the dialog"""
 
-        # Remember the previous location, and step to the new value
-        previous_pose = self.current_pose.copy()
-        self.current_pose = self.thisTick_Pose(clock_tick)
-
-        # Update the time label in the dialog
         # We add one step to the reported value so that the reported time,
         # ends at exactly t_final
         self.form.timeStepLabel.setText(
             "{0:5.3f}s of {1:5.3f}s".format(
-                self.reportedTimes[clock_tick] + self.reporting_time_step, self.t_final
+                simulated_time + self.reporting_time_step, self.t_final
             )
         )
 
-        # Calculate rotation and translation for each body
-        for body_number in range(len(self.list_of_moving_bodies)):
-            body_index = self.list_of_bodies.index(
-                self.list_of_moving_bodies[body_number]
-            )
-            animation_body_cog = self.centerOfGravityOfCompound(
-                self.animation_body_objects[body_index]
-            )
-            axis_of_rotation = self.plane_norm
-            current_pose = self.current_pose[body_number]
+    #  -------------------------------------------------------------------------
+    def moveObjects(self, clock_tick):
+        """Move all the bodies to their location at this clock tick (when the
+        slider is moved)"""
 
-            # Calculate the position after ROTATION
-            angular_displacement = math.degrees(
-                current_pose[1] - previous_pose[body_number][1]
-            )
-            self.animation_body_objects[body_index].Placement.rotate(
-                animation_body_cog, axis_of_rotation, angular_displacement
-            )
-            rotated_location = FreeCAD.Vector(current_pose[0][0], current_pose[0][1], 0)
+        if self.timer.isActive():
+            # Continue playing from here
+            self.startClock(self.reportedTimes[clock_tick])
+        self.showTick(clock_tick)
 
-            # Rotate the centre of gravity
-            rotated_cog = self.centerOfGravityOfCompound(
-                self.animation_body_objects[body_index]
-            )
-            projected_cog = DapTools.projectPointOntoPlane(self.plane_norm, rotated_cog)
-            orthonormal_translation = (
-                rotated_location * self.scale - self.rotation_matrix * projected_cog
-            )
+    #  -------------------------------------------------------------------------
+    def showTick(self, clock_tick):
+        """Move all the bodies to their location at this clock tick"""
 
-            # Calculate and apply the translation we require
-            required_translation = self.rotation_matrix.transposed().multVec(
-                orthonormal_translation
-            )
-            self.animation_body_objects[body_index].Placement.translate(
-                required_translation
+        self.current_time = self.reportedTimes[clock_tick]
+        self.showTimeLabel(self.current_time)
+
+        # Assign the precomputed placement of each body
+        if self.scene is None:
+            for body_object, placement in zip(
+                self.moving_body_objects, self.placements[clock_tick]
+            ):
+                body_object.Placement = placement
+        else:
+            self.scene.setTransforms(
+                self.bases[clock_tick], self.quaternions[clock_tick]
             )
+
+    #  -------------------------------------------------------------------------
+    def showTime(self, simulated_time):
+        """Move all the bodies to their location at simulated_time,
+        interpolating their locations and angles between the reported times"""
+
+        clock_tick = int(
+            np.searchsorted(self.reportedTimes, simulated_time, side="right") - 1
+        )
+        clock_tick = min(max(clock_tick, 0), self.n_time_steps)
+
+        # Move the slider without moving the bodies to the tick
+        self.form.horizontalSlider.blockSignals(True)
+        self.form.horizontalSlider.setValue(clock_tick)
+        self.form.horizontalSlider.blockSignals(False)
+
+        # At (or beyond) a reported time use its precomputed placements
+        if (
+            clock_tick == self.n_time_steps
+            or simulated_time <= self.reportedTimes[clock_tick]
+        ):
+            self.showTick(clock_tick)
+            return
+
+        self.current_time = simulated_time
+        self.showTimeLabel(simulated_time)
+        locations, angles = interpolateMotion(
+            self.reportedTimes, self.locations, self.angles, np.array([simulated_time])
+        )
+        bases, quaternions = self.motion.transforms(locations[0], angles[0])
+        if self.scene is None:
+            for body_object, placement in zip(
+                self.moving_body_objects, self.makePlacements(bases, quaternions)
+            ):
+                body_object.Placement = placement
+        else:
+            self.scene.setTransforms(bases, quaternions)
@@ -67,6 +67,7 @@ class TaskPanelDapMaterial:
         (
             self.parts_shape_list_all,
             self.parent_assembly_all,
+            parent_placement_all,
         ) = DapTools.getSolidsFromAllShapes(self.doc)
         # FreeCAD.Console.PrintMessage("all parts shape " + str(self.parts_shape_list_all) + "\n")
         # FreeCAD.Console.PrintMessage("all parent assembly " + str(self.parent_assembly_all) + "\n")
@@ -138,10 +139,12 @@ class TaskPanelDapMaterial:
         # doc = FreeCAD.getDocument(docName)
         if len(self.body_labels):
             for i in range(len(self.body_labels)):
-                selection_object = self.doc.getObjectsByLabel(self.body_labels[i])[0]
+                selection_object = DapTools.getObjectByLabel(
+                    self.doc, self.body_labels[i]
+                )
                 list_of_parts = selection_object.References
                 for current_body_label in list_of_parts:
-                    obj = self.doc.getObjectsByLabel(current_body_label)[0]
+                    obj = DapTools.getObjectByLabel(self.doc, current_body_label)
                     # shape_label_list = DapTools.getListOfSolidsFromShape(obj, [])
                     shape_label_list = self.parts_shape_list_all[obj.Label]
                     for sub_shape_label in shape_label_list:
@@ -169,12 +172,14 @@ class TaskPanelDapMaterial:
             QtGui.QHeaderView.ResizeToContents
         )
         if len(self.body_labels):
-            selection_object = self.doc.getObjectsByLabel(self.body_labels[ci])[0]
+            selection_object = DapTools.getObjectByLabel(
+                self.doc, self.body_labels[ci]
+            )
             list_of_parts = selection_object.References
             for current_body_label in list_of_parts:
                 self.form.tableWidget.insertRow(table_row)
                 # current_body_label = list_of_parts[i]
-                obj = self.doc.getObjectsByLabel(current_body_label)[0]
+                obj = DapTools.getObjectByLabel(self.doc, current_body_label)
                 # shape_label_list = DapTools.getListOfSolidsFromShape(obj, [])
                 shape_label_list = self.parts_shape_list_all[obj.Label]
                 if len(shape_label_list) > 1:
@@ -257,11 +262,11 @@ class TaskPanelDapMaterial:
             # switch documents. To circumvent this, if the subpart is part of a subassemlby then the subassemlby
             # will be added to the selection list.
             if self.parent_assembly_all[selection_object_label] != None:
-                selection_object = doc.getObjectsByLabel(
-                    self.parent_assembly_all[selection_object_label]
-                )[0]
+                selection_object = DapTools.getObjectByLabel(
+                    doc, self.parent_assembly_all[selection_object_label]
+                )
             else:
-                selection_object = doc.getObjectsByLabel(selection_object_label)[0]
+                selection_object = DapTools.getObjectByLabel(doc, selection_object_label)
             # selection_object = doc.findObjects(Label = selection_object_label)[0]
             # selection_object = doc.getObjectsByLabel(selection_object_label)[0]
             FreeCADGui.Selection.clearSelection()
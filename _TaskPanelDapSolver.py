@@ -183,12 +183,35 @@ class TaskPanelDapSolver:
         self.printUnitVector()
         self.getTimeValues()
         self.checkValidityOfTime()
-        self.builder = DapSolverBuilder.DapSolverBuilder(self.obj)
+        self.builder = DapSolverBuilder.getBuilder(self.obj)
+        if self.builder.solving():
+            FreeCAD.Console.PrintError(
+                "The run is still being solved in the solver service \n"
+            )
+            return
         FreeCAD.Console.PrintMessage("DAP SOLVER STARTED \n")
         self.builder.writeInputFiles()
-        self.builder.solve()
+        self.builder.solve(self.solverProgress)
         # builder.computeCentreOfGravity()
 
+    #  -------------------------------------------------------------------------
+    def solverProgress(self, event):
+        """Report an event of a solve in the solver service"""
+
+        if event["event"] == "accepted":
+            self.total_rows = max(event["rows"], 1)
+            FreeCAD.Console.PrintMessage(
+                "Solver service job " + str(event["job"]) + " accepted\n"
+            )
+        elif event["event"] == "progress":
+            FreeCAD.Console.PrintMessage(
+                "t = "
+                + str(round(event["t"], 6))
+                + " s ("
+                + str(round(100.0 * event["rows"] / self.total_rows))
+                + "%)\n"
+            )
+
     #  -------------------------------------------------------------------------
     def cmbPlaneChanged(self):  # Mod
         """ """
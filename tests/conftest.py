@@ -0,0 +1,312 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import sys
+import numpy as np
+import pytest
+
+# The workbench modules are flat modules in the root of the repository
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPOSITORY not in sys.path:
+    sys.path.insert(0, REPOSITORY)
+
+from DapModelFile import writeModelFile  # noqa: E402
+
+SETTINGS = "t_initial = 0.0\ndt = 0.01\nt_final = 1.0\n"
+
+# Stand-ins for the FreeCAD GUI modules, which take what the solver builder
+# and the task panels need to be run without FreeCAD. The timers are driven
+# by the tests, by emitting their timeout signal
+GUI_STAND_INS = {
+    "FreeCAD.py": (
+        "class _Console:\n"
+        "    def __init__(self):\n"
+        "        self.messages = []\n"
+        "    def PrintMessage(self, message):\n"
+        "        self.messages.append(message)\n"
+        "    PrintWarning = PrintError = PrintMessage\n"
+        "Console = _Console()\n"
+        "GuiUp = True\n"
+        "ActiveDocument = None\n"
+        "def addDocumentObserver(observer):\n"
+        "    pass\n"
+        "def Vector(*args):\n"
+        "    return args\n"
+    ),
+    "FreeCADGui.py": "",
+    "PySide/__init__.py": "from . import QtCore\n",
+    "PySide/QtCore.py": (
+        "class Signal:\n"
+        "    def __init__(self):\n"
+        "        self.slots = []\n"
+        "    def connect(self, slot):\n"
+        "        self.slots.append(slot)\n"
+        "    def emit(self):\n"
+        "        for slot in self.slots:\n"
+        "            slot()\n"
+        "class QTimer:\n"
+        "    def __init__(self):\n"
+        "        self.timeout = Signal()\n"
+        "        self.active = False\n"
+        "    def setInterval(self, interval):\n"
+        "        self.interval = interval\n"
+        "    def start(self):\n"
+        "        self.active = True\n"
+        "    def stop(self):\n"
+        "        self.active = False\n"
+        "    def isActive(self):\n"
+        "        return self.active\n"
+    ),
+}
+
+
+#  -------------------------------------------------------------------------
+def column(x, y):
+    """Return a 2x1 column vector, as used by the solver's structures"""
+
+    return np.array([[x, y]]).T
+
+
+#  -------------------------------------------------------------------------
+def doublePendulum():
+    """A double pendulum on revolute joints, with a point-to-point spring to
+    the ground and a rotational spring-damper between the two links"""
+
+    return {
+        "Bodies": [
+            {"m": 2.0, "J": 0.1, "r": column(0.5, 0.0), "p": 0.0},
+            {"m": 1.0, "J": 0.05, "r": column(1.25, 0.0), "p": 0.0},
+        ],
+        "Points": [
+            {"Bindex": 0, "sPlocal": column(0.0, 0.0)},
+            {"Bindex": 1, "sPlocal": column(-0.5, 0.0)},
+            {"Bindex": 1, "sPlocal": column(0.5, 0.0)},
+            {"Bindex": 2, "sPlocal": column(-0.25, 0.0)},
+            {"Bindex": 2, "sPlocal": column(0.25, 0.0)},
+            {"Bindex": 0, "sPlocal": column(1.5, 0.5)},
+        ],
+        "Joints": [
+            {"type": "rev", "iPindex": 1, "jPindex": 2},
+            {"type": "rev", "iPindex": 3, "jPindex": 4},
+        ],
+        "Forces": [
+            {"type": "weight", "gravity": 9.81, "wgt": column(0.0, -1.0)},
+            {
+                "type": "ptp",
+                "iPindex": 5,
+                "jPindex": 6,
+                "k": 50.0,
+                "L0": 0.3,
+                "dc": 0.5,
+            },
+            {
+                "type": "rot_sda",
+                "iBindex": 1,
+                "jBindex": 2,
+                "k": 2.0,
+                "theta0": 0.0,
+                "dc": 0.1,
+            },
+        ],
+    }
+
+
+#  -------------------------------------------------------------------------
+def sliderCrank():
+    """A slider on a translational joint to the ground, with a crank hanging
+    from it on a revolute joint, a point-to-point spring pulling the slider
+    and a rotational spring-damper between the slider and the crank"""
+
+    return {
+        "Bodies": [
+            {
+                "m": 3.0,
+                "J": 0.2,
+                "r": column(0.0, 0.0),
+                "p": 0.0,
+                "r_d": column(0.3, 0.0),
+            },
+            {"m": 1.0, "J": 0.05, "r": column(0.3, -0.3), "p": 0.0},
+        ],
+        "Points": [
+            {"Bindex": 1, "sPlocal": column(0.0, 0.0)},
+            {"Bindex": 0, "sPlocal": column(1.0, 0.0)},
+            {"Bindex": 1, "sPlocal": column(0.0, 0.0)},
+            {"Bindex": 2, "sPlocal": column(-0.3, 0.3)},
+            {"Bindex": 1, "sPlocal": column(0.0, 0.0)},
+            {"Bindex": 0, "sPlocal": column(-1.0, 0.0)},
+        ],
+        "Uvectors": [
+            {"Bindex": 1, "uLocal": column(1.0, 0.0)},
+            {"Bindex": 0, "uLocal": column(1.0, 0.0)},
+        ],
+        "Joints": [
+            {"type": "tran", "iPindex": 1, "jPindex": 2, "iUindex": 1, "jUindex": 2},
+            {"type": "rev", "iPindex": 3, "jPindex": 4},
+        ],
+        "Forces": [
+            {"type": "weight", "gravity": 9.81, "wgt": column(0.0, -1.0)},
+            {"type": "ptp", "iPindex": 5, "jPindex": 6, "k": 20.0, "L0": 1.0},
+            {
+                "type": "rot_sda",
+                "iBindex": 1,
+                "jBindex": 2,
+                "k": 1.0,
+                "theta0": 0.0,
+                "dc": 0.05,
+            },
+        ],
+    }
+
+
+#  -------------------------------------------------------------------------
+def chain(links):
+    """A hanging chain of links on revolute joints, the first of them
+    pinned to the ground (to measure how the solver scales with the size of
+    a model)"""
+
+    bodies = []
+    points = [{"Bindex": 0, "sPlocal": column(0.0, 0.0)}]
+    joints = []
+    for Bi in range(1, links + 1):
+        bodies.append({"m": 1.0, "J": 0.01, "r": column(0.1 * Bi - 0.05, 0.0)})
+        points.append({"Bindex": Bi, "sPlocal": column(-0.05, 0.0)})
+        points.append({"Bindex": Bi, "sPlocal": column(0.05, 0.0)})
+        joints.append({"type": "rev", "iPindex": 2 * Bi - 1, "jPindex": 2 * Bi})
+    return {
+        "Bodies": bodies,
+        "Points": points,
+        "Joints": joints,
+        "Forces": [{"type": "weight", "gravity": 9.81, "wgt": column(0.0, -1.0)}],
+    }
+
+
+MODELS = {
+    "pendulum": doublePendulum,
+    "slider_crank": sliderCrank,
+    "short_chain": lambda: chain(10),
+    "long_chain": lambda: chain(60),
+}
+
+
+#  -------------------------------------------------------------------------
+@pytest.fixture
+def make_run_folder(tmp_path):
+    """Return a function which writes one of MODELS, with its solve settings,
+    to a new run folder and returns the path of the folder"""
+
+    def makeRunFolder(model_name, run_name=None):
+        folder = tmp_path / (run_name or model_name)
+        folder.mkdir()
+        writeModelFile(str(folder), MODELS[model_name]())
+        (folder / "dapInputSettings.py").write_text(SETTINGS)
+        return str(folder)
+
+    return makeRunFolder
+
+
+#  -------------------------------------------------------------------------
+@pytest.fixture
+def solve_in_subprocess():
+    """Return a function which solves a run folder with the command line
+    solver in a fresh interpreter (the solver keeps its model in module
+    globals, and reads DAP_NO_JIT when it is imported)"""
+
+    import subprocess
+
+    def solveInSubprocess(folder, *arguments, environment=None):
+        env = dict(os.environ)
+        env.pop("DAP_NO_JIT", None)
+        env.update(environment or {})
+        return subprocess.run(
+            [sys.executable, "-m", "DapSolverCli", "--quiet"]
+            + list(arguments)
+            + [folder],
+            cwd=REPOSITORY,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    return solveInSubprocess
+
+
+#  -------------------------------------------------------------------------
+@pytest.fixture
+def run_with_gui_stand_ins(tmp_path):
+    """Return a function which runs code in a fresh interpreter, with the
+    stand-ins of the FreeCAD GUI modules on the path and the given command
+    line arguments, and returns the JSON it prints last"""
+
+    import json
+    import subprocess
+
+    stand_ins = tmp_path / "stand_ins"
+    for name, text in GUI_STAND_INS.items():
+        path = stand_ins / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    def runWithGuiStandIns(code, *arguments):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([str(stand_ins), REPOSITORY])
+        process = subprocess.run(
+            [sys.executable, "-c", code] + list(arguments),
+            cwd=REPOSITORY,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(process.stdout.splitlines()[-1])
+
+    return runWithGuiStandIns
+
+
+#  -------------------------------------------------------------------------
+@pytest.fixture
+def client(tmp_path):
+    """Start a solver service with two workers on a socket of its own, and
+    shut it down after the test"""
+
+    from DapSolverService import DapSolverClient
+
+    client = DapSolverClient(str(tmp_path / "service.sock"))
+    client.start(workers=2)
+    yield client
+    client.shutdown()
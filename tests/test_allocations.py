@@ -0,0 +1,182 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import sys
+import subprocess
+import pytest
+
+# Bounds on the allocations of the evaluations of the right-hand side of a
+# model, once its work buffers are allocated: the largest transient allocation
+# (the per-call temporaries), the memory kept after all the evaluations and
+# the memory blocks kept per evaluation.
+# Before the work buffers were preallocated one evaluation of the test models
+# took about 340 kB, and the memory kept grew with every evaluation
+PEAK_BYTES = 16 * 1024
+RETAINED_BYTES = 4 * 1024
+BLOCKS_PER_CALL = 0.05
+CALLS = 1000
+# The transient allocations may only grow with the size of the model by the
+# pivot indices of the linear solve (one 32 bit integer per equation), plus
+# some slack; a single temporary float array of the points of the long chain
+# is already larger than the slack
+PIVOT_BYTES = 4
+GROWTH_SLACK_BYTES = 512
+CHAINS = {"short_chain": 10, "long_chain": 60}
+
+
+# =============================================================================
+class NullOutput:
+    """Output stream which discards the progress of the solver without
+    buffering it, so that printing does not show up as allocations"""
+
+    #  -------------------------------------------------------------------------
+    def write(self, text):
+        """ """
+        return len(text)
+
+    #  -------------------------------------------------------------------------
+    def flush(self):
+        """ """
+        pass
+
+
+#  -------------------------------------------------------------------------
+def measureAllocations(folder, calls=CALLS):
+    """Evaluate the right-hand side of the model in folder calls times in
+    its initial state, after warming up, and return the time per evaluation
+    in microseconds, the peak transient bytes, the retained bytes and the
+    memory blocks retained per evaluation"""
+
+    import time
+    import contextlib
+    import tracemalloc
+    import DapTemp
+
+    with contextlib.redirect_stdout(NullOutput()):
+        DapTemp.folder = folder
+        DapTemp.readInputFiles()
+        DapTemp.initialize()
+        u = DapTemp.Bodies_to_u(None).ravel()
+        for _ in range(50):
+            DapTemp.analysis(0.0, u)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(calls):
+            DapTemp.analysis(0.0, u)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        blocks = sys.getallocatedblocks()
+        start_time = time.perf_counter()
+        for _ in range(calls):
+            DapTemp.analysis(0.0, u)
+        call_time = (time.perf_counter() - start_time) / calls
+        blocks_per_call = (sys.getallocatedblocks() - blocks) / calls
+    return call_time * 1e6, peak - before, current - before, blocks_per_call
+
+
+#  -------------------------------------------------------------------------
+def measureInSubprocess(folder, no_jit, calls=CALLS):
+    """Measure the allocations of the right-hand side evaluation in a fresh
+    interpreter (the solver keeps its model in module globals, and reads
+    DAP_NO_JIT when it is imported). Returns the peak transient bytes, the
+    retained bytes and the memory blocks retained per evaluation"""
+
+    env = dict(os.environ)
+    env.pop("DAP_NO_JIT", None)
+    if no_jit:
+        env["DAP_NO_JIT"] = "1"
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), folder, str(calls)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    _, peak, retained, blocks_per_call = process.stdout.split()[-4:]
+    return int(peak), int(retained), float(blocks_per_call)
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("no_jit", [False, True])
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_rhs_evaluation_does_not_allocate(model_name, no_jit, make_run_folder):
+    """The evaluations only allocate small, per-call temporaries"""
+
+    peak, retained, blocks_per_call = measureInSubprocess(
+        make_run_folder(model_name), no_jit
+    )
+    assert peak < PEAK_BYTES
+    assert retained < RETAINED_BYTES
+    assert blocks_per_call < BLOCKS_PER_CALL
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("no_jit", [False, True])
+def test_rhs_allocations_do_not_grow_with_the_model(no_jit, make_run_folder):
+    """The transient allocations of an evaluation of a long chain are no
+    larger than those of a short chain, apart from the pivot indices of the
+    linear solve (5 equations per link: 3 coordinates and 2 constraints)"""
+
+    peaks = {}
+    for model_name in CHAINS:
+        peak, retained, blocks_per_call = measureInSubprocess(
+            make_run_folder(model_name), no_jit, calls=100
+        )
+        assert retained < RETAINED_BYTES
+        assert blocks_per_call < BLOCKS_PER_CALL
+        peaks[model_name] = peak
+    equations = 5 * (CHAINS["long_chain"] - CHAINS["short_chain"])
+    growth = peaks["long_chain"] - peaks["short_chain"]
+    assert growth < PIVOT_BYTES * equations + GROWTH_SLACK_BYTES
+
+
+#  -------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Micro-benchmark: python tests/test_allocations.py <run folder> [calls]
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else CALLS
+    call_time, peak, retained, blocks_per_call = measureAllocations(
+        sys.argv[1], calls
+    )
+    print(
+        "us per call, peak transient bytes, retained bytes, "
+        "retained blocks per call:"
+    )
+    print("%.2f" % call_time, peak, retained, "%.4f" % blocks_per_call)
@@ -0,0 +1,163 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+from DapResultsStore import ResultsStore
+
+# A run long enough for the animation to attach to it while it is solved
+SETTINGS = "t_initial = 0.0\ndt = 0.01\nt_final = 60.0\n"
+
+# Start a solve of a run folder in the solver service from the builder of the
+# solver object, with the GUI up, open the animation panel once the run has
+# reported its first results, and drive the timers of the builder and of the
+# panel until the solve is done and the panel has stopped following the run.
+# The panel moves the bodies in a stand-in of the scene graph overlay
+FOLLOW_RUN = """
+import sys, json, time
+import numpy as np
+import DapSolverBuilder, DapSolverService, _TaskPanelDapAnimate
+from PySide import QtCore
+from DapResultsStore import ResultsStore
+folder, socket_path = sys.argv[1:3]
+DapSolverService.defaultSocketPath = lambda: socket_path
+
+class SolverObject:
+    FileDirectory = folder
+
+class Widget:
+    range = None
+    value = None
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+    def setRange(self, minimum, maximum):
+        self.range = [minimum, maximum]
+    def setValue(self, value):
+        self.value = value
+    def isChecked(self):
+        return True
+
+class Form:
+    horizontalSlider = Widget()
+    followCheckBox = Widget()
+    abortButton = Widget()
+
+class Motion:
+    def transforms(self, locations, angles):
+        n_ticks, n_bodies = angles.shape
+        return np.zeros((n_ticks, n_bodies, 3)), np.zeros((n_ticks, n_bodies, 4))
+
+builder = DapSolverBuilder.DapSolverBuilder.__new__(DapSolverBuilder.DapSolverBuilder)
+builder.folder = folder
+builder.resume = False
+builder.service_job = None
+finished = []
+builder.finishSolve = lambda *arguments: finished.append(list(arguments))
+builder.solveInService("solve_key")
+start_time = time.perf_counter()
+while not ResultsStore.exists(folder) or ResultsStore(folder).rows == 0:
+    time.sleep(0.05)
+    builder.service_timer.timeout.emit()
+    assert time.perf_counter() - start_time < 60.0
+
+panel = _TaskPanelDapAnimate.TaskPanelDapAnimate.__new__(
+    _TaskPanelDapAnimate.TaskPanelDapAnimate
+)
+panel.solver_object = SolverObject()
+panel.list_of_moving_bodies = ["link_1", "link_2"]
+panel.scene = object()
+panel.form = Form()
+panel.motion = Motion()
+panel.timer = QtCore.QTimer()
+panel.refresh_timer = QtCore.QTimer()
+panel.refresh_timer.timeout.connect(panel.onRefreshTimeout)
+panel.readMotion()
+panel.bases, panel.quaternions = panel.motion.transforms(panel.locations, panel.angles)
+panel.n_time_steps = len(panel.reportedTimes) - 1
+panel.setRunning(panel.store is not None and not panel.store.complete)
+attached = {"ticks": len(panel.reportedTimes), "following": panel.refresh_timer.isActive()}
+
+ticks = []
+while builder.solving() or panel.refresh_timer.isActive():
+    time.sleep(0.1)
+    if builder.solving():
+        builder.service_timer.timeout.emit()
+    if panel.refresh_timer.isActive():
+        panel.refresh_timer.timeout.emit()
+        ticks.append(len(panel.reportedTimes))
+    assert time.perf_counter() - start_time < 120.0
+
+store = ResultsStore(folder)
+print(json.dumps({"attached": attached, "ticks": ticks, "rows": store.rows,
+                  "complete": store.complete, "finished": finished,
+                  "times_equal": bool(np.array_equal(panel.reportedTimes,
+                                                     store.channel("time"))),
+                  "bases": len(panel.bases),
+                  "slider_range": panel.form.horizontalSlider.range,
+                  "slider_value": panel.form.horizontalSlider.value,
+                  "abort_enabled": panel.form.abortButton.enabled}))
+"""
+
+
+#  -------------------------------------------------------------------------
+def test_animation_follows_a_run_solved_from_the_workbench(
+    client, make_run_folder, solve_in_subprocess, run_with_gui_stand_ins
+):
+    """The animation panel attaches to a run which is being solved in the
+    solver service from the workbench, rather than to the results of the
+    previous run, and appends the results of the run as they are written,
+    until the run is done"""
+
+    folder = make_run_folder("pendulum")
+    with open(folder + "/dapInputSettings.py", "w") as fid:
+        fid.write(SETTINGS)
+    solve_in_subprocess(folder, "--output-format", "store")
+    assert ResultsStore(folder).complete
+
+    run = run_with_gui_stand_ins(FOLLOW_RUN, folder, client.socket_path)
+
+    assert run["finished"] == [["solve_key", True, True]]
+    assert run["complete"]
+    assert run["attached"]["following"]
+    assert run["attached"]["ticks"] < run["rows"]
+    # The motion grew over several refreshes, up to the complete run
+    assert len(set(run["ticks"])) > 2
+    assert run["ticks"] == sorted(run["ticks"])
+    assert run["ticks"][-1] == run["rows"]
+    assert run["times_equal"]
+    assert run["bases"] == run["rows"]
+    # Following the run shows its newest results
+    assert run["slider_range"] == [0, run["rows"] - 1]
+    assert run["slider_value"] == run["rows"] - 1
+    assert not run["abort_enabled"]
@@ -0,0 +1,108 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import io
+import contextlib
+import numpy as np
+import pytest
+from DapResultsStore import ResultsStore, readCheckpoint, requestAbort
+
+# The run is aborted once the integration passes this time
+ABORT_TIME = 0.45
+
+
+#  -------------------------------------------------------------------------
+def solveFolder(folder, resume=False):
+    """Solve the model in folder from its start, or resume it from its last
+    checkpoint"""
+
+    import DapTemp
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        DapTemp.folder = folder
+        DapTemp.readInputFiles()
+        DapTemp.initialize()
+        DapTemp.t_initial = 0.0
+        DapTemp.dt = 0.01
+        DapTemp.t_final = 1.0
+        DapTemp.resume = resume
+        return DapTemp.solve()
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_resumed_run_reproduces_the_uninterrupted_run(
+    model_name, make_run_folder, monkeypatch
+):
+    """A run which is aborted part way (through the abort file) and then
+    resumed from its checkpoint gives exactly the results store of a run
+    which was not interrupted"""
+
+    import DapTemp
+
+    # Small chunks and checkpoints, so that the abort is noticed well before
+    # the end of the run
+    monkeypatch.setattr(DapTemp, "results_chunk_size", 10)
+    monkeypatch.setattr(DapTemp, "checkpoint_interval", 20)
+    full_folder = make_run_folder(model_name, model_name + "_full")
+    assert solveFolder(full_folder)
+
+    folder = make_run_folder(model_name, model_name + "_resumed")
+    analysis = DapTemp.analysis
+
+    def abortingAnalysis(t, u):
+        if t > ABORT_TIME:
+            requestAbort(folder)
+        return analysis(t, u)
+
+    monkeypatch.setattr(DapTemp, "analysis", abortingAnalysis)
+    with pytest.raises(RuntimeError, match="aborted"):
+        solveFolder(folder)
+    monkeypatch.setattr(DapTemp, "analysis", analysis)
+    store = ResultsStore(folder)
+    assert not store.complete
+    rows = int(readCheckpoint(folder)["rows"])
+    assert 0 < rows < ResultsStore(full_folder).rows
+    assert store.rows == rows
+
+    assert solveFolder(folder, resume=True)
+    store = ResultsStore(folder)
+    full_store = ResultsStore(full_folder)
+    assert store.complete and full_store.complete
+    for name in full_store.channels():
+        np.testing.assert_array_equal(
+            store.channel(name), full_store.channel(name), err_msg=name
+        )
@@ -0,0 +1,139 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import sys
+import json
+import subprocess
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Heavy modules which must only be imported on first use (solver run, plot,
+# animation), and not when the workbench is loaded
+HEAVY_MODULES = ["numpy", "scipy", "matplotlib", "Part", "pivy"]
+
+# Stand-ins for the FreeCAD modules, which only take what loading the
+# workbench needs
+STUB_MODULES = {
+    "FreeCAD.py": (
+        "class _Console:\n"
+        "    def PrintMessage(self, message):\n"
+        "        pass\n"
+        "    PrintWarning = PrintError = PrintMessage\n"
+        "Console = _Console()\n"
+        "GuiUp = True\n"
+        "ActiveDocument = None\n"
+        "def addDocumentObserver(observer):\n"
+        "    pass\n"
+        "def Vector(*args):\n"
+        "    return args\n"
+    ),
+    "FreeCADGui.py": (
+        "commands = {}\n"
+        "def addCommand(alias, command):\n"
+        "    commands[alias] = command\n"
+    ),
+    "PySide/__init__.py": "from . import QtCore\n",
+    "PySide/QtCore.py": "def QT_TRANSLATE_NOOP(context, text):\n    return text\n",
+}
+
+# Load the workbench the way FreeCAD does: execute InitGui.py with the
+# Workbench base class and Gui module in its namespace, and initialize it
+LOAD_WORKBENCH = """
+import sys, json, FreeCAD, FreeCADGui
+class Workbench:
+    def appendToolbar(self, name, commands):
+        pass
+    appendMenu = appendContextMenu = appendToolbar
+workbenches = []
+FreeCADGui.addWorkbench = workbenches.append
+namespace = {"FreeCAD": FreeCAD, "FreeCADGui": FreeCADGui, "Gui": FreeCADGui,
+             "Workbench": Workbench}
+with open("InitGui.py") as fid:
+    exec(fid.read(), namespace)
+workbenches[0].Initialize()
+modules = sorted(sys.modules)
+from DapCommands import COMMANDS
+print(json.dumps({"modules": modules, "commands": sorted(FreeCADGui.commands),
+                  "aliases": sorted(COMMANDS),
+                  "command_modules": [command[0] for command in COMMANDS.values()]}))
+"""
+
+
+#  -------------------------------------------------------------------------
+def loadedModules(code, tmp_path):
+    """Run code in a fresh interpreter, with the FreeCAD stand-ins on the
+    path, and return the JSON it prints last"""
+
+    for name, text in STUB_MODULES.items():
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(tmp_path), REPOSITORY])
+    process = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPOSITORY,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+#  -------------------------------------------------------------------------
+def test_workbench_loads_without_command_modules(tmp_path):
+    """Initializing the workbench registers every command through its stub,
+    without importing the command modules or the heavy modules"""
+
+    loaded = loadedModules(LOAD_WORKBENCH, tmp_path)
+    assert loaded["commands"] == loaded["aliases"]
+    assert not set(loaded["command_modules"]) & set(loaded["modules"])
+    assert not set(HEAVY_MODULES) & set(loaded["modules"])
+
+
+#  -------------------------------------------------------------------------
+def test_solver_import_defers_scipy_and_matplotlib(tmp_path):
+    """Importing the solver only imports NumPy (and the JIT backend, if
+    any): the integrators and plotting are imported on first use"""
+
+    loaded = loadedModules(
+        "import sys, json, DapTemp\nprint(json.dumps({'modules': list(sys.modules)}))",
+        tmp_path,
+    )
+    assert "DapTemp" in loaded["modules"]
+    assert "scipy" not in loaded["modules"]
+    assert "matplotlib" not in loaded["modules"]
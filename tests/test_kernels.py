@@ -0,0 +1,163 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import numpy as np
+import pytest
+from DapResultsStore import ResultsStore
+from DapModelFile import readModelFile
+from DapSolverCli import solveFolder, solverOptions
+from DapHelperFunctions import RotMatrixArray
+import DapKernels
+from DapKernels import (
+    JIT_AVAILABLE,
+    ModelArrays,
+    updatePositionLoop,
+    updatePositionNumpy,
+    updateVelocityLoop,
+    updateVelocityNumpy,
+)
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_jit_and_numpy_trajectories_are_identical(
+    model_name, make_run_folder, solve_in_subprocess
+):
+    """The compiled kernels must give exactly the trajectories of the NumPy
+    code they replace"""
+
+    pytest.importorskip("numba")
+    jit_folder = make_run_folder(model_name, model_name + "_jit")
+    numpy_folder = make_run_folder(model_name, model_name + "_numpy")
+    solve_in_subprocess(jit_folder, "--output-format", "store")
+    solve_in_subprocess(
+        numpy_folder, "--output-format", "store", environment={"DAP_NO_JIT": "1"}
+    )
+
+    jit_store = ResultsStore(jit_folder)
+    numpy_store = ResultsStore(numpy_folder)
+    assert jit_store.complete and numpy_store.complete
+    assert jit_store.rows == numpy_store.rows > 1
+    np.testing.assert_array_equal(jit_store.channel("u"), numpy_store.channel("u"))
+
+
+#  -------------------------------------------------------------------------
+def randomArrays(folder, seed):
+    """Return two sets of the model arrays of the model in folder, in the
+    same random state"""
+
+    model = readModelFile(folder)
+    rng = np.random.default_rng(seed)
+    arrays = []
+    for _ in range(2):
+        arrays.append(ModelArrays(model["Bodies"], model["Points"], model["Uvectors"]))
+    for name in ["r", "p", "r_d", "p_d"]:
+        values = rng.uniform(-np.pi, np.pi, np.shape(getattr(arrays[0], name)))
+        for model_arrays in arrays:
+            getattr(model_arrays, name)[...] = values
+    for model_arrays in arrays:
+        RotMatrixArray(model_arrays.p, out=model_arrays.A)
+    return arrays
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_loop_and_numpy_kernels_are_identical(model_name, make_run_folder):
+    """The loop kernels, which are compiled by the JIT backend, must give
+    exactly the results of the NumPy kernels; compared here as plain Python,
+    so that this also runs without Numba"""
+
+    folder = make_run_folder(model_name)
+    for seed in range(5):
+        numpy_arrays, loop_arrays = randomArrays(folder, seed)
+        for kernel, model_arrays in [
+            (updatePositionNumpy, numpy_arrays),
+            (updatePositionLoop, loop_arrays),
+        ]:
+            a = model_arrays
+            kernel(
+                a.r,
+                a.A,
+                a.point_body,
+                a.sPlocal,
+                a.sP,
+                a.sP_r,
+                a.rP,
+                a.uvector_body,
+                a.ulocal,
+                a.uv,
+                a.uv_r,
+                a.work,
+            )
+        for kernel, model_arrays in [
+            (updateVelocityNumpy, numpy_arrays),
+            (updateVelocityLoop, loop_arrays),
+        ]:
+            a = model_arrays
+            kernel(
+                a.r_d,
+                a.p_d,
+                a.point_body,
+                a.sP_r,
+                a.sP_d,
+                a.rP_d,
+                a.uvector_body,
+                a.uv_r,
+                a.uv_d,
+                a.work,
+            )
+        assert np.any(numpy_arrays.rP != 0.0)
+        for name in ["sP", "sP_r", "rP", "sP_d", "rP_d", "uv", "uv_r", "uv_d"]:
+            np.testing.assert_array_equal(
+                getattr(numpy_arrays, name), getattr(loop_arrays, name), err_msg=name
+            )
+
+
+#  -------------------------------------------------------------------------
+def test_no_jit_option_is_applied_to_every_solve(make_run_folder, monkeypatch):
+    """A process which solves several folders (as the workers of the solver
+    service do) uses the kernels selected by the options of each solve"""
+
+    monkeypatch.delenv("DAP_NO_JIT", raising=False)
+    folder = make_run_folder("pendulum")
+    for no_jit in [False, True, False]:
+        options = solverOptions(folder, {"no_jit": no_jit, "quiet": True})
+        solveFolder(folder, options)
+        assert DapKernels.USE_JIT == (JIT_AVAILABLE and not no_jit)
+        if DapKernels.USE_JIT:
+            assert DapKernels.updatePosition is not updatePositionNumpy
+        else:
+            assert DapKernels.updatePosition is updatePositionNumpy
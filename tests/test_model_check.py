@@ -0,0 +1,156 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import io
+import contextlib
+import pytest
+from conftest import MODELS, SETTINGS
+from DapModelCheck import checkModel
+from DapModelFile import readModelFile, writeModelFile
+
+
+#  -------------------------------------------------------------------------
+def writeVariant(tmp_path, model):
+    """Write a (broken) variant of a test model to a run folder"""
+
+    folder = tmp_path / "variant"
+    folder.mkdir()
+    writeModelFile(str(folder), model)
+    (folder / "dapInputSettings.py").write_text(SETTINGS)
+    return str(folder)
+
+
+#  -------------------------------------------------------------------------
+def checkVariant(tmp_path, model, names=None):
+    """Check a variant of a test model as the solver reads it"""
+
+    return checkModel(readModelFile(writeVariant(tmp_path, model)), names)
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_valid_models_pass(model_name, tmp_path):
+    """The joints of the test models leave two degrees of freedom, and there
+    are no warnings"""
+
+    dof, warnings = checkVariant(tmp_path, MODELS[model_name]())
+    assert dof == 2
+    assert warnings == []
+
+
+#  -------------------------------------------------------------------------
+def test_over_constrained_model(tmp_path):
+    """A rigid joint between the slider and the crank leaves -1 degrees of
+    freedom"""
+
+    model = MODELS["slider_crank"]()
+    model["Joints"].append({"type": "rigid", "iBindex": 1, "jBindex": 2})
+    with pytest.raises(RuntimeError) as error:
+        checkVariant(tmp_path, model)
+    assert (
+        "The joints impose 7 constraints on 2 moving bodies (6 coordinates), "
+        "the model is over-constrained by 1"
+    ) in str(error.value)
+
+
+#  -------------------------------------------------------------------------
+def test_bad_indices(tmp_path):
+    """Every index which refers to a missing entity is reported at once, by
+    the label of its entity where there is one"""
+
+    model = MODELS["pendulum"]()
+    model["Points"][0]["Bindex"] = 5
+    model["Joints"][1]["jPindex"] = 99
+    model["Forces"][1]["iPindex"] = 7
+    model["Forces"][2]["jBindex"] = 3
+    names = {"Joint": ["Pin", "Knee"], "Force": ["Gravity", "Spring", "Damper"]}
+    with pytest.raises(RuntimeError) as error:
+        checkVariant(tmp_path, model, names)
+    message = str(error.value)
+    assert "Point 1 refers to body 5, but the model has 2 bodies" in message
+    assert 'Joint "Knee" refers to point 99, but the model has 6 points' in message
+    assert 'Force "Spring" refers to point 7, but the model has 6 points' in message
+    assert 'Force "Damper" refers to body 3, but the model has 2 bodies' in message
+
+
+#  -------------------------------------------------------------------------
+def test_joint_connecting_a_body_to_itself(tmp_path):
+    """A joint between two points of the same body is reported"""
+
+    model = MODELS["pendulum"]()
+    model["Joints"][1]["jPindex"] = 2
+    with pytest.raises(RuntimeError, match="Joint 2 connects Body 1 to itself"):
+        checkVariant(tmp_path, model)
+
+
+#  -------------------------------------------------------------------------
+def test_floating_bodies_are_warned_about(tmp_path):
+    """Without the joint to the ground both links move freely, which is a
+    valid model"""
+
+    model = MODELS["pendulum"]()
+    del model["Joints"][0]
+    dof, warnings = checkVariant(tmp_path, model)
+    assert dof == 4
+    assert warnings == [
+        "Body 1, Body 2 are not connected to the ground by joints and will move "
+        "freely (together with Joint 1)"
+    ]
+
+
+#  -------------------------------------------------------------------------
+def test_redundant_joint_is_found_at_initialisation(tmp_path):
+    """A second revolute joint on the pivot of the pendulum passes the
+    degrees of freedom count, but its constraints repeat those of the first
+    joint, which the rank check of the initial Jacobian reports"""
+
+    import DapTemp
+
+    model = MODELS["pendulum"]()
+    model["Joints"].append(dict(model["Joints"][0]))
+    folder = writeVariant(tmp_path, model)
+    dof, warnings = checkModel(readModelFile(folder))
+    assert dof == 0
+    assert warnings == ["The model has no degrees of freedom, nothing can move"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        DapTemp.folder = folder
+        DapTemp.readInputFiles()
+        with pytest.raises(RuntimeError) as error:
+            DapTemp.initialize()
+    assert (
+        "2 of the 2 constraints of Joint 3 (rev) are redundant with those of "
+        "the joints before it at the initial configuration"
+    ) in str(error.value)
@@ -0,0 +1,82 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import io
+import contextlib
+import numpy as np
+import pytest
+from DapResultsStore import ResultsStore
+
+
+#  -------------------------------------------------------------------------
+def solveFolder(folder, compiled):
+    """Solve the model in folder with its compiled evaluators, or with the
+    generic dispatch over the joint and force types of DapTemp"""
+
+    import DapTemp
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        DapTemp.folder = folder
+        DapTemp.readInputFiles()
+        DapTemp.initialize()
+        assert DapTemp.Compiled is not None
+        if not compiled:
+            DapTemp.Compiled = None
+        DapTemp.t_initial = 0.0
+        DapTemp.dt = 0.01
+        DapTemp.t_final = 1.0
+        DapTemp.resume = False
+        assert DapTemp.solve()
+    return ResultsStore(folder)
+
+
+#  -------------------------------------------------------------------------
+@pytest.mark.parametrize("model_name", ["pendulum", "slider_crank"])
+def test_compiled_and_generic_trajectories_match(model_name, make_run_folder):
+    """The evaluators generated for a model must give the trajectories of the
+    generic constraint, Jacobian and force evaluation they replace"""
+
+    compiled_store = solveFolder(
+        make_run_folder(model_name, model_name + "_compiled"), True
+    )
+    generic_store = solveFolder(
+        make_run_folder(model_name, model_name + "_generic"), False
+    )
+    assert compiled_store.complete and generic_store.complete
+    assert compiled_store.rows == generic_store.rows > 1
+    np.testing.assert_allclose(
+        compiled_store.channel("u"), generic_store.channel("u"), rtol=0, atol=1e-12
+    )
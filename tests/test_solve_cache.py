@@ -0,0 +1,82 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+from DapResultsStore import ResultsStore
+from DapSolveCache import (
+    CACHE_FOLDER,
+    fetchResults,
+    hashSolveInputs,
+    resultPaths,
+    storeResults,
+)
+
+
+#  -------------------------------------------------------------------------
+def readResultSet(folder):
+    """Return the contents of the files of the result set in folder"""
+
+    contents = {}
+    for path in resultPaths(folder):
+        with open(os.path.join(folder, path), "rb") as fid:
+            contents[path] = fid.read()
+    return contents
+
+
+#  -------------------------------------------------------------------------
+def test_solving_again_leaves_the_cached_results(
+    make_run_folder, solve_in_subprocess
+):
+    """The result files of a run folder are hard linked into its cache;
+    solving the folder again with other settings, or resuming it, does not
+    change the cached result set"""
+
+    folder = make_run_folder("pendulum")
+    solve_in_subprocess(folder)
+    key = hashSolveInputs(folder)
+    storeResults(folder, key)
+    entry = os.path.join(folder, CACHE_FOLDER, key)
+    cached = readResultSet(entry)
+    assert "DapBodyPositions" in cached
+
+    solve_in_subprocess(folder, "--t-final", "2.0")
+    assert readResultSet(entry) == cached
+    assert fetchResults(folder, key)
+    solve_in_subprocess(folder, "--resume", "--t-final", "2.0")
+    assert readResultSet(entry) == cached
+    assert ResultsStore(folder).rows == 200
+    assert fetchResults(folder, key)
+    assert readResultSet(folder) == cached
@@ -0,0 +1,199 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import time
+import threading
+import numpy as np
+from DapResultsStore import ResultsStore
+from DapSolverService import PROGRESS_INTERVAL, DapSolverJob
+
+# Slack on the interval between the events of a running job, for the
+# progress check of the service and a loaded test machine
+EVENT_SLACK = 1.0
+
+# Solve a run folder in the solver service from the builder of the solver
+# object, with the GUI up, driving the poll timer of the builder until the
+# solve is done
+SOLVE_IN_GUI = """
+import sys, json, time, DapSolverBuilder, DapSolverService
+folder, socket_path = sys.argv[1:3]
+DapSolverService.defaultSocketPath = lambda: socket_path
+builder = DapSolverBuilder.DapSolverBuilder.__new__(DapSolverBuilder.DapSolverBuilder)
+builder.folder = folder
+builder.resume = False
+builder.service_job = None
+finished = []
+builder.finishSolve = lambda *arguments: finished.append(list(arguments))
+events = []
+start_time = time.perf_counter()
+builder.solveInService("solve_key", events.append)
+start_time = time.perf_counter() - start_time
+polls = 0
+while builder.solving():
+    time.sleep(0.1)
+    builder.service_timer.timeout.emit()
+    polls += 1
+print(json.dumps({"start_time": start_time, "polls": polls, "finished": finished,
+                  "events": [event["event"] for event in events],
+                  "timer_active": builder.service_timer.isActive()}))
+"""
+
+
+#  -------------------------------------------------------------------------
+def test_service_streams_progress_and_completion(client, make_run_folder):
+    """A solve is accepted, reports its progress while the results store is
+    being written, and finishes with the complete results store"""
+
+    folder = make_run_folder("pendulum")
+    events = []
+    event = client.solve(folder, {"t_final": 60.0}, events.append)
+
+    assert event["event"] == "finished"
+    assert events[0]["event"] == "accepted"
+    assert events[-1] is event
+    progress = [e for e in events if e["event"] == "progress"]
+    assert progress
+    assert all(0 < e["rows"] < events[0]["rows"] for e in progress)
+    assert [e["rows"] for e in progress] == sorted(e["rows"] for e in progress)
+    store = ResultsStore(folder)
+    assert store.complete
+    assert store.rows == events[0]["rows"]
+
+
+#  -------------------------------------------------------------------------
+def test_service_sends_an_event_every_progress_interval(client, make_run_folder):
+    """While a job is running, the service sends a progress event or a
+    heartbeat at least every PROGRESS_INTERVAL, so that a client knows that
+    the job is alive, even while no new results are being reported"""
+
+    folder = make_run_folder("pendulum")
+    arrivals = []
+
+    def callback(event):
+        arrivals.append((time.perf_counter(), event))
+
+    event = client.solve(folder, {"t_final": 60.0}, callback)
+
+    assert event["event"] == "finished"
+    running = [e for _, e in arrivals[1:-1]]
+    assert running
+    assert all(e["event"] in ["progress", "heartbeat"] for e in running)
+    assert all(e["job"] == event["job"] for e in running)
+    times = [arrival_time for arrival_time, _ in arrivals]
+    assert max(np.diff(times)) < PROGRESS_INTERVAL + EVENT_SLACK
+
+
+#  -------------------------------------------------------------------------
+def test_job_does_not_block_its_caller(client, make_run_folder):
+    """A job runs its client in the background: polling it returns the
+    events received so far at once, until the final event"""
+
+    folder = make_run_folder("pendulum")
+    job = DapSolverJob(folder, {"t_final": 60.0}, client)
+    events = []
+    start_time = time.perf_counter()
+    while job.final_event is None:
+        poll_time = time.perf_counter()
+        events += job.poll()
+        assert time.perf_counter() - poll_time < 0.1
+        time.sleep(0.05)
+        assert time.perf_counter() - start_time < 60.0
+
+    assert events[0]["event"] == "accepted"
+    assert events[-1] is job.final_event
+    assert job.final_event["event"] == "finished"
+    assert ResultsStore(folder).complete
+    assert job.poll() == []
+
+
+#  -------------------------------------------------------------------------
+def test_gui_solve_does_not_block(client, make_run_folder, run_with_gui_stand_ins):
+    """Within the GUI, a solve in the service returns at once, and is
+    finished (its results stored and loaded) by the poll timer of the
+    builder"""
+
+    folder = make_run_folder("pendulum")
+    solve = run_with_gui_stand_ins(SOLVE_IN_GUI, folder, client.socket_path)
+
+    assert solve["start_time"] < 0.5
+    assert solve["polls"] > 1
+    assert solve["finished"] == [["solve_key", True, True]]
+    assert solve["events"][0] == "accepted"
+    assert solve["events"][-1] == "finished"
+    assert not solve["timer_active"]
+
+
+#  -------------------------------------------------------------------------
+def test_service_solves_concurrent_jobs(client, make_run_folder, solve_in_subprocess):
+    """Jobs of concurrent clients are solved side by side by the workers,
+    with the same results as the command line solver"""
+
+    folders = [make_run_folder("slider_crank", "run_" + str(i)) for i in range(2)]
+    events = [None] * len(folders)
+
+    def solve(i):
+        events[i] = client.solve(folders[i])
+
+    threads = [threading.Thread(target=solve, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [event["event"] for event in events] == ["finished", "finished"]
+    assert events[0]["job"] != events[1]["job"]
+    reference = make_run_folder("slider_crank")
+    solve_in_subprocess(reference, "--output-format", "store")
+    for folder in folders:
+        np.testing.assert_array_equal(
+            ResultsStore(folder).channel("u"), ResultsStore(reference).channel("u")
+        )
+
+
+#  -------------------------------------------------------------------------
+def test_service_reports_failed_jobs(client, tmp_path):
+    """A job which cannot be solved fails without stopping the service"""
+
+    folder = tmp_path / "empty"
+    folder.mkdir()
+    event = client.solve(str(folder))
+
+    assert event["event"] == "failed"
+    assert event["error"]
+    assert client.running()
+    job = DapSolverJob(str(folder), client=client)
+    assert job.wait()[-1]["event"] == "failed"
+    assert job.final_event["error"]
@@ -0,0 +1,149 @@
+# ************************************************************************************
+# *                                                                                  *
+# *   Copyright (c) 2022 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>            *
+# *   Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>   *
+# *   Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>                 *
+# *   Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>                 *
+# *   Copyright (c) 2022 Cecil Churms <churms@gmail.com>                             *
+# *                                                                                  *
+# *   This program is free software; you can redistribute it and/or modify           *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)             *
+# *   as published by the Free Software Foundation; either version 2 of              *
+# *   the License, or (at your option) any later version.                            *
+# *   for detail see the LICENCE text file.                                          *
+# *                                                                                  *
+# *   This program is distributed in the hope that it will be useful,                *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of                 *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                  *
+# *   GNU Library General Public License for more details.                           *
+# *                                                                                  *
+# *   You should have received a copy of the GNU Library General Public              *
+# *   License along with this program; if not, write to the Free Software            *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307           *
+# *   USA                                                                            *
+# *_________________________________________________________________________________ *
+# *                                                                                  *
+# *     Nikra-DAP FreeCAD WorkBench (c) 2022:                                        *
+# *        - Please refer to the Documentation and README                            *
+# *          for more information regarding this WorkBench and its usage.            *
+# *                                                                                  *
+# *     Author(s) of this file:                                                      *
+# *          Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>               *
+# *          Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                        *
+# *          Cecil Churms <churms@gmail.com>                                         *
+# *                                                                                  *
+# ************************************************************************************
+
+import os
+import sys
+import time
+import subprocess
+import collections
+from DapResultsStore import ResultsStore
+from DapSolveCache import hashSolveInputs
+from DapSolverSpool import (
+    HEARTBEAT_FILE,
+    fetchJobResults,
+    jobError,
+    jobStatus,
+    requeueStaleJobs,
+    stageFolder,
+    submitJob,
+    writeHeartbeat,
+)
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#  -------------------------------------------------------------------------
+def submitRuns(spool, make_run_folder, count):
+    """Submit count runs, which differ in their end time (and so in their job
+    key), to the spool. Returns the run folders and their job keys"""
+
+    folders = []
+    keys = []
+    for i in range(count):
+        model_name = ["pendulum", "slider_crank"][i % 2]
+        folder = make_run_folder(model_name, "run_" + str(i))
+        with open(os.path.join(folder, "dapInputSettings.py"), "w") as fid:
+            fid.write("t_initial = 0.0\ndt = 0.01\nt_final = %.1f\n" % (1.0 + i))
+        key = hashSolveInputs(folder)
+        submitJob(spool, folder, key)
+        folders.append(folder)
+        keys.append(key)
+    return folders, keys
+
+
+#  -------------------------------------------------------------------------
+def test_workers_solve_every_job_once(tmp_path, make_run_folder):
+    """Several worker processes on one spool solve every job exactly once"""
+
+    spool = str(tmp_path / "spool")
+    folders, keys = submitRuns(spool, make_run_folder, 6)
+    assert [jobStatus(spool, key) for key in keys] == ["incoming"] * 6
+
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "DapSolverSpool", "worker", spool, "--once"],
+            cwd=REPOSITORY,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(3)
+    ]
+    solved = collections.Counter()
+    for worker in workers:
+        output, _ = worker.communicate(timeout=300)
+        assert worker.returncode == 0
+        for line in output.splitlines():
+            if ": solving " in line:
+                solved[line.split(": solving ")[1]] += 1
+
+    assert solved == collections.Counter(keys)
+    for folder, key in zip(folders, keys):
+        assert jobStatus(spool, key) == "done"
+        fetchJobResults(spool, key, folder)
+        store = ResultsStore(folder)
+        assert store.complete
+        assert store.rows > 1
+
+
+#  -------------------------------------------------------------------------
+def test_failed_job_keeps_its_error(tmp_path, make_run_folder):
+    """A job which cannot be solved is moved to failed/ with its error"""
+
+    spool = str(tmp_path / "spool")
+    folder = make_run_folder("pendulum")
+    with open(os.path.join(folder, "dapInputSettings.py"), "a") as fid:
+        fid.write("del dt\n")
+    key = hashSolveInputs(folder)
+    submitJob(spool, folder, key)
+    subprocess.run(
+        [sys.executable, "-m", "DapSolverSpool", "worker", spool, "--once"],
+        cwd=REPOSITORY,
+        capture_output=True,
+        check=True,
+    )
+
+    assert jobStatus(spool, key) == "failed"
+    assert jobError(spool, key)
+
+
+#  -------------------------------------------------------------------------
+def test_requeue_only_stale_jobs(tmp_path, make_run_folder):
+    """Running jobs whose heartbeat is stale are put back in incoming/, and
+    those of live workers are left alone"""
+
+    spool = str(tmp_path / "spool")
+    _, keys = submitRuns(spool, make_run_folder, 2)
+    for key in keys:
+        job_folder = os.path.join(stageFolder(spool, "running"), key)
+        os.rename(os.path.join(spool, "incoming", key), job_folder)
+        writeHeartbeat(job_folder)
+    stale_time = time.time() - 120.0
+    heartbeat = os.path.join(spool, "running", keys[0], HEARTBEAT_FILE)
+    os.utime(heartbeat, (stale_time, stale_time))
+
+    assert requeueStaleJobs(spool, stale_after=60.0) == [keys[0]]
+    assert jobStatus(spool, keys[0]) == "incoming"
+    assert jobStatus(spool, keys[1]) == "running"